@@ -0,0 +1,161 @@
+"""
+Timing harness and offline fixtures for the pipeline benchmarks.
+"""
+
+import io
+import math
+import time
+import wave
+import statistics
+from array import array
+from bson import ObjectId
+
+SAMPLE_RATE = 16000
+
+
+def synthetic_wav(seconds, sample_rate=SAMPLE_RATE, pause_every=4.0):
+    """
+    Builds a 16-bit mono WAV recording of tone bursts separated by silence.
+
+    The pauses give the silence splitter of chunked transcription something
+    to split on, like speech would.
+
+    Args:
+        seconds (float): The length of the recording.
+        sample_rate (int): The sample rate in Hz.
+        pause_every (float): Seconds of tone between half-second pauses.
+
+    Returns:
+        bytes: The WAV file.
+    """
+    cycle = pause_every + 0.5
+    samples = array(
+        "h",
+        (
+            (
+                int(8000 * math.sin(2 * math.pi * 220 * n / sample_rate))
+                if (n / sample_rate) % cycle < pause_every
+                else 0
+            )
+            for n in range(int(seconds * sample_rate))
+        ),
+    )
+    buffer = io.BytesIO()
+    with wave.Wave_write(buffer) as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(samples.tobytes())
+    return buffer.getvalue()
+
+
+class InMemoryCollection:
+    """
+    Minimal stand-in for a pymongo collection, for the calls the pipeline makes.
+    """
+
+    def __init__(self, database=None):
+        self.documents = {}
+        self.database = database or InMemoryDatabase()
+        self.bulk_operations = 0
+
+    def insert_one(self, document):
+        """Stores a document, assigning its ID."""
+        document.setdefault("_id", ObjectId())
+        self.documents[document["_id"]] = dict(document)
+
+    def insert_many(self, documents, ordered=True):  # pylint: disable=unused-argument
+        """Stores several documents."""
+        for document in documents:
+            self.insert_one(document)
+
+    def find_one(self, query, projection=None):  # pylint: disable=unused-argument
+        """Finds a document by ID."""
+        return self.documents.get(query.get("_id"))
+
+    def update_one(
+        self, query, update, upsert=False
+    ):  # pylint: disable=unused-argument
+        """Applies $set and $inc updates to a document found by ID."""
+        document = self.documents.setdefault(query["_id"], {"_id": query["_id"]})
+        document.update(update.get("$set", {}))
+        for field, amount in update.get("$inc", {}).items():
+            document[field] = document.get(field, 0) + amount
+
+    def bulk_write(self, operations, ordered=True):  # pylint: disable=unused-argument
+        """Accepts bulk updates; only the number of operations is kept."""
+        self.bulk_operations += len(operations)
+
+    def create_index(self, *args, **kwargs):  # pylint: disable=unused-argument
+        """Accepts index definitions."""
+        return "index"
+
+
+class InMemoryDatabase:  # pylint: disable=too-few-public-methods
+    """
+    Minimal stand-in for a pymongo database holding InMemoryCollections.
+    """
+
+    def __init__(self):
+        self.collections = {}
+
+    def __getitem__(self, name):
+        if name not in self.collections:
+            self.collections[name] = InMemoryCollection(self)
+        return self.collections[name]
+
+
+def measure(func, repeat=5, number=1, setup=None):
+    """
+    Times a function.
+
+    Args:
+        func (callable): The code to time, called without arguments.
+        repeat (int): The number of timed rounds.
+        number (int): Calls per round.
+        setup (callable): Called before every round, outside the timing.
+
+    Returns:
+        dict: Median, minimum and maximum seconds per call, and the settings.
+    """
+    rounds = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        rounds.append((time.perf_counter() - started) / number)
+    return {
+        "median": statistics.median(rounds),
+        "min": min(rounds),
+        "max": max(rounds),
+        "repeat": repeat,
+        "number": number,
+    }
+
+
+def compare(results, baseline, threshold, min_delta=0.0):
+    """
+    Compares benchmark medians against a baseline.
+
+    Args:
+        results (dict): Benchmark name to measurement.
+        baseline (dict): Benchmark name to measurement from an earlier run.
+        threshold (float): Allowed slowdown, e.g. 0.25 for 25 %.
+        min_delta (float): Slowdowns of fewer seconds than this are ignored,
+            as timer noise on very fast benchmarks.
+
+    Returns:
+        list: (name, baseline median, current median, ratio) for every
+            benchmark slower than the baseline by more than the threshold.
+    """
+    regressions = []
+    for name, result in sorted(results.items()):
+        if name not in baseline:
+            continue
+        previous = baseline[name]["median"]
+        ratio = result["median"] / previous if previous else 1.0
+        if ratio > 1 + threshold and result["median"] - previous >= min_delta:
+            regressions.append((name, previous, result["median"], ratio))
+    return regressions
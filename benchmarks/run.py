@@ -0,0 +1,243 @@
+"""
+Offline microbenchmarks for the stages of the audio pipeline.
+
+Times sentiment analysis, transcription, the /process-audio handler of the
+machine learning client and the audio conversion of the web app on
+synthetic WAV recordings of several lengths. Transcription uses the stub
+backend and MongoDB is replaced by an in-memory collection, so no network
+or database is needed. The ffmpeg conversion is skipped when ffmpeg is not
+installed.
+
+Results are written as JSON and compared against a stored baseline; the
+run fails if a benchmark is slower than its baseline by more than the
+threshold. Baselines are machine specific, so record one with
+--update-baseline on the machine that runs the comparison.
+
+    python benchmarks/run.py [--quick] [--output results.json]
+        [--baseline benchmarks/baseline.json] [--threshold 0.25]
+        [--min-delta-ms 0.01] [--update-baseline]
+"""
+
+import io
+import os
+import sys
+import json
+import shutil
+import argparse
+import platform
+from unittest.mock import patch
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCHMARK_DIR = os.path.join(ROOT, "benchmarks")
+sys.path[:0] = [
+    BENCHMARK_DIR,
+    os.path.join(ROOT, "machine-learning-client"),
+    os.path.join(ROOT, "web-app"),
+]
+os.environ["TRANSCRIPTION_BACKEND"] = "stub"
+os.environ["RESULT_CACHE_BACKEND"] = "local"
+os.environ["WRITE_BUFFER_ENABLED"] = "false"
+
+# pylint: disable=wrong-import-position,wrong-import-order,import-error
+from harness import InMemoryCollection, compare, measure, synthetic_wav
+from src import main as ml_main
+from src.sentiment import SentimentEngine
+from src.utils import analyze_sentiment, transcribe_audio
+import audio
+
+DEFAULT_BASELINE = os.path.join(BENCHMARK_DIR, "baseline.json")
+CLIP_SECONDS = (1, 5, 30)
+TRANSCRIPTS = [
+    "today was a really good day",
+    "I feel tired and a bit sad after the long meeting",
+    "I went to the store and came back home " * 20,
+]
+
+
+def bench_sentiment(repeat):
+    """Times sentiment analysis without and with the result cache."""
+    results = {}
+    for index, text in enumerate(TRANSCRIPTS):
+        engine = SentimentEngine()
+
+        def cold(engine=engine, text=text):
+            engine.clear()
+            return engine.analyze(text)
+
+        results[f"sentiment.cold.{index}"] = measure(cold, repeat, number=200)
+        analyze_sentiment(text)
+        results[f"sentiment.cached.{index}"] = measure(
+            lambda text=text: analyze_sentiment(text), repeat, number=2000
+        )
+    return results
+
+
+def bench_transcription(clips, repeat):
+    """Times whole-file and chunked transcription with the stub backend."""
+    results = {}
+    for seconds, data in clips.items():
+        for chunked in (False, True):
+            mode = "chunked" if chunked else "whole"
+            results[f"transcribe.{mode}.{seconds}s"] = measure(
+                lambda data=data, chunked=chunked: transcribe_audio(
+                    io.BytesIO(data), chunked=chunked
+                ),
+                repeat,
+            )
+    return results
+
+
+def bench_process_audio(clips, repeat):
+    """Times the /process-audio handler end to end, storing in memory."""
+    results = {}
+    client = ml_main.app.test_client()
+    collection = InMemoryCollection()
+    cache = ml_main.create_result_cache(backend="local")
+    with patch.object(ml_main, "get_collection", return_value=collection), patch.object(
+        ml_main, "result_cache", cache
+    ):
+        for seconds, data in clips.items():
+            for use_cache in (False, True):
+
+                def post(use_cache=use_cache, data=data):
+                    response = client.post(
+                        "/process-audio",
+                        data={
+                            "audio": (io.BytesIO(data), "clip.wav"),
+                            "user_id": "benchmark",
+                            "bypass_cache": "false" if use_cache else "true",
+                        },
+                        content_type="multipart/form-data",
+                    )
+                    assert response.status_code == 200, response.get_json()
+
+                mode = "cached" if use_cache else "uncached"
+                # Fill the cache so the cached runs measure hits only
+                post()
+                results[f"process_audio.{mode}.{seconds}s"] = measure(post, repeat)
+    return results
+
+
+def bench_conversion(clips, repeat):
+    """Times the web app conversion: PCM pass-through, and ffmpeg if present."""
+    results = {}
+    for seconds, data in clips.items():
+        results[f"convert.passthrough.{seconds}s"] = measure(
+            lambda data=data: audio.convert_audio_stream(io.BytesIO(data)),
+            repeat,
+            number=2000,
+        )
+    if shutil.which("ffmpeg") is None:
+        print("ffmpeg not found; skipping the conversion benchmarks", file=sys.stderr)
+        return results
+    for seconds in clips:
+        # 44.1 kHz input, as browsers record it, has to go through ffmpeg
+        data = synthetic_wav(seconds, sample_rate=44100)
+        results[f"convert.ffmpeg.{seconds}s"] = measure(
+            lambda data=data: audio.convert_audio_stream(io.BytesIO(data)).close(),
+            repeat,
+        )
+    return results
+
+
+def run_benchmarks(quick=False):
+    """
+    Runs all benchmarks.
+
+    Args:
+        quick (bool): Use fewer rounds and only the shorter clips.
+
+    Returns:
+        dict: Benchmark name to measurement, in seconds per call.
+    """
+    repeat = 3 if quick else 7
+    lengths = CLIP_SECONDS[:2] if quick else CLIP_SECONDS
+    clips = {seconds: synthetic_wav(seconds) for seconds in lengths}
+    results = {}
+    results.update(bench_sentiment(repeat))
+    results.update(bench_transcription(clips, repeat))
+    results.update(bench_process_audio(clips, repeat))
+    results.update(bench_conversion(clips, repeat))
+    return results
+
+
+def parse_args(argv=None):
+    """
+    Parses the command line.
+
+    Args:
+        argv (list): The arguments; defaults to sys.argv.
+
+    Returns:
+        argparse.Namespace: The options.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the audio pipeline.")
+    parser.add_argument("--quick", action="store_true", help="fewer, shorter runs")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=float(os.getenv("BENCHMARK_THRESHOLD", "0.25")),
+        help="allowed slowdown against the baseline, 0.25 for 25%%",
+    )
+    parser.add_argument(
+        "--min-delta-ms",
+        type=float,
+        default=0.01,
+        help="ignore slowdowns smaller than this, as timer noise",
+    )
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="store the results as the new baseline instead of comparing",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """
+    Runs the benchmarks and compares them with the baseline.
+
+    Args:
+        argv (list): The command line arguments; defaults to sys.argv.
+
+    Returns:
+        int: 0 on success, 1 if a benchmark regressed.
+    """
+    options = parse_args(argv)
+    results = run_benchmarks(options.quick)
+    report = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": results,
+    }
+    for name, result in sorted(results.items()):
+        print(f"{name:36} {result['median'] * 1000:10.3f} ms")
+    if options.output:
+        with open(options.output, "w", encoding="utf-8") as output:
+            json.dump(report, output, indent=2, sort_keys=True)
+
+    if options.update_baseline:
+        with open(options.baseline, "w", encoding="utf-8") as baseline:
+            json.dump(report, baseline, indent=2, sort_keys=True)
+        print(f"Baseline written to {options.baseline}")
+        return 0
+    if not os.path.exists(options.baseline):
+        print(f"No baseline at {options.baseline}; nothing to compare")
+        return 0
+    with open(options.baseline, encoding="utf-8") as baseline:
+        previous = json.load(baseline)["results"]
+    regressions = compare(
+        results, previous, options.threshold, options.min_delta_ms / 1000
+    )
+    for name, before, after, ratio in regressions:
+        print(
+            f"REGRESSION {name}: {before * 1000:.3f} ms -> {after * 1000:.3f} ms "
+            f"({ratio:.2f}x)"
+        )
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+"""
+Gunicorn configuration for the machine learning client.
+
+The app is preloaded and warmed up in the master (GUNICORN_PRELOAD), so the
+speech recognition and sentiment models are loaded once and shared with the
+workers; each phase of the startup is timed for `/readyz`. Without preloading
+every worker warms up before it accepts requests.
+
+Workers report metrics through files in PROMETHEUS_MULTIPROC_DIR, so that
+`/metrics` covers all of them whichever worker serves the scrape.
+"""
+
+import os
+import sys
+import time
+import tempfile
+
+CONFIG_LOADED = time.perf_counter()
+
+# Set before any worker imports prometheus_client
+os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "ml-metrics")
+)
+
+# pylint: disable=wrong-import-position
+from src.indexes import run_startup_bootstrap
+from src.metrics import mark_worker_dead, reset_multiprocess_dir
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5001")
+workers = int(os.getenv("GUNICORN_WORKERS", "4"))
+preload_app = os.getenv("GUNICORN_PRELOAD", "true").lower() == "true"
+
+
+def on_starting(_server):
+    """
+    Ensures the MongoDB indexes once, in the master, before workers fork, and
+    warms up the preloaded app.
+    """
+    reset_multiprocess_dir()
+    # Imported here so loading the app is timed separately
+    from src import warmup  # pylint: disable=import-outside-toplevel
+
+    if preload_app:
+        warmup.record_phase("load_app", time.perf_counter() - CONFIG_LOADED)
+    with warmup.timed_phase("indexes"):
+        run_startup_bootstrap()
+    if preload_app:
+        warmup.warm_up()
+
+
+def post_fork(_server, worker):
+    """Notes when a worker started, to time loading the app in it."""
+    worker.started_at = time.perf_counter()
+
+
+def post_worker_init(worker):
+    """Warms up a worker that loaded the app itself."""
+    from src import warmup  # pylint: disable=import-outside-toplevel
+
+    if not warmup.is_ready():
+        warmup.record_phase("load_app", time.perf_counter() - worker.started_at)
+        warmup.warm_up()
+
+
+def worker_exit(_server, _worker):
+    """Writes the entries still buffered by the exiting worker."""
+    main = sys.modules.get("src.main")
+    if main is not None and main.write_buffer is not None:
+        main.write_buffer.close()
+
+
+def child_exit(_server, worker):
+    """Stops counting the in-flight requests of a worker that exited."""
+    mark_worker_dead(worker.pid)
@@ -0,0 +1,432 @@
+"""
+Content-addressed, compressed store for uploaded recordings.
+
+Recordings are keyed by the PCM fingerprint the result cache uses, so a
+duplicate upload takes no extra space, and are compressed losslessly to
+FLAC. Entries link their recording in their `audio` field. A recording is
+removed once no entry references it (`release`, called when an entry is
+deleted) and after AUDIO_RETENTION_DAYS without a new upload of it
+(`purge_expired`). The purge runs every AUDIO_PURGE_INTERVAL_SECONDS with
+`python -m src.audio_store --purge --every`, as the `audio-retention`
+service of docker-compose.yml does, or once without `--every`.
+
+AUDIO_STORE_BACKEND selects "local" (files under AUDIO_STORE_DIR),
+"gridfs" (the `audio` bucket of the journal database) or "none", the
+default, which keeps no recordings.
+"""
+
+import os
+import logging
+import time
+import argparse
+import subprocess
+from datetime import datetime, timedelta
+import gridfs
+import speech_recognition as sr
+from pymongo.errors import PyMongoError
+from .db import get_collection, get_database
+from .result_cache import audio_fingerprint
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STORE_DIR = "audio_store"
+DEFAULT_RETENTION_DAYS = 30
+DEFAULT_PURGE_INTERVAL_SECONDS = 3600
+# Recordings are stored or touched before their entry is written, so
+# unreferenced ones are only treated as orphans after this long
+ORPHAN_GRACE = timedelta(hours=1)
+
+
+def encode_flac(stream):
+    """
+    Compresses a WAV recording losslessly.
+
+    Args:
+        stream (file): A readable, seekable file object with the WAV data.
+
+    Returns:
+        bytes: The FLAC data.
+
+    Raises:
+        ValueError: If the data is not a readable WAV file.
+        OSError: If the flac encoder is not available.
+    """
+    stream.seek(0)
+    with sr.AudioFile(stream) as source:
+        audio = sr.Recognizer().record(source)
+    stream.seek(0)
+    return audio.get_flac_data()
+
+
+def decode_flac(data):
+    """
+    Restores a recording stored by `encode_flac`.
+
+    Args:
+        data (bytes): The FLAC data.
+
+    Returns:
+        bytes: The WAV file.
+
+    Raises:
+        subprocess.CalledProcessError: If the data cannot be decoded.
+    """
+    return subprocess.run(
+        [sr.get_flac_converter(), "--decode", "--stdout", "--silent", "-"],
+        input=data,
+        capture_output=True,
+        check=True,
+    ).stdout
+
+
+class AudioStore:
+    """
+    Base class for audio stores.
+
+    Subclasses implement `touch`, `write`, `read`, `delete`, `used_at` and
+    `last_used` for a storage medium; blobs are addressed by key only.
+    """
+
+    def archive(self, stream):
+        """
+        Stores a recording unless an identical one is stored already.
+
+        Args:
+            stream (file): A readable, seekable file object with the WAV data.
+
+        Returns:
+            dict: The link for the entry: key, format and stored size.
+        """
+        key = audio_fingerprint(stream)
+        size = self.touch(key)
+        if size is None:
+            data = encode_flac(stream)
+            self.write(key, data)
+            size = len(data)
+        return {"key": key, "format": "flac", "size": size}
+
+    def touch(self, key):
+        """
+        Marks a stored recording as used now.
+
+        Args:
+            key (str): The recording key.
+
+        Returns:
+            int: The stored size, or None if the recording is not stored.
+        """
+        raise NotImplementedError
+
+    def write(self, key, data):
+        """
+        Stores a compressed recording.
+
+        Args:
+            key (str): The recording key.
+            data (bytes): The FLAC data.
+        """
+        raise NotImplementedError
+
+    def read(self, key):
+        """
+        Reads a compressed recording.
+
+        Args:
+            key (str): The recording key.
+
+        Returns:
+            bytes: The FLAC data, or None if the recording is not stored.
+        """
+        raise NotImplementedError
+
+    def delete(self, key):
+        """
+        Deletes a recording, if it is stored.
+
+        Args:
+            key (str): The recording key.
+        """
+        raise NotImplementedError
+
+    def used_at(self, key):
+        """
+        Looks up when a recording was last uploaded.
+
+        Args:
+            key (str): The recording key.
+
+        Returns:
+            datetime: The time in UTC, or None if the recording is not stored.
+        """
+        raise NotImplementedError
+
+    def last_used(self):
+        """
+        Lists the stored recordings.
+
+        Returns:
+            iterable: (key, datetime of the last upload in UTC) pairs.
+        """
+        raise NotImplementedError
+
+
+class LocalAudioStore(AudioStore):
+    """
+    Audio store in a local directory, sharded by the first two key characters.
+    """
+
+    def __init__(self, root=DEFAULT_STORE_DIR):
+        self.root = root
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], f"{key}.flac")
+
+    def touch(self, key):
+        path = self._path(key)
+        try:
+            os.utime(path)
+            return os.path.getsize(path)
+        except FileNotFoundError:
+            return None
+
+    def write(self, key, data):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Written aside and renamed, so readers never see a partial file
+        partial = f"{path}.{os.getpid()}.partial"
+        with open(partial, "wb") as blob:
+            blob.write(data)
+        os.replace(partial, path)
+
+    def read(self, key):
+        try:
+            with open(self._path(key), "rb") as blob:
+                return blob.read()
+        except FileNotFoundError:
+            return None
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def used_at(self, key):
+        try:
+            return datetime.utcfromtimestamp(os.path.getmtime(self._path(key)))
+        except FileNotFoundError:
+            return None
+
+    def last_used(self):
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                if name.endswith(".flac"):
+                    modified = os.path.getmtime(os.path.join(directory, name))
+                    yield name[: -len(".flac")], datetime.utcfromtimestamp(modified)
+
+
+class GridFSAudioStore(AudioStore):
+    """
+    Audio store in a GridFS bucket, with the last use kept in the metadata.
+    """
+
+    def __init__(self, database_getter, bucket_name="audio"):
+        self.database_getter = database_getter
+        self.bucket_name = bucket_name
+
+    def _bucket(self):
+        return gridfs.GridFSBucket(self.database_getter(), self.bucket_name)
+
+    def _files(self):
+        return self.database_getter()[f"{self.bucket_name}.files"]
+
+    def touch(self, key):
+        stored = self._files().find_one_and_update(
+            {"filename": key},
+            {"$set": {"metadata.last_used": datetime.utcnow()}},
+            projection={"length": 1},
+        )
+        return stored["length"] if stored else None
+
+    def write(self, key, data):
+        self._bucket().upload_from_stream(
+            key, data, metadata={"format": "flac", "last_used": datetime.utcnow()}
+        )
+
+    def read(self, key):
+        try:
+            return self._bucket().open_download_stream_by_name(key).read()
+        except gridfs.errors.NoFile:
+            return None
+
+    def delete(self, key):
+        bucket = self._bucket()
+        # Concurrent first uploads may have stored the same key twice
+        for stored in self._files().find({"filename": key}, {"_id": 1}):
+            bucket.delete(stored["_id"])
+
+    def used_at(self, key):
+        stored = self._files().find_one(
+            {"filename": key}, {"uploadDate": 1, "metadata.last_used": 1}
+        )
+        if stored is None:
+            return None
+        return (stored.get("metadata") or {}).get("last_used", stored["uploadDate"])
+
+    def last_used(self):
+        for stored in self._files().find(
+            {}, {"filename": 1, "uploadDate": 1, "metadata.last_used": 1}
+        ):
+            metadata = stored.get("metadata") or {}
+            yield stored["filename"], metadata.get("last_used", stored["uploadDate"])
+
+
+def release(store, entries, key, now=None):
+    """
+    Deletes a recording once no entry references it any more.
+
+    A recording uploaded again within ORPHAN_GRACE is kept, as the entry of
+    that upload may not have been written yet; the purge removes it later if
+    it stays unreferenced.
+
+    Args:
+        store (AudioStore): The store.
+        entries (pymongo.collection.Collection): The entries collection.
+        key (str): The recording key.
+        now (datetime): The current UTC time, for tests.
+
+    Returns:
+        bool: Whether the recording was deleted.
+    """
+    if entries.find_one({"audio.key": key}, {"_id": 1}) is not None:
+        return False
+    used = store.used_at(key)
+    if used is not None and used >= (now or datetime.utcnow()) - ORPHAN_GRACE:
+        return False
+    store.delete(key)
+    logger.info("Released recording %s", key)
+    return True
+
+
+def purge_expired(store, entries, retention_days, now=None):
+    """
+    Deletes recordings not uploaded again within the retention period, and
+    recordings no entry references.
+
+    Entries that linked an expired recording keep their transcript; only the
+    link is removed.
+
+    Args:
+        store (AudioStore): The store.
+        entries (pymongo.collection.Collection): The entries collection.
+        retention_days (float): Days to keep recordings; 0 keeps them until
+            their entries are deleted.
+        now (datetime): The current UTC time, for tests.
+
+    Returns:
+        dict: The number of expired and orphaned recordings deleted.
+    """
+    now = now or datetime.utcnow()
+    expires = now - timedelta(days=retention_days) if retention_days else None
+    purged = {"expired": 0, "orphaned": 0}
+    for key, used in list(store.last_used()):
+        if expires is not None and used < expires:
+            entries.update_many({"audio.key": key}, {"$unset": {"audio": ""}})
+            store.delete(key)
+            purged["expired"] += 1
+        elif used < now - ORPHAN_GRACE and release(store, entries, key, now):
+            purged["orphaned"] += 1
+    return purged
+
+
+def create_audio_store(backend=None, database_getter=None):
+    """
+    Creates the audio store for the configured backend.
+
+    Args:
+        backend (str): "local", "gridfs" or "none". Defaults to
+            AUDIO_STORE_BACKEND.
+        database_getter (callable): Returns the journal database; required
+            for the "gridfs" backend.
+
+    Returns:
+        AudioStore: The store, or None if recordings are not kept.
+
+    Raises:
+        ValueError: If the backend is unknown.
+    """
+    backend = backend or os.getenv("AUDIO_STORE_BACKEND", "none")
+    if backend == "none":
+        return None
+    if backend == "local":
+        return LocalAudioStore(os.getenv("AUDIO_STORE_DIR", DEFAULT_STORE_DIR))
+    if backend == "gridfs":
+        return GridFSAudioStore(database_getter)
+    raise ValueError(f"Unknown audio store backend: {backend}")
+
+
+def main(argv=None):
+    """
+    Applies the retention policy to the configured store, once or on a
+    schedule.
+
+    Args:
+        argv (list): The command line arguments; defaults to sys.argv.
+
+    Returns:
+        dict: The number of recordings deleted by a single purge, or None if
+            no store is set up.
+    """
+    parser = argparse.ArgumentParser(description="Manage the stored recordings.")
+    parser.add_argument("--purge", action="store_true", help="apply the retention")
+    parser.add_argument(
+        "--retention-days",
+        type=float,
+        default=float(os.getenv("AUDIO_RETENTION_DAYS", str(DEFAULT_RETENTION_DAYS))),
+    )
+    parser.add_argument(
+        "--every",
+        action="store_true",
+        help="purge every AUDIO_PURGE_INTERVAL_SECONDS until stopped",
+    )
+    options = parser.parse_args(argv)
+    store = create_audio_store(database_getter=get_database)
+    if store is None or not options.purge:
+        return None
+    if not options.every:
+        return purge_once(store, options.retention_days)
+    interval = float(
+        os.getenv("AUDIO_PURGE_INTERVAL_SECONDS", str(DEFAULT_PURGE_INTERVAL_SECONDS))
+    )
+    while True:
+        try:
+            purge_once(store, options.retention_days)
+        except (OSError, PyMongoError) as error:
+            # Try again at the next interval
+            logger.error("Purge failed: %s", error)
+        time.sleep(interval)
+
+
+def purge_once(store, retention_days):
+    """
+    Runs one purge of the store and logs its outcome.
+
+    Args:
+        store (AudioStore): The store.
+        retention_days (float): Days to keep recordings.
+
+    Returns:
+        dict: The number of expired and orphaned recordings deleted.
+    """
+    purged = purge_expired(store, get_collection("entries"), retention_days)
+    logger.info(
+        "Purged %d expired and %d orphaned recordings",
+        purged["expired"],
+        purged["orphaned"],
+    )
+    return purged
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
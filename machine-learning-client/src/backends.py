@@ -0,0 +1,179 @@
+"""
+Pluggable speech-to-text backends.
+
+Backends are registered by name with `register_backend` and chosen through the
+TRANSCRIPTION_BACKEND setting. Every backend takes speech_recognition AudioData
+and raises speech_recognition's UnknownValueError or RequestError on failure,
+so callers handle all engines the same way.
+"""
+
+import os
+import hashlib
+import speech_recognition as sr
+from .chunking import SAMPLE_WIDTH, DEFAULT_ENERGY_THRESHOLD, rms
+
+DEFAULT_BACKEND = "google"
+
+_REGISTRY = {}
+
+
+def register_backend(name):
+    """
+    Class decorator that registers a transcription backend under a name.
+
+    Args:
+        name (str): The name used in the TRANSCRIPTION_BACKEND setting.
+
+    Returns:
+        callable: The decorator.
+    """
+
+    def decorator(cls):
+        cls.name = name
+        _REGISTRY[name] = cls
+        return cls
+
+    return decorator
+
+
+def available_backends():
+    """
+    Lists the registered backends.
+
+    Returns:
+        list: The backend names, sorted.
+    """
+    return sorted(_REGISTRY)
+
+
+def configured_backend_name():
+    """
+    Returns the backend selected by the TRANSCRIPTION_BACKEND setting.
+
+    Returns:
+        str: The backend name.
+    """
+    return os.getenv("TRANSCRIPTION_BACKEND", DEFAULT_BACKEND)
+
+
+def get_backend(name=None, recognizer=None):
+    """
+    Creates the backend with the given name.
+
+    Args:
+        name (str): The backend name. Defaults to the TRANSCRIPTION_BACKEND
+            setting, or "google".
+        recognizer (speech_recognition.Recognizer): Recognizer to reuse.
+
+    Returns:
+        TranscriptionBackend: The backend instance.
+
+    Raises:
+        ValueError: If no backend is registered under the name.
+    """
+    name = name or configured_backend_name()
+    try:
+        backend_class = _REGISTRY[name]
+    except KeyError as error:
+        raise ValueError(
+            f"Unknown transcription backend {name!r}; "
+            f"available: {', '.join(available_backends())}"
+        ) from error
+    return backend_class(recognizer)
+
+
+class TranscriptionBackend:
+    """
+    Base class for transcription backends.
+
+    Subclasses implement `transcribe`. Backends that can handle several clips
+    in one call set `supports_batch` and override `transcribe_batch`.
+    """
+
+    name = None
+    supports_batch = False
+
+    def __init__(self, recognizer=None):
+        self.recognizer = recognizer or sr.Recognizer()
+
+    def transcribe(self, audio):
+        """
+        Transcribes one clip.
+
+        Args:
+            audio (speech_recognition.AudioData): The clip.
+
+        Returns:
+            str: The transcript.
+
+        Raises:
+            speech_recognition.UnknownValueError: If the speech is unintelligible.
+            speech_recognition.RequestError: If the engine cannot be reached.
+        """
+        raise NotImplementedError
+
+    def transcribe_batch(self, audios):
+        """
+        Transcribes several clips.
+
+        Args:
+            audios (list): speech_recognition.AudioData clips.
+
+        Returns:
+            list: For each clip, the transcript or the exception it raised.
+        """
+        results = []
+        for audio in audios:
+            try:
+                results.append(self.transcribe(audio))
+            except (sr.UnknownValueError, sr.RequestError) as error:
+                results.append(error)
+        return results
+
+
+@register_backend("google")
+class GoogleBackend(TranscriptionBackend):
+    """Google Web Speech API; one network round trip per clip."""
+
+    def transcribe(self, audio):
+        return self.recognizer.recognize_google(audio)
+
+
+@register_backend("sphinx")
+class SphinxBackend(TranscriptionBackend):
+    """
+    Offline CMU Sphinx engine for isolated hosts.
+
+    Needs the optional pocketsphinx package; without it every call raises
+    RequestError.
+    """
+
+    def transcribe(self, audio):
+        return self.recognizer.recognize_sphinx(audio)
+
+
+@register_backend("stub")
+class StubBackend(TranscriptionBackend):
+    """
+    Deterministic local stand-in for tests and benchmarks.
+
+    Picks a phrase from the content hash of the audio, so the same clip always
+    yields the same transcript, and treats silent clips as unintelligible like
+    a real engine would. Handles whole batches in one call.
+    """
+
+    supports_batch = True
+    PHRASES = (
+        "today was a really good day",
+        "I feel tired and a bit sad",
+        "I went to the store and came back home",
+        "this is the best news I have heard all year",
+        "the meeting was terrible and far too long",
+    )
+
+    def transcribe(self, audio):
+        pcm_data = audio.get_raw_data(convert_width=SAMPLE_WIDTH)
+        if rms(pcm_data) < DEFAULT_ENERGY_THRESHOLD:
+            raise sr.UnknownValueError()
+        digest = hashlib.sha256(pcm_data).digest()
+        return self.PHRASES[digest[0] % len(self.PHRASES)]
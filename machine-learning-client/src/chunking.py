@@ -0,0 +1,99 @@
+"""
+Splits 16-bit PCM audio into chunks at silence boundaries.
+
+Long recordings are cut into pieces no longer than a configurable maximum so
+they can be transcribed in parallel. Cuts are placed in the middle of the
+most recent quiet stretch, so words are not split in half.
+"""
+
+import math
+from array import array
+
+SAMPLE_WIDTH = 2  # chunking works on 16-bit samples
+# Same default as speech_recognition.Recognizer.energy_threshold
+DEFAULT_ENERGY_THRESHOLD = 300
+WINDOW_MS = 30
+
+
+def rms(pcm_data):
+    """
+    Computes the root mean square energy of 16-bit little-endian samples.
+
+    Args:
+        pcm_data (bytes): The samples.
+
+    Returns:
+        float: The RMS energy, 0.0 for empty input.
+    """
+    samples = array("h")
+    samples.frombytes(pcm_data[: len(pcm_data) - len(pcm_data) % SAMPLE_WIDTH])
+    if not samples:
+        return 0.0
+    return math.sqrt(sum(sample * sample for sample in samples) / len(samples))
+
+
+def _to_bytes(seconds, sample_rate):
+    size = int(seconds * sample_rate) * SAMPLE_WIDTH
+    return max(size, SAMPLE_WIDTH)
+
+
+def _voiced(pcm_data, start, end, window, energy_threshold):
+    return any(
+        rms(pcm_data[offset : min(offset + window, end)]) >= energy_threshold
+        for offset in range(start, end, window)
+    )
+
+
+def split_on_silence(
+    pcm_data,
+    sample_rate,
+    max_chunk_seconds=15.0,
+    min_chunk_seconds=2.0,
+    energy_threshold=DEFAULT_ENERGY_THRESHOLD,
+):
+    """
+    Finds chunk boundaries in 16-bit mono PCM audio.
+
+    The audio is scanned in 30 ms windows. Once a chunk reaches the maximum
+    length it is cut in the middle of the last silent window seen after the
+    minimum length, or at the current position if there was none.
+
+    Args:
+        pcm_data (bytes): The samples.
+        sample_rate (int): Samples per second.
+        max_chunk_seconds (float): Upper bound on the length of a chunk.
+        min_chunk_seconds (float): A chunk is never cut at silence before this.
+        energy_threshold (float): RMS energy below which a window is silent.
+
+    Returns:
+        list: (start, end) byte offsets of the chunks, in order. Chunks that
+        are silent throughout are left out.
+    """
+    window = _to_bytes(WINDOW_MS / 1000, sample_rate)
+    max_bytes = max(_to_bytes(max_chunk_seconds, sample_rate), window)
+    min_bytes = _to_bytes(min_chunk_seconds, sample_rate)
+
+    chunks = []
+    start = 0
+    cut_point = None
+    voiced = False
+    for offset in range(0, len(pcm_data), window):
+        end = min(offset + window, len(pcm_data))
+        if rms(pcm_data[offset:end]) >= energy_threshold:
+            voiced = True
+        elif offset - start >= min_bytes:
+            # Middle of the window, on a sample boundary
+            cut_point = offset + (end - offset) // (2 * SAMPLE_WIDTH) * SAMPLE_WIDTH
+
+        if end - start >= max_bytes:
+            cut = cut_point if cut_point and cut_point > start else end
+            if voiced:
+                chunks.append((start, cut))
+            # Only the part after the cut carries over into the next chunk
+            voiced = _voiced(pcm_data, cut, end, window, energy_threshold)
+            start = cut
+            cut_point = None
+
+    if start < len(pcm_data) and voiced:
+        chunks.append((start, len(pcm_data)))
+    return chunks
@@ -0,0 +1,217 @@
+"""
+Index management for the voice_mood_journal database.
+
+`ensure_indexes` creates the indexes behind the hot queries of both services
+and is run once at startup from the gunicorn `on_starting` hook.
+`verify_query_plans` explains each hot query and fails if any of them would
+fall back to a collection scan. Run `python -m src.indexes --verify` to do
+both by hand.
+"""
+
+import os
+import sys
+import logging
+from datetime import datetime
+from bson.objectid import ObjectId
+from pymongo import ASCENDING, DESCENDING, TEXT
+from pymongo.errors import ConnectionFailure, PyMongoError
+from .db import get_database, close_client
+
+logger = logging.getLogger(__name__)
+
+# Finished upload jobs are deleted this long after they finished
+JOB_RETENTION_SECONDS = int(os.getenv("JOB_RETENTION_SECONDS", str(24 * 3600)))
+
+INDEXES = {
+    "entries": [
+        (
+            [("user_id", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)],
+            {},
+        ),
+        # Transcript search; user_id is a prefix, so a search reads one
+        # user's postings only
+        (
+            [("user_id", ASCENDING), ("transcript", TEXT)],
+            {"default_language": "english"},
+        ),
+    ],
+    "users": [
+        ([("username", ASCENDING)], {"unique": True}),
+    ],
+    "jobs": [
+        ([("status", ASCENDING), ("created_at", ASCENDING)], {}),
+        ([("finished_at", ASCENDING)], {"expireAfterSeconds": JOB_RETENTION_SECONDS}),
+    ],
+    "mood_rollups": [
+        ([("user_id", ASCENDING), ("day", ASCENDING)], {"unique": True}),
+    ],
+}
+
+# Indexes replaced by the ones above, dropped when found
+SUPERSEDED_INDEXES = {
+    "entries": ["user_id_1_timestamp_-1"],
+}
+
+# Hot queries, built against placeholder values; only their plans matter
+HOT_QUERIES = {
+    "login": lambda db: db["users"].find({"username": ""}),
+    "load_user": lambda db: db["users"].find({"_id": ObjectId()}),
+    "recent_entries": lambda db: db["entries"]
+    .find({"user_id": ""})
+    .sort([("timestamp", -1), ("_id", -1)])
+    .limit(101),
+    "mood_trends": lambda db: db["mood_rollups"]
+    .find({"user_id": "", "day": {"$gte": datetime(2000, 1, 1)}})
+    .sort("day", 1),
+    "claim_job": lambda db: db["jobs"]
+    .find(
+        {
+            "$or": [
+                {"status": "queued"},
+                {
+                    "status": "running",
+                    "lease_expires_at": {"$lt": datetime(2000, 1, 1)},
+                },
+            ]
+        }
+    )
+    .sort("created_at", 1)
+    .limit(1),
+    "search": lambda db: db["entries"]
+    .find({"user_id": "", "$text": {"$search": "journal"}})
+    .limit(21),
+}
+
+
+def ensure_indexes(database):
+    """
+    Creates the indexes behind the hot queries and drops superseded ones.
+
+    A failed index, e.g. a unique index over existing duplicates, is logged
+    and the remaining indexes are still created; an unreachable server stops
+    the run, since every other index would fail the same way.
+
+    Args:
+        database (pymongo.database.Database): The journal database.
+
+    Returns:
+        list: The names of the ensured indexes.
+
+    Raises:
+        RuntimeError: If any index could not be created or dropped, after
+            all others were processed.
+        ConnectionFailure: If the server cannot be reached.
+    """
+    names = []
+    failed = []
+    for collection_name, specs in INDEXES.items():
+        for keys, options in specs:
+            try:
+                names.append(database[collection_name].create_index(keys, **options))
+            except ConnectionFailure:
+                raise
+            except PyMongoError as error:
+                logger.error(
+                    "Could not create index %s on %s: %s", keys, collection_name, error
+                )
+                failed.append(f"{collection_name} {keys}")
+    for collection_name, superseded in SUPERSEDED_INDEXES.items():
+        try:
+            existing = database[collection_name].index_information()
+            for name in superseded:
+                if name in existing:
+                    database[collection_name].drop_index(name)
+                    logger.info("Dropped superseded index %s", name)
+        except ConnectionFailure:
+            raise
+        except PyMongoError as error:
+            logger.error(
+                "Could not drop superseded indexes on %s: %s", collection_name, error
+            )
+            failed.append(f"{collection_name} superseded")
+    logger.info("Ensured indexes: %s", ", ".join(names))
+    if failed:
+        raise RuntimeError(f"Indexes could not be ensured: {', '.join(failed)}")
+    return names
+
+
+def plan_stages(plan):
+    """
+    Lists the stages of an explain plan, from the root down.
+
+    Args:
+        plan (dict): A plan node, e.g. `queryPlanner.winningPlan`.
+
+    Returns:
+        list: The stage names.
+    """
+    stages = [plan["stage"]] if "stage" in plan else []
+    children = list(plan.get("inputStages", []))
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            children.append(plan[key])
+    for child in children:
+        stages.extend(plan_stages(child))
+    return stages
+
+
+def verify_query_plans(database, queries=None):
+    """
+    Explains every hot query and checks that none uses a collection scan.
+
+    Args:
+        database (pymongo.database.Database): The journal database.
+        queries (dict): Query builders by name. Defaults to HOT_QUERIES.
+
+    Returns:
+        dict: The winning plan stages of each query.
+
+    Raises:
+        RuntimeError: If any query falls back to a collection scan.
+    """
+    plans = {}
+    for name, build_query in (queries or HOT_QUERIES).items():
+        explanation = build_query(database).explain()
+        plans[name] = plan_stages(explanation["queryPlanner"]["winningPlan"])
+
+    scans = sorted(name for name, stages in plans.items() if "COLLSCAN" in stages)
+    if scans:
+        raise RuntimeError(
+            f"Queries fall back to a collection scan: {', '.join(scans)}"
+        )
+    return plans
+
+
+def run_startup_bootstrap():
+    """
+    Ensures indexes at service startup, configured through the environment.
+
+    MONGO_BOOTSTRAP_INDEXES=false skips the bootstrap. With
+    MONGO_VERIFY_QUERY_PLANS=true the query plans are verified as well and any
+    failure is raised, which stops gunicorn from starting; otherwise failures
+    are only logged.
+    """
+    if os.getenv("MONGO_BOOTSTRAP_INDEXES", "true").lower() != "true":
+        return
+    strict = os.getenv("MONGO_VERIFY_QUERY_PLANS", "false").lower() == "true"
+
+    try:
+        ensure_indexes(get_database())
+        if strict:
+            verify_query_plans(get_database())
+    except (PyMongoError, RuntimeError) as error:
+        logger.error("Index bootstrap failed: %s", error)
+        if strict:
+            raise
+    finally:
+        # Runs in the gunicorn master; workers open their own clients
+        close_client()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    ensure_indexes(get_database())
+    if "--verify" in sys.argv[1:]:
+        for query_name, query_stages in verify_query_plans(get_database()).items():
+            print(f"{query_name}: {' -> '.join(query_stages)}")
+    close_client()
@@ -0,0 +1,293 @@
+"""
+Bulk ingestion of the recordings in AUDIO_DIR.
+
+Every WAV file in the directory is transcribed and analyzed on a process
+pool. The results are stored in batches with insert_many. Handled files are
+recorded in a checkpoint file, so an interrupted run picks up where it
+stopped. With --watch the directory is polled for new files. Each pass
+reports its throughput in files and audio seconds per second.
+
+Run with `python -m src.ingest` or through `src.main.main`.
+"""
+
+import os
+import json
+import time
+import wave
+import logging
+import argparse
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from pymongo.errors import PyMongoError
+from .db import get_collection
+from .utils import get_audio_files, transcribe_audio, analyze_sentiment, store_many
+
+logger = logging.getLogger(__name__)
+
+# Kept next to the recordings unless configured otherwise
+CHECKPOINT_NAME = ".ingest_checkpoint.jsonl"
+
+
+def audio_duration(path):
+    """
+    Reads the length of a WAV file.
+
+    Args:
+        path (str): The WAV file.
+
+    Returns:
+        float: The duration in seconds, 0 if the file cannot be read.
+    """
+    try:
+        with wave.open(path) as wav_file:
+            return wav_file.getnframes() / float(wav_file.getframerate())
+    except (wave.Error, EOFError, OSError):
+        return 0.0
+
+
+def ingest_file(path):
+    """
+    Transcribes one file and analyzes its sentiment. Runs in a pool process.
+
+    Args:
+        path (str): The WAV file.
+
+    Returns:
+        dict: The path, duration, and the transcript and sentiment, or the
+            error if the file could not be processed.
+    """
+    result = {"path": path, "duration": audio_duration(path)}
+    try:
+        text = transcribe_audio(path)
+    except (RuntimeError, ValueError, EOFError, OSError) as error:
+        return dict(result, error=str(error))
+    return dict(result, transcript=text, sentiment=analyze_sentiment(text))
+
+
+class Checkpoint:
+    """
+    Append-only record of the files already handled.
+
+    A file is identified by its path, size and modification time, so a file
+    that is replaced is ingested again.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.done = set()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as checkpoint:
+                self.done = {
+                    json.loads(line)["key"] for line in checkpoint if line.strip()
+                }
+
+    @staticmethod
+    def key(path):
+        """
+        Identifies a file.
+
+        Args:
+            path (str): The file.
+
+        Returns:
+            str: The path, size and modification time of the file.
+        """
+        status = os.stat(path)
+        return f"{os.path.abspath(path)}:{status.st_size}:{status.st_mtime_ns}"
+
+    def record(self, results):
+        """
+        Marks files as handled, durably.
+
+        Args:
+            results (list): Results of `ingest_file`.
+        """
+        with open(self.path, "a", encoding="utf-8") as checkpoint:
+            for result in results:
+                line = {"key": result["key"], "status": result["status"]}
+                checkpoint.write(json.dumps(line) + "\n")
+                self.done.add(result["key"])
+            checkpoint.flush()
+            os.fsync(checkpoint.fileno())
+
+
+def pending_files(directory, checkpoint, settle_seconds=0.0):
+    """
+    Lists the audio files of a directory that have not been handled yet.
+
+    Args:
+        directory (str): The directory to scan.
+        checkpoint (Checkpoint): The files already handled.
+        settle_seconds (float): Skip files modified more recently than this,
+            as they may still be being written.
+
+    Returns:
+        list: The paths, sorted.
+    """
+    now = time.time()
+    return sorted(
+        path
+        for path in get_audio_files(directory)
+        if Checkpoint.key(path) not in checkpoint.done
+        and now - os.path.getmtime(path) >= settle_seconds
+    )
+
+
+def store_results(results, user_id, checkpoint):
+    """
+    Stores successful results with one insert_many and checkpoints the batch.
+
+    Args:
+        results (list): Results of `ingest_file`, with their checkpoint keys.
+        user_id (str): The user the entries are filed under.
+        checkpoint (Checkpoint): The checkpoint to update.
+
+    Returns:
+        int: The number of entries stored.
+    """
+    processed = [result for result in results if "error" not in result]
+    entries = [
+        {
+            "user_id": user_id,
+            "file_name": os.path.basename(result["path"]),
+            "transcript": result["transcript"],
+            "sentiment": result["sentiment"],
+            "timestamp": datetime.utcnow(),
+        }
+        for result in processed
+    ]
+    try:
+        failed = set(store_many(get_collection("entries"), entries))
+    except PyMongoError as error:
+        logger.error("Failed to store %d entries: %s", len(entries), error)
+        failed = set(range(len(entries)))
+    # Entries MongoDB rejected, or never received, are left out of the
+    # checkpoint, so the next pass tries them again
+    unstored = {id(processed[position]) for position in failed}
+    for result in results:
+        stored = "error" not in result and id(result) not in unstored
+        result["status"] = "stored" if stored else "failed"
+        if "error" in result:
+            logger.error("Failed to ingest %s: %s", result["path"], result["error"])
+    checkpoint.record([result for result in results if id(result) not in unstored])
+    return len(entries) - len(failed)
+
+
+def ingest_pass(files, options, checkpoint, executor=None):
+    """
+    Ingests a list of files and reports the throughput.
+
+    Args:
+        files (list): The WAV files.
+        options (argparse.Namespace): The command line options.
+        checkpoint (Checkpoint): The checkpoint to update.
+        executor (concurrent.futures.Executor): Pool to process files on;
+            files are processed in this process if omitted.
+
+    Returns:
+        dict: Files handled and stored, audio seconds, elapsed time and rates.
+    """
+    started = time.perf_counter()
+    mapper = executor.map if executor else map
+    stats = {"files": 0, "stored": 0, "audio_seconds": 0.0}
+    # Identify files before processing them, so a file replaced meanwhile is
+    # picked up again
+    keys = {path: Checkpoint.key(path) for path in files}
+    batch = []
+    for result in mapper(ingest_file, files):
+        result["key"] = keys[result["path"]]
+        batch.append(result)
+        stats["files"] += 1
+        stats["audio_seconds"] += result["duration"]
+        if len(batch) >= options.batch_size:
+            stats["stored"] += store_results(batch, options.user_id, checkpoint)
+            batch = []
+    if batch:
+        stats["stored"] += store_results(batch, options.user_id, checkpoint)
+
+    elapsed = time.perf_counter() - started
+    stats["elapsed"] = elapsed
+    stats["files_per_second"] = stats["files"] / elapsed if elapsed else 0.0
+    stats["audio_seconds_per_second"] = (
+        stats["audio_seconds"] / elapsed if elapsed else 0.0
+    )
+    return stats
+
+
+def parse_args(argv=None):
+    """
+    Parses the command line.
+
+    Args:
+        argv (list): The arguments; defaults to sys.argv.
+
+    Returns:
+        argparse.Namespace: The options.
+    """
+    parser = argparse.ArgumentParser(
+        description="Bulk-ingest the WAV files in a folder."
+    )
+    parser.add_argument("--audio-dir", default=os.getenv("AUDIO_DIR", "audio"))
+    parser.add_argument(
+        "--user-id",
+        default=os.getenv("INGEST_USER_ID"),
+        required=not os.getenv("INGEST_USER_ID"),
+        help="the user the entries are filed under; defaults to INGEST_USER_ID",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=int(os.getenv("INGEST_WORKERS", "4"))
+    )
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--checkpoint", default=os.getenv("INGEST_CHECKPOINT"))
+    parser.add_argument("--watch", action="store_true", help="keep polling for files")
+    parser.add_argument("--poll-interval", type=float, default=5.0)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """
+    Runs the ingestion, once or, with --watch, until interrupted.
+
+    Args:
+        argv (list): The command line arguments; defaults to sys.argv.
+
+    Returns:
+        dict: The totals over all passes.
+    """
+    options = parse_args(argv)
+    checkpoint = Checkpoint(
+        options.checkpoint or os.path.join(options.audio_dir, CHECKPOINT_NAME)
+    )
+    totals = {"files": 0, "stored": 0, "audio_seconds": 0.0}
+    executor = ProcessPoolExecutor(options.workers) if options.workers > 1 else None
+    try:
+        while True:
+            files = pending_files(
+                options.audio_dir,
+                checkpoint,
+                settle_seconds=options.poll_interval if options.watch else 0.0,
+            )
+            if files:
+                stats = ingest_pass(files, options, checkpoint, executor)
+                for name in totals:
+                    totals[name] += stats[name]
+                print(
+                    f"Ingested {stats['files']} files ({stats['stored']} stored) "
+                    f"in {stats['elapsed']:.1f}s: "
+                    f"{stats['files_per_second']:.2f} files/s, "
+                    f"{stats['audio_seconds_per_second']:.2f} audio-s/s"
+                )
+            if not options.watch:
+                break
+            time.sleep(options.poll_interval)
+    except KeyboardInterrupt:
+        logger.info("Ingestion interrupted; the checkpoint is up to date")
+    finally:
+        if executor:
+            executor.shutdown(cancel_futures=True)
+    return totals
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,163 @@
+"""
+Prometheus metrics for the machine learning client.
+
+Clips are timed per stage (the result cache lookup, transcription, sentiment
+analysis and the MongoDB write), and every instrumented endpoint
+counts its requests by status and reports how many are in flight. The
+MongoDB connection pool reports its open and checked-out connections,
+checkouts and the time spent waiting for a connection.
+
+When PROMETHEUS_MULTIPROC_DIR is set, as gunicorn.conf.py does, every worker
+writes its samples to files in that directory and `/metrics` sums them up
+across workers. The variable has to be set before prometheus_client is
+imported.
+"""
+
+import os
+import time
+import shutil
+import functools
+from contextlib import contextmanager
+from flask import Response, make_response
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from .tracing import record_span
+
+# From a millisecond up to transcriptions of long recordings
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+STAGE_SECONDS = Histogram(
+    "ml_client_stage_duration_seconds",
+    "Time spent in each stage of processing a clip.",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+REQUEST_SECONDS = Histogram(
+    "ml_client_request_duration_seconds",
+    "Time spent handling a request.",
+    ["endpoint"],
+    buckets=LATENCY_BUCKETS,
+)
+REQUESTS = Counter(
+    "ml_client_requests_total",
+    "Requests handled, by status code.",
+    ["endpoint", "status"],
+)
+IN_FLIGHT = Gauge(
+    "ml_client_requests_in_flight",
+    "Requests being handled.",
+    ["endpoint"],
+    multiprocess_mode="livesum",
+)
+
+POOL_CONNECTIONS = Gauge(
+    "ml_client_mongo_pool_connections",
+    "MongoDB connections, open or checked out of the pool.",
+    ["state"],
+    multiprocess_mode="livesum",
+)
+POOL_CHECKOUTS = Counter(
+    "ml_client_mongo_pool_checkouts_total",
+    "Connection checkouts from the MongoDB pool, by outcome.",
+    ["outcome"],
+)
+POOL_WAIT_SECONDS = Histogram(
+    "ml_client_mongo_pool_wait_seconds",
+    "Time spent waiting to check a connection out of the MongoDB pool.",
+    buckets=LATENCY_BUCKETS,
+)
+
+
+@contextmanager
+def timed_stage(stage):
+    """
+    Records the duration of a block as a processing stage and as a span of
+    the current request, also if it raises.
+
+    Args:
+        stage (str): The stage name, e.g. "transcribe".
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.labels(stage).observe(elapsed)
+        record_span(stage, elapsed)
+
+
+def track_requests(endpoint):
+    """
+    Decorates a view to count, time and gauge its requests.
+
+    Args:
+        endpoint (str): The label for the view.
+
+    Returns:
+        callable: The decorator.
+    """
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            status = 500
+            with IN_FLIGHT.labels(endpoint).track_inprogress():
+                try:
+                    response = make_response(view(*args, **kwargs))
+                    status = response.status_code
+                    return response
+                finally:
+                    REQUESTS.labels(endpoint, str(status)).inc()
+                    REQUEST_SECONDS.labels(endpoint).observe(
+                        time.perf_counter() - started
+                    )
+
+        return wrapper
+
+    return decorator
+
+
+def metrics_response():
+    """
+    Renders all metrics in the Prometheus text format.
+
+    Returns:
+        Response: The metrics of all workers in multiprocess mode, otherwise
+            those of this process.
+    """
+    registry = REGISTRY
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
+
+
+def reset_multiprocess_dir():
+    """
+    Empties the multiprocess directory, so samples of an earlier run are not
+    added to this one. Call in the gunicorn master before workers start.
+    """
+    path = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    if path:
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path, exist_ok=True)
+
+
+def mark_worker_dead(pid):
+    """
+    Drops the live gauges of a worker that exited.
+
+    Args:
+        pid (int): The process ID of the worker.
+    """
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(pid)
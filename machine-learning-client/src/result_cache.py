@@ -0,0 +1,207 @@
+"""
+Deduplication cache for audio processing results.
+
+Results are keyed by a content hash of the PCM samples, so a re-uploaded
+recording reuses the earlier transcript and sentiment instead of being
+processed again. Entries expire after a TTL: through a TTL index in MongoDB,
+or by timestamp in the local store used for tests.
+"""
+
+import os
+import time
+import wave
+import hashlib
+import logging
+import threading
+from datetime import datetime
+from pymongo.errors import PyMongoError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+_BLOCK_SIZE = 64 * 1024
+
+
+def audio_fingerprint(stream):
+    """
+    Computes a content hash of the PCM samples of a WAV file.
+
+    Only the sample format and the frames are hashed, so copies that differ
+    in header metadata map to the same key. Data that is not WAV is hashed as
+    raw bytes. The stream is rewound afterwards.
+
+    Args:
+        stream (file): A readable, seekable binary file object.
+
+    Returns:
+        str: The hex SHA-256 digest.
+    """
+    digest = hashlib.sha256()
+    stream.seek(0)
+    try:
+        with wave.open(stream) as wav_file:
+            digest.update(
+                f"{wav_file.getnchannels()}:{wav_file.getsampwidth()}:"
+                f"{wav_file.getframerate()}:".encode()
+            )
+            frames = wav_file.readframes(_BLOCK_SIZE)
+            while frames:
+                digest.update(frames)
+                frames = wav_file.readframes(_BLOCK_SIZE)
+    except (wave.Error, EOFError):
+        digest = hashlib.sha256()
+        stream.seek(0)
+        for block in iter(lambda: stream.read(_BLOCK_SIZE), b""):
+            digest.update(block)
+    stream.seek(0)
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    Base class keeping hit/miss counters for the cache backends.
+    """
+
+    def __init__(self, ttl_seconds=DEFAULT_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._stats_lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "bypassed": 0}
+
+    def _count(self, name):
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    def record_bypass(self):
+        """Counts a request that skipped the cache."""
+        self._count("bypassed")
+
+    def stats(self):
+        """
+        Reports cache usage of this process.
+
+        Returns:
+            dict: Hit, miss and bypass counts and the hit rate.
+        """
+        with self._stats_lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+    def get(self, key):
+        """
+        Looks up a cached result.
+
+        Args:
+            key (str): The content hash.
+
+        Returns:
+            dict: The cached result, or None on a miss.
+        """
+        result = self._get(key)
+        self._count("hits" if result is not None else "misses")
+        return result
+
+    def put(self, key, result):
+        """
+        Stores a result.
+
+        Args:
+            key (str): The content hash.
+            result (dict): The transcript and sentiment to cache.
+        """
+        raise NotImplementedError
+
+    def _get(self, key):
+        raise NotImplementedError
+
+
+class LocalResultCache(ResultCache):
+    """
+    In-process result cache for tests and single-process runs.
+    """
+
+    def __init__(self, ttl_seconds=DEFAULT_TTL_SECONDS):
+        super().__init__(ttl_seconds)
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, result = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            return dict(result)
+
+    def put(self, key, result):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, dict(result))
+
+
+class MongoResultCache(ResultCache):
+    """
+    Result cache stored in a MongoDB collection with a TTL index.
+    """
+
+    def __init__(self, collection_getter, ttl_seconds=DEFAULT_TTL_SECONDS):
+        super().__init__(ttl_seconds)
+        self._collection_getter = collection_getter
+        self._index_ready = False
+
+    def _collection(self):
+        collection = self._collection_getter()
+        if not self._index_ready:
+            collection.create_index("created_at", expireAfterSeconds=self.ttl_seconds)
+            self._index_ready = True
+        return collection
+
+    def _get(self, key):
+        try:
+            document = self._collection().find_one({"_id": key})
+        except PyMongoError as error:
+            logger.error("Result cache lookup failed: %s", error)
+            return None
+        return document["result"] if document else None
+
+    def put(self, key, result):
+        try:
+            self._collection().update_one(
+                {"_id": key},
+                {"$set": {"result": result, "created_at": datetime.utcnow()}},
+                upsert=True,
+            )
+        except PyMongoError as error:
+            logger.error("Result cache write failed: %s", error)
+
+
+def create_result_cache(backend=None, collection_getter=None, ttl_seconds=None):
+    """
+    Creates the result cache for the configured backend.
+
+    Args:
+        backend (str): "mongo" or "local". Defaults to RESULT_CACHE_BACKEND.
+        collection_getter (callable): Returns the cache collection; required
+            for the "mongo" backend.
+        ttl_seconds (int): Lifetime of cached results. Defaults to
+            RESULT_CACHE_TTL_SECONDS.
+
+    Returns:
+        ResultCache: The cache.
+
+    Raises:
+        ValueError: If the backend is unknown.
+    """
+    backend = backend or os.getenv("RESULT_CACHE_BACKEND", "mongo")
+    if ttl_seconds is None:
+        ttl_seconds = int(
+            os.getenv("RESULT_CACHE_TTL_SECONDS", str(DEFAULT_TTL_SECONDS))
+        )
+    if backend == "local":
+        return LocalResultCache(ttl_seconds)
+    if backend == "mongo":
+        return MongoResultCache(collection_getter, ttl_seconds)
+    raise ValueError(f"Unknown result cache backend: {backend}")
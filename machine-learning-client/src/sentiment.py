@@ -0,0 +1,142 @@
+"""
+Batched, cached sentiment analysis.
+
+Sentiment is computed once per text with a single shared TextBlob pattern
+analyzer, and results are kept in a bounded LRU cache keyed on the
+whitespace-normalized transcript.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from textblob.sentiments import PatternAnalyzer
+
+
+def mood_from_polarity(polarity):
+    """
+    Maps a polarity score to a mood label.
+
+    Args:
+        polarity (float): The polarity, from -1 to 1.
+
+    Returns:
+        str: "Positive", "Negative" or "Neutral".
+    """
+    if polarity > 0:
+        return "Positive"
+    if polarity < 0:
+        return "Negative"
+    return "Neutral"
+
+
+class SentimentEngine:
+    """
+    Sentiment analyzer with an LRU result cache.
+
+    Memory is bounded by the number of cached entries and by skipping the
+    cache for texts longer than `max_text_length` characters.
+    """
+
+    def __init__(self, cache_size=10000, max_text_length=2000):
+        self.cache_size = cache_size
+        self.max_text_length = max_text_length
+        self._analyzer = PatternAnalyzer()
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0}
+
+    @staticmethod
+    def normalize(text):
+        """
+        Normalizes a transcript for use as a cache key.
+
+        Args:
+            text (str): The transcript.
+
+        Returns:
+            str: The text with surrounding and repeated whitespace collapsed.
+        """
+        return " ".join((text or "").split())
+
+    def _lookup(self, key):
+        with self._lock:
+            result = self._cache.get(key)
+            if result is None:
+                self._stats["misses"] += 1
+                return None
+            self._cache.move_to_end(key)
+            self._stats["hits"] += 1
+            return result
+
+    def _store(self, key, result):
+        if self.cache_size <= 0 or len(key) > self.max_text_length:
+            return
+        with self._lock:
+            self._cache[key] = result
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _compute(self, text):
+        sentiment = self._analyzer.analyze(text)
+        return {
+            "polarity": sentiment.polarity,
+            "subjectivity": sentiment.subjectivity,
+            "mood": mood_from_polarity(sentiment.polarity),
+        }
+
+    def analyze(self, text):
+        """
+        Analyzes the sentiment of one text.
+
+        Args:
+            text (str): The text to analyze.
+
+        Returns:
+            dict: A dictionary with polarity, subjectivity, and mood as keys.
+        """
+        key = self.normalize(text)
+        result = self._lookup(key)
+        if result is None:
+            result = self._compute(key)
+            self._store(key, result)
+        return dict(result)
+
+    def analyze_batch(self, texts):
+        """
+        Analyzes the sentiment of many texts, computing each distinct text once.
+
+        Args:
+            texts (list): The texts to analyze.
+
+        Returns:
+            list: One result dictionary per input text, in order.
+        """
+        results = {}
+        for text in texts:
+            key = self.normalize(text)
+            if key not in results:
+                results[key] = self.analyze(key)
+        return [dict(results[self.normalize(text)]) for text in texts]
+
+    def cache_info(self):
+        """
+        Reports cache usage.
+
+        Returns:
+            dict: Hits, misses, current size and maximum size of the cache.
+        """
+        with self._lock:
+            return dict(self._stats, size=len(self._cache), maxsize=self.cache_size)
+
+    def clear(self):
+        """Empties the cache and resets its counters."""
+        with self._lock:
+            self._cache.clear()
+            self._stats = {"hits": 0, "misses": 0}
+
+
+default_engine = SentimentEngine(
+    cache_size=int(os.getenv("SENTIMENT_CACHE_SIZE", "10000")),
+    max_text_length=int(os.getenv("SENTIMENT_CACHE_MAX_TEXT", "2000")),
+)
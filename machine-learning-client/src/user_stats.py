@@ -0,0 +1,164 @@
+"""
+Materialized per-user journal statistics.
+
+Each user has one document in the `user_stats` collection holding the number
+of entries per mood. It is incremented here whenever an entry is stored and
+decremented by the web app when an entry is deleted, so reading a user's mood
+trends never has to scan their entries. The document also holds a data
+version, bumped on every change, which the web app uses as the key of its
+rendered-page cache.
+
+Entries are also rolled up per user and UTC day in the `mood_rollups`
+collection: the number of entries, the count per mood and the sums of
+polarity and subjectivity. The web app reads mood trends over time from
+these documents instead of scanning entries.
+
+Before entries are written, their users' documents get a `writing_until`
+time STATS_WRITE_GRACE_SECONDS ahead. The web app seeds counters from the
+entries and only stores the result while no write is pending, so an entry
+it already counted is not counted again by a late update here.
+"""
+
+import os
+from datetime import datetime, timedelta
+from collections import Counter
+from pymongo import UpdateOne
+
+MOODS = ("Positive", "Negative", "Neutral")
+# Writes of an entry and its counter updates finish within this time
+STATS_WRITE_GRACE_SECONDS = float(os.getenv("STATS_WRITE_GRACE_SECONDS", "30"))
+
+
+def day_bucket(timestamp):
+    """
+    Returns the start of the UTC day of a timestamp.
+
+    Args:
+        timestamp (datetime): A naive UTC timestamp, as stored with entries.
+
+    Returns:
+        datetime: Midnight of that day.
+    """
+    return datetime(timestamp.year, timestamp.month, timestamp.day)
+
+
+def rollup_increments(entry):
+    """
+    Computes what an entry adds to its daily rollup.
+
+    Args:
+        entry (dict): The entry, with its sentiment.
+
+    Returns:
+        Counter: Increments of the rollup fields.
+    """
+    sentiment = entry.get("sentiment") or {}
+    increments = Counter({"count": 1})
+    if sentiment.get("mood") in MOODS:
+        increments[f"mood_counts.{sentiment['mood']}"] = 1
+    for field in ("polarity", "subjectivity"):
+        increments[f"{field}_sum"] = float(sentiment.get(field) or 0.0)
+    return increments
+
+
+def record_rollups(database, entries):
+    """
+    Adds stored entries to their users' daily mood rollups, with one update
+    per user and day in a single bulk write.
+
+    Args:
+        database (pymongo.database.Database): The journal database.
+        entries (list): The stored entries, with user IDs, timestamps and
+            sentiments.
+    """
+    increments = {}
+    for entry in entries:
+        day = day_bucket(entry.get("timestamp") or datetime.utcnow())
+        increments.setdefault((entry.get("user_id"), day), Counter()).update(
+            rollup_increments(entry)
+        )
+    if not increments:
+        return
+    database["mood_rollups"].bulk_write(
+        [
+            UpdateOne(
+                {"_id": f"{user_id}:{day:%Y-%m-%d}"},
+                {
+                    "$inc": dict(counts),
+                    "$setOnInsert": {"user_id": user_id, "day": day},
+                },
+                upsert=True,
+            )
+            for (user_id, day), counts in increments.items()
+        ],
+        ordered=False,
+    )
+
+
+def record_writes_pending(database, entries):
+    """
+    Announces that entries are about to be written, with one update per user
+    in a single bulk write.
+
+    Args:
+        database (pymongo.database.Database): The journal database.
+        entries (list): The entries, with their user IDs.
+    """
+    user_ids = {entry.get("user_id") for entry in entries}
+    if not user_ids:
+        return
+    until = datetime.utcnow() + timedelta(seconds=STATS_WRITE_GRACE_SECONDS)
+    database["user_stats"].bulk_write(
+        [
+            UpdateOne({"_id": user_id}, {"$max": {"writing_until": until}}, upsert=True)
+            for user_id in user_ids
+        ],
+        ordered=False,
+    )
+
+
+def record_entry_added(database, entry):
+    """
+    Updates the counters after a journal entry was stored.
+
+    Args:
+        database (pymongo.database.Database): The journal database.
+        entry (dict): The stored entry, with its user ID and sentiment.
+    """
+    # Rollups first, so data cached under the new version includes them
+    record_rollups(database, [entry])
+    increments = {"version": 1}
+    mood = (entry.get("sentiment") or {}).get("mood")
+    if mood in MOODS:
+        increments[f"mood_counts.{mood}"] = 1
+    database["user_stats"].update_one(
+        {"_id": entry.get("user_id")}, {"$inc": increments}, upsert=True
+    )
+
+
+def record_entries_added(database, entries):
+    """
+    Updates the counters after several journal entries were stored, with one
+    update per user in a single bulk write.
+
+    Args:
+        database (pymongo.database.Database): The journal database.
+        entries (list): The stored entries, with their user IDs and sentiments.
+    """
+    increments = {}
+    for entry in entries:
+        user_increments = increments.setdefault(entry.get("user_id"), Counter())
+        user_increments["version"] += 1
+        mood = (entry.get("sentiment") or {}).get("mood")
+        if mood in MOODS:
+            user_increments[f"mood_counts.{mood}"] += 1
+    if not increments:
+        return
+    record_rollups(database, entries)
+    database["user_stats"].bulk_write(
+        [
+            UpdateOne({"_id": user_id}, {"$inc": dict(counts)}, upsert=True)
+            for user_id, counts in increments.items()
+        ],
+        ordered=False,
+    )
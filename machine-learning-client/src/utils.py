@@ -6,9 +6,41 @@ sentiment analysis, and storing data in MongoDB.
 import os
 import glob
 import logging
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
 import speech_recognition as sr
-from textblob import TextBlob
-from pymongo.errors import PyMongoError
+from pymongo.errors import BulkWriteError, PyMongoError
+from .backends import get_backend
+from .chunking import SAMPLE_WIDTH, split_on_silence
+from .db import get_collection
+from .sentiment import default_engine
+from .user_stats import (
+    record_entries_added,
+    record_entry_added,
+    record_writes_pending,
+)
+
+# Chunked transcription splits long recordings at silence and transcribes the
+# pieces concurrently
+TRANSCRIBE_CHUNKED = os.getenv("TRANSCRIBE_CHUNKED", "false").lower() == "true"
+CHUNK_MAX_SECONDS = float(os.getenv("TRANSCRIBE_CHUNK_SECONDS", "15"))
+CHUNK_WORKERS = int(os.getenv("TRANSCRIBE_CHUNK_WORKERS", "4"))
+CHUNK_TIMEOUT = float(os.getenv("TRANSCRIBE_CHUNK_TIMEOUT", "30"))
+
+DUPLICATE_KEY_ERROR = 11000
+
+
+class TranscriptionIncomplete(RuntimeError):
+    """
+    Raised when the transcription backend failed for all or part of a
+    recording, so the transcript is empty or partial.
+
+    Attributes:
+        text (str): The transcript of the parts that were recognized.
+    """
+
+    def __init__(self, message, text=""):
+        super().__init__(message)
+        self.text = text
 
 
 def get_audio_files(directory):
@@ -26,65 +58,226 @@ def get_audio_files(directory):
     return audio_files
 
 
-def transcribe_audio(file_path):
+def transcribe_audio(file_path, chunked=None, backend=None, require_complete=False):
     """
     Transcribes the audio file at the given path to text.
 
     Args:
-        file_path (str): The path to the audio file.
+        file_path (str | file): The path to the audio file, or a readable and
+            seekable file object holding it.
+        chunked (bool): Whether to split the audio at silence and transcribe
+            the chunks in parallel. Defaults to the TRANSCRIBE_CHUNKED setting.
+        backend (str): The transcription backend. Defaults to the
+            TRANSCRIPTION_BACKEND setting.
+        require_complete (bool): Whether to raise instead of returning an
+            empty or partial transcript when the backend fails.
 
     Returns:
         str: Transcribed text from the audio.
+
+    Raises:
+        TranscriptionIncomplete: If `require_complete` is set and the backend
+            failed for all or part of the recording.
     """
     recognizer = sr.Recognizer()
     with sr.AudioFile(file_path) as source:
         audio = recognizer.record(source)
+    engine = get_backend(backend, recognizer)
+    if TRANSCRIBE_CHUNKED if chunked is None else chunked:
+        return transcribe_chunked(engine, audio, require_complete=require_complete)
     try:
-        text = recognizer.recognize_google(audio)
+        text = engine.transcribe(audio)
         return text
     except sr.UnknownValueError:
         logging.error("Speech Recognition could not understand audio")
         return ""
     except sr.RequestError as error:
         logging.error("Could not request results; %s", error)
+        if require_complete:
+            raise TranscriptionIncomplete(str(error)) from error
         return ""
 
 
+def _transcribe_chunk(backend, audio):
+    try:
+        return backend.transcribe(audio)
+    except sr.UnknownValueError:
+        return ""  # Nothing intelligible in this chunk
+
+
+def _transcribe_chunk_batch(backend, audios):
+    return [
+        "" if isinstance(result, sr.UnknownValueError) else result
+        for result in backend.transcribe_batch(audios)
+    ]
+
+
+def _transcribe_chunks_concurrently(backend, chunks, max_workers, chunk_timeout):
+    pool = ThreadPoolExecutor(max_workers=min(max_workers, len(chunks)))
+    futures = [pool.submit(_transcribe_chunk, backend, chunk) for chunk in chunks]
+    results = []
+    for future in futures:
+        try:
+            results.append(future.result(timeout=chunk_timeout))
+        except FutureTimeout:
+            results.append(FutureTimeout(f"timed out after {chunk_timeout}s"))
+        except sr.RequestError as error:
+            results.append(error)
+    # Do not wait for chunks that timed out
+    pool.shutdown(wait=False, cancel_futures=True)
+    return results
+
+
+def transcribe_chunked(
+    backend,
+    audio,
+    max_chunk_seconds=None,
+    max_workers=None,
+    chunk_timeout=None,
+    *,
+    require_complete=False,
+):  # pylint: disable=too-many-arguments
+    """
+    Transcribes audio by splitting it at silence and recognizing the chunks
+    concurrently in a bounded thread pool.
+
+    Backends that support batches get all chunks in a single call instead.
+    A chunk that fails or times out is logged and left out, so the remaining
+    chunks still produce a partial transcript.
+
+    Args:
+        backend (TranscriptionBackend): The transcription backend to use.
+        audio (speech_recognition.AudioData): The recorded audio.
+        max_chunk_seconds (float): Upper bound on the chunk length.
+        max_workers (int): Maximum number of concurrent recognition calls.
+        chunk_timeout (float): Seconds to wait for each chunk.
+        require_complete (bool): Whether to raise instead of returning a
+            partial transcript when chunks fail.
+
+    Returns:
+        str: The chunk transcripts joined in order.
+
+    Raises:
+        TranscriptionIncomplete: If `require_complete` is set and any chunk
+            failed or timed out.
+    """
+    max_chunk_seconds = max_chunk_seconds or CHUNK_MAX_SECONDS
+    max_workers = max_workers or CHUNK_WORKERS
+    chunk_timeout = chunk_timeout or CHUNK_TIMEOUT
+
+    pcm_data = audio.get_raw_data(convert_width=SAMPLE_WIDTH)
+    spans = split_on_silence(pcm_data, audio.sample_rate, max_chunk_seconds)
+    if not spans:
+        return ""
+    chunks = [
+        sr.AudioData(pcm_data[start:end], audio.sample_rate, SAMPLE_WIDTH)
+        for start, end in spans
+    ]
+
+    backend.recognizer.operation_timeout = chunk_timeout
+    if backend.supports_batch:
+        results = _transcribe_chunk_batch(backend, chunks)
+    else:
+        results = _transcribe_chunks_concurrently(
+            backend, chunks, max_workers, chunk_timeout
+        )
+
+    texts = []
+    for index, result in enumerate(results):
+        if isinstance(result, Exception):
+            logging.error("Could not transcribe chunk %d; %s", index, result)
+        elif result:
+            texts.append(result)
+    failed = sum(isinstance(result, Exception) for result in results)
+    if failed:
+        logging.warning("%d of %d chunks failed to transcribe", failed, len(chunks))
+        if require_complete:
+            raise TranscriptionIncomplete(
+                f"{failed} of {len(chunks)} chunks failed", " ".join(texts)
+            )
+    return " ".join(texts)
+
+
 def analyze_sentiment(text):
     """
     Analyzes the sentiment of the provided text using TextBlob.
 
+    Results are cached per normalized text by the shared sentiment engine.
+
     Args:
         text (str): The text to analyze.
 
     Returns:
         dict: A dictionary with polarity, subjectivity, and mood as keys.
     """
-    blob = TextBlob(text)
-    polarity = blob.sentiment.polarity
-    subjectivity = blob.sentiment.subjectivity
-
-    if polarity > 0:
-        mood = "Positive"
-    elif polarity < 0:
-        mood = "Negative"
-    else:
-        mood = "Neutral"
-
-    sentiment = {"polarity": polarity, "subjectivity": subjectivity, "mood": mood}
-    return sentiment
+    return default_engine.analyze(text)
 
 
 def store_data(collection, data):
     """
-    Stores the provided data in the specified MongoDB collection.
+    Stores the provided data in the specified MongoDB collection and updates
+    the user's mood counters.
 
     Args:
-        collection (pymongo.collection.Collection): The MongoDB collection to store data in.
+        collection (pymongo.collection.Collection): The MongoDB collection to store
+            data in. When None, the entries collection of the pooled client is used.
         data (dict): The data to store.
     """
+    if collection is None:
+        collection = get_collection("entries")
     try:
+        record_writes_pending(collection.database, [data])
         collection.insert_one(data)
+        record_entry_added(collection.database, data)
         logging.info("Data stored successfully.")
     except PyMongoError as error:
         logging.error("Failed to store data: %s", error)
+
+
+def store_many(collection, entries):
+    """
+    Stores several entries with a single insert_many and updates the users'
+    mood counters for the stored ones.
+
+    The insert is unordered, so one rejected entry does not stop the others.
+    Entries whose `_id` already exists count as stored, which makes retrying a
+    batch safe.
+
+    Args:
+        collection (pymongo.collection.Collection): The MongoDB collection to store
+            data in. When None, the entries collection of the pooled client is used.
+        entries (list): The entries to store.
+
+    Returns:
+        list: The positions of the entries that could not be stored.
+
+    Raises:
+        PyMongoError: If the insert fails as a whole.
+    """
+    if not entries:
+        return []
+    if collection is None:
+        collection = get_collection("entries")
+    failed = []
+    record_writes_pending(collection.database, entries)
+    try:
+        collection.insert_many(entries, ordered=False)
+    except BulkWriteError as error:
+        # A duplicate key means a retried entry was already stored
+        failed = sorted(
+            {
+                write_error["index"]
+                for write_error in error.details["writeErrors"]
+                if write_error.get("code") != DUPLICATE_KEY_ERROR
+            }
+        )
+        if failed:
+            logging.error("Failed to store %d of %d entries", len(failed), len(entries))
+
+    stored = [entry for index, entry in enumerate(entries) if index not in failed]
+    try:
+        record_entries_added(collection.database, stored)
+    except PyMongoError as error:
+        logging.error("Failed to update mood counters: %s", error)
+    logging.info("Stored %d entries.", len(stored))
+    return failed
@@ -0,0 +1,157 @@
+"""
+Startup warm-up and readiness of the machine learning client.
+
+Loading the sentiment lexicon and the speech recognition code paths is slow
+the first time, so it is done once before serving: in the gunicorn master
+before workers fork when the app is preloaded, else in every worker before
+it accepts requests. `/readyz` reports ready only after the warm-up, and
+every startup phase is timed for the report.
+"""
+
+import io
+import time
+import wave
+import logging
+from contextlib import contextmanager
+import speech_recognition as sr
+from .backends import configured_backend_name, get_backend
+from .sentiment import default_engine
+
+logger = logging.getLogger(__name__)
+
+# Backends that call out to a service; only the local encoding is warmed up
+REMOTE_BACKENDS = ("google",)
+WARMUP_TEXT = "warming up the sentiment lexicon was a good idea"
+
+_STATE = {"ready": False, "error": None, "phases": {}}
+
+
+def record_phase(name, seconds):
+    """
+    Records the duration of a startup phase.
+
+    Args:
+        name (str): The phase name.
+        seconds (float): The duration.
+    """
+    _STATE["phases"][name] = seconds
+    logger.info("Startup phase %s took %.3fs", name, seconds)
+
+
+@contextmanager
+def timed_phase(name):
+    """
+    Times a block as a startup phase.
+
+    Args:
+        name (str): The phase name.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_phase(name, time.perf_counter() - started)
+
+
+def warmup_wav(seconds=1.0, sample_rate=16000):
+    """
+    Builds a short WAV recording of a tone, loud enough to count as speech.
+
+    Args:
+        seconds (float): The length of the recording.
+        sample_rate (int): The sample rate in Hz.
+
+    Returns:
+        io.BytesIO: The WAV file, positioned at the start.
+    """
+    period = sample_rate // 200
+    frame = b"".join(
+        (6000 if n < period // 2 else -6000).to_bytes(2, "little", signed=True)
+        for n in range(period)
+    )
+    buffer = io.BytesIO()
+    with wave.Wave_write(buffer) as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(frame * int(seconds * 200))
+    buffer.seek(0)
+    return buffer
+
+
+def warm_sentiment():
+    """Loads the sentiment lexicon by analyzing a sample text once."""
+    default_engine.analyze(WARMUP_TEXT)
+    # Keep the request statistics free of the warm-up call
+    default_engine.clear()
+
+
+def warm_transcription():
+    """
+    Exercises the transcription path on a synthetic clip.
+
+    Local backends transcribe the clip, which loads their models. Remote
+    backends only encode it as they would for a request, without sending it.
+    """
+    recognizer = sr.Recognizer()
+    with sr.AudioFile(warmup_wav()) as source:
+        audio = recognizer.record(source)
+    name = configured_backend_name()
+    if name in REMOTE_BACKENDS:
+        audio.get_flac_data()
+        return
+    try:
+        get_backend(name, recognizer).transcribe(audio)
+    except sr.UnknownValueError:
+        pass  # Models are loaded even if the tone is not understood
+
+
+def warm_up():
+    """
+    Runs the warm-up phases once per process and marks the service ready.
+
+    A failing phase is logged and leaves the service not ready, so a
+    misconfigured deployment never receives traffic.
+
+    Returns:
+        dict: The startup report, see `startup_report`.
+    """
+    if _STATE["ready"]:
+        return startup_report()
+    started = time.perf_counter()
+    try:
+        with timed_phase("warmup_sentiment"):
+            warm_sentiment()
+        with timed_phase("warmup_transcription"):
+            warm_transcription()
+    except (sr.RequestError, RuntimeError, OSError, ValueError) as error:
+        _STATE["error"] = str(error)
+        logger.error("Warm-up failed: %s", error)
+    else:
+        _STATE.update(ready=True, error=None)
+    record_phase("warmup_total", time.perf_counter() - started)
+    return startup_report()
+
+
+def is_ready():
+    """
+    Returns whether the warm-up has completed.
+    """
+    return _STATE["ready"]
+
+
+def startup_report():
+    """
+    Reports readiness and the startup phases.
+
+    Returns:
+        dict: Whether the service is ready, the warm-up error if any, and the
+            duration of every phase in milliseconds.
+    """
+    return {
+        "ready": _STATE["ready"],
+        "error": _STATE["error"],
+        "phases_ms": {
+            name: round(seconds * 1000, 1) for name, seconds in _STATE["phases"].items()
+        },
+    }
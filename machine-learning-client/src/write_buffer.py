@@ -0,0 +1,297 @@
+"""
+Write-behind buffer for journal entries.
+
+Entries are queued in memory and written by a background thread in batches
+of up to `max_entries`, at the latest `flush_interval` seconds after they
+were queued, and when the worker shuts down. Each entry gets its ObjectId
+before it is queued, so a retried batch cannot create duplicates. A batch
+that still fails after the retries is appended to a local JSON lines
+journal. The journal is replayed by the next successful flush of any
+worker. Batches that fail for any other reason, such as an entry BSON
+cannot encode, go to the rejected journal instead of being retried, and
+journal lines that cannot be read are moved aside to a `.corrupt` file.
+If a journal cannot be written either, entries bound for the journal go back
+into the buffer, up to `max_requeues` times each, and rejected entries are
+dropped; dropped entries are logged and counted.
+"""
+
+import os
+import time
+import atexit
+import logging
+import threading
+from bson import ObjectId, json_util
+from bson.errors import BSONError
+from pymongo.errors import PyMongoError
+from .utils import store_many
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_JOURNAL_PATH = "write_journal.jsonl"
+
+
+class WriteBuffer:  # pylint: disable=too-many-instance-attributes
+    """
+    Batches entries into insert_many calls on a background thread.
+    """
+
+    def __init__(self, collection_getter, journal_path=DEFAULT_JOURNAL_PATH, **options):
+        """
+        Args:
+            collection_getter (callable): Returns the entries collection.
+            journal_path (str): File that receives entries that could not be
+                written. Entries MongoDB rejected outright go to the same path
+                with a `.rejected` suffix and are not replayed.
+            **options: max_entries, flush_interval, max_retries,
+                retry_backoff and max_requeues, overriding the defaults.
+        """
+        self.collection_getter = collection_getter
+        self.options = {
+            "journal_path": journal_path,
+            "max_entries": 100,
+            "flush_interval": 1.0,
+            "max_retries": 3,
+            "retry_backoff": 0.5,
+            "max_requeues": 3,
+            **options,
+        }
+        self._pending = []
+        # Times each entry went back into the buffer, by entry ID
+        self._requeues = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._worker = {
+            "thread": None,
+            "pid": None,
+            "stopping": False,
+            "wakeup": threading.Event(),
+        }
+        self._stats = {
+            "queued": 0,
+            "flushes": 0,
+            "written": 0,
+            "retries": 0,
+            "spilled": 0,
+            "replayed": 0,
+            "dropped": 0,
+        }
+
+    def _ensure_started(self):
+        # Threads do not survive a fork, so every worker starts its own
+        thread = self._worker["thread"]
+        if self._worker["pid"] == os.getpid() and thread and thread.is_alive():
+            return
+        thread = threading.Thread(target=self._run, name="write-buffer", daemon=True)
+        self._worker.update(thread=thread, pid=os.getpid(), stopping=False)
+        thread.start()
+
+    def _run(self):
+        while not self._worker["stopping"]:
+            self._worker["wakeup"].wait(self.options["flush_interval"])
+            self._worker["wakeup"].clear()
+            try:
+                self.flush()
+            except Exception:  # pylint: disable=broad-exception-caught
+                # Keep the thread alive for the entries queued after these
+                logger.exception("Flushing the write buffer failed")
+
+    def add(self, entry):
+        """
+        Queues an entry for writing.
+
+        Args:
+            entry (dict): The entry. Its `_id` is assigned here if missing, so
+                callers can report it right away.
+        """
+        entry.setdefault("_id", ObjectId())
+        with self._lock:
+            self._ensure_started()
+            self._pending.append(entry)
+            self._stats["queued"] += 1
+            full = len(self._pending) >= self.options["max_entries"]
+        if full:
+            self._worker["wakeup"].set()
+
+    def flush(self):
+        """
+        Writes all queued entries, in batches of at most `max_entries`.
+        """
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, []
+            size = self.options["max_entries"]
+            written = [
+                self._write(pending[start : start + size])
+                for start in range(0, len(pending), size)
+            ]
+            # MongoDB is reachable again, so older spilled entries can follow
+            if (
+                written
+                and all(written)
+                and os.path.exists(self.options["journal_path"])
+            ):
+                self.replay_journal()
+
+    def _write(self, entries):
+        """Writes one batch with retries; returns False if it had to be spilled."""
+        for attempt in range(self.options["max_retries"] + 1):
+            try:
+                rejected = store_many(self.collection_getter(), entries)
+            except PyMongoError as error:
+                logger.warning("Write attempt %d failed: %s", attempt + 1, error)
+                if attempt < self.options["max_retries"]:
+                    self._count("retries")
+                    time.sleep(self.options["retry_backoff"] * 2**attempt)
+                continue
+            except Exception:  # pylint: disable=broad-exception-caught
+                # Not an outage, e.g. an entry BSON cannot encode; retrying
+                # or replaying would fail the same way
+                logger.exception("Batch of %d entries was rejected", len(entries))
+                self._spill(
+                    entries, self.options["journal_path"] + ".rejected", requeue=False
+                )
+                return False
+            self._count("flushes")
+            self._count("written", len(entries) - len(rejected))
+            with self._lock:
+                self._forget(entries)
+            if rejected:
+                # Rejected by MongoDB itself, so replaying would not help
+                self._spill(
+                    [entries[index] for index in rejected],
+                    self.options["journal_path"] + ".rejected",
+                    requeue=False,
+                )
+            return True
+        self._spill(entries, self.options["journal_path"])
+        return False
+
+    def _spill(self, entries, path, requeue=True):
+        """
+        Appends entries to a journal. If the journal cannot be written, the
+        entries are put back into the buffer when `requeue` is set and they
+        have not been put back `max_requeues` times yet, or else dropped.
+        """
+        with self._lock:
+            try:
+                with open(path, "a", encoding="utf-8") as journal:
+                    for entry in entries:
+                        # Values JSON cannot hold are kept as their string form
+                        journal.write(json_util.dumps(entry, default=str) + "\n")
+            except OSError as error:
+                logger.error(
+                    "Could not spill %d entries to %s: %s", len(entries), path, error
+                )
+                limit = self.options["max_requeues"] if requeue else 0
+                dropped = len(entries) - self._requeue(entries, limit)
+                if dropped:
+                    self._stats["dropped"] += dropped
+                    logger.error("Dropped %d entries bound for %s", dropped, path)
+                return
+            self._stats["spilled"] += len(entries)
+            self._forget(entries)
+        logger.error("Spilled %d entries to %s", len(entries), path)
+
+    def _requeue(self, entries, limit):
+        # Called with the lock held; returns how many entries were put back
+        kept = []
+        for entry in entries:
+            count = self._requeues.pop(entry["_id"], 0)
+            if count < limit:
+                self._requeues[entry["_id"]] = count + 1
+                kept.append(entry)
+        self._pending[:0] = kept
+        return len(kept)
+
+    def _forget(self, entries):
+        # Called with the lock held, once the entries have left the buffer
+        if self._requeues:
+            for entry in entries:
+                self._requeues.pop(entry["_id"], None)
+
+    def replay_journal(self):
+        """
+        Writes the entries of the journal to MongoDB.
+
+        The journal is renamed first, so only one worker replays it. Entries
+        that fail again are spilled to a fresh journal, and lines that cannot
+        be read are appended to the `.corrupt` file next to it.
+
+        Returns:
+            int: The number of entries replayed.
+        """
+        path = self.options["journal_path"]
+        claimed = f"{path}.{os.getpid()}"
+        try:
+            os.replace(path, claimed)
+        except FileNotFoundError:
+            return 0
+        entries, corrupt = [], []
+        with open(claimed, encoding="utf-8") as journal:
+            for line in journal:
+                if not line.strip():
+                    continue
+                try:
+                    entries.append(json_util.loads(line))
+                except (ValueError, TypeError, BSONError):
+                    corrupt.append(line if line.endswith("\n") else line + "\n")
+        if corrupt:
+            with open(path + ".corrupt", "a", encoding="utf-8") as quarantine:
+                quarantine.writelines(corrupt)
+            logger.error("Moved %d unreadable journal lines aside", len(corrupt))
+
+        size = self.options["max_entries"]
+        for start in range(0, len(entries), size):
+            self._write(entries[start : start + size])
+        os.remove(claimed)
+        self._count("replayed", len(entries))
+        logger.info("Replayed %d journaled entries", len(entries))
+        return len(entries)
+
+    def close(self):
+        """
+        Stops the background thread and writes the remaining entries.
+        """
+        thread = self._worker["thread"]
+        if thread is not None and self._worker["pid"] == os.getpid():
+            self._worker["stopping"] = True
+            self._worker["wakeup"].set()
+            thread.join(timeout=self.options["flush_interval"] + 5)
+        self.flush()
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._stats[name] += amount
+
+    def stats(self):
+        """
+        Reports buffer activity of this process.
+
+        Returns:
+            dict: Queued, flushed, written, retried, spilled, replayed and
+                dropped counts, and the number of entries still buffered.
+        """
+        with self._lock:
+            return dict(self._stats, buffered=len(self._pending))
+
+
+def create_write_buffer(collection_getter):
+    """
+    Creates a write buffer configured from the environment and registers it
+    to be flushed at interpreter exit.
+
+    Args:
+        collection_getter (callable): Returns the entries collection.
+
+    Returns:
+        WriteBuffer: The buffer.
+    """
+    buffer = WriteBuffer(
+        collection_getter,
+        journal_path=os.getenv("WRITE_BUFFER_JOURNAL", DEFAULT_JOURNAL_PATH),
+        max_entries=int(os.getenv("WRITE_BUFFER_MAX_ENTRIES", "100")),
+        flush_interval=float(os.getenv("WRITE_BUFFER_FLUSH_SECONDS", "1.0")),
+        max_retries=int(os.getenv("WRITE_BUFFER_MAX_RETRIES", "3")),
+    )
+    atexit.register(buffer.close)
+    return buffer
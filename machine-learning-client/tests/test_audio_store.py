@@ -0,0 +1,175 @@
+"""
+Unit tests for the content-addressed audio store in audio_store.py.
+"""
+
+import io
+import os
+import wave
+import time
+from datetime import datetime, timedelta
+from unittest.mock import patch, MagicMock
+import pytest
+from src.audio_store import (
+    GridFSAudioStore,
+    LocalAudioStore,
+    decode_flac,
+    main,
+    purge_expired,
+    release,
+)
+from src.main import app
+from src.result_cache import LocalResultCache
+from src.warmup import warmup_wav
+
+
+def frames(wav_data):
+    """
+    Read the samples of a WAV file.
+    """
+    with wave.open(io.BytesIO(wav_data)) as wav_file:
+        return wav_file.readframes(wav_file.getnframes())
+
+
+def entries_referencing(*keys):
+    """
+    Mock entries collection in which only the given recordings are linked.
+    """
+    entries = MagicMock()
+    entries.find_one.side_effect = lambda query, _projection: (
+        {"_id": 1} if query["audio.key"] in keys else None
+    )
+    return entries
+
+
+@pytest.fixture(name="store")
+def store_fixture(tmp_path):
+    """
+    A local audio store in a temporary directory.
+    """
+    return LocalAudioStore(str(tmp_path / "audio"))
+
+
+def test_archive_compresses_losslessly_and_deduplicates(store, tmp_path):
+    """
+    Test that a recording is stored once as FLAC and decodes to the same samples.
+    """
+    recording = warmup_wav()
+    first = store.archive(recording)
+    second = store.archive(warmup_wav())
+
+    assert first == second
+    assert first["format"] == "flac"
+    assert first["size"] < len(recording.getvalue())
+    stored = [name for _, _, names in os.walk(tmp_path) for name in names]
+    assert stored == [f"{first['key']}.flac"]
+    assert frames(decode_flac(store.read(first["key"]))) == frames(recording.getvalue())
+
+
+def test_release_keeps_referenced_recordings(store):
+    """
+    Test that a recording is only deleted once no entry links it and it has
+    not been uploaded again within the grace period.
+    """
+    key = store.archive(warmup_wav())["key"]
+    later = datetime.utcnow() + timedelta(hours=2)
+
+    assert release(store, entries_referencing(key), key, later) is False
+    assert store.read(key) is not None
+    # Uploaded just now, so its entry may still be on the way
+    assert release(store, entries_referencing(), key) is False
+    assert store.read(key) is not None
+    assert release(store, entries_referencing(), key, later) is True
+    assert store.read(key) is None
+
+
+def test_purge_applies_retention_and_removes_orphans(store):
+    """
+    Test that old recordings are purged and unlinked from their entries, and
+    that unreferenced recordings are removed after the grace period.
+    """
+    expired = store.archive(warmup_wav(seconds=1.0))["key"]
+    orphan = store.archive(warmup_wav(seconds=0.5))["key"]
+    fresh = store.archive(warmup_wav(seconds=0.25))["key"]
+    now = datetime.utcnow()
+    for key, age in ((expired, timedelta(days=40)), (orphan, timedelta(hours=2))):
+        stamp = time.time() - age.total_seconds()
+        os.utime(os.path.join(store.root, key[:2], f"{key}.flac"), (stamp, stamp))
+    entries = entries_referencing(expired, fresh)
+
+    purged = purge_expired(store, entries, retention_days=30, now=now)
+
+    assert purged == {"expired": 1, "orphaned": 1}
+    entries.update_many.assert_called_once_with(
+        {"audio.key": expired}, {"$unset": {"audio": ""}}
+    )
+    assert [key for key, _ in store.last_used()] == [fresh]
+
+
+@patch("src.audio_store.gridfs.GridFSBucket")
+def test_gridfs_store_refreshes_duplicates(mock_bucket):
+    """
+    Test that the GridFS store uploads new recordings and only touches known ones.
+    """
+    database = MagicMock()
+    files = database["audio.files"]
+    store = GridFSAudioStore(lambda: database)
+
+    files.find_one_and_update.return_value = None
+    link = store.archive(warmup_wav())
+    mock_bucket.return_value.upload_from_stream.assert_called_once()
+    assert mock_bucket.return_value.upload_from_stream.call_args.args[0] == link["key"]
+
+    files.find_one_and_update.return_value = {"length": 123}
+    assert store.archive(warmup_wav())["size"] == 123
+    mock_bucket.return_value.upload_from_stream.assert_called_once()
+
+
+@patch("src.main.get_collection")
+@patch("src.main.transcribe_audio", return_value="Test transcription")
+def test_entries_link_their_recording(
+    _mock_transcribe_audio, mock_get_collection, store
+):
+    """
+    Test that processed uploads are archived and linked, and released on request.
+    """
+    collection = entries_referencing()
+    mock_get_collection.return_value = collection
+    app.testing = True
+    with patch("src.main.audio_store", store), patch(
+        "src.main.result_cache", LocalResultCache()
+    ), app.test_client() as client:
+        response = client.post(
+            "/process-audio",
+            data={"audio": (warmup_wav(), "clip.wav")},
+            content_type="multipart/form-data",
+        )
+        assert response.status_code == 200
+        link = collection.insert_one.call_args.args[0]["audio"]
+        assert store.read(link["key"]) is not None
+
+        later = datetime.utcnow() + timedelta(hours=2)
+        with patch("src.audio_store.datetime") as mock_datetime:
+            mock_datetime.utcnow.return_value = later
+            mock_datetime.utcfromtimestamp = datetime.utcfromtimestamp
+            response = client.post("/release-audio", json={"key": link["key"]})
+        assert response.json == {"released": True}
+        assert store.read(link["key"]) is None
+        assert client.post("/release-audio", json={}).status_code == 400
+
+
+@patch("src.audio_store.time.sleep", side_effect=[None, KeyboardInterrupt])
+@patch("src.audio_store.get_collection")
+@patch("src.audio_store.purge_expired")
+def test_scheduled_purge_survives_failures(
+    mock_purge, _mock_get_collection, _mock_sleep, store, monkeypatch
+):
+    """
+    Test that `--every` purges on every interval and keeps going after a
+    failed round.
+    """
+    monkeypatch.setenv("AUDIO_PURGE_INTERVAL_SECONDS", "60")
+    mock_purge.side_effect = [OSError("disk"), {"expired": 0, "orphaned": 0}]
+    with patch("src.audio_store.create_audio_store", return_value=store):
+        with pytest.raises(KeyboardInterrupt):
+            main(["--purge", "--every"])
+    assert mock_purge.call_count == 2
@@ -0,0 +1,82 @@
+"""
+Unit tests for the transcription backend registry in backends.py.
+"""
+
+from array import array
+from unittest.mock import MagicMock
+import pytest
+from speech_recognition import AudioData, RequestError, UnknownValueError
+from src.backends import (
+    GoogleBackend,
+    StubBackend,
+    TranscriptionBackend,
+    available_backends,
+    get_backend,
+    register_backend,
+)
+
+
+def make_audio(amplitude):
+    """Build one second of a square wave as AudioData."""
+    samples = array("h", [amplitude, -amplitude] * 8000)
+    return AudioData(samples.tobytes(), 16000, 2)
+
+
+def test_get_backend_uses_configuration(monkeypatch):
+    """
+    Test that the backend is chosen through TRANSCRIPTION_BACKEND.
+    """
+    assert isinstance(get_backend(), GoogleBackend)
+    monkeypatch.setenv("TRANSCRIPTION_BACKEND", "stub")
+    assert isinstance(get_backend(), StubBackend)
+    assert {"google", "sphinx", "stub"} <= set(available_backends())
+
+
+def test_get_backend_unknown_name():
+    """
+    Test that an unknown backend name raises a ValueError listing the options.
+    """
+    with pytest.raises(ValueError, match="stub"):
+        get_backend("does-not-exist")
+
+
+def test_register_backend():
+    """
+    Test that new backends can be registered and created by name.
+    """
+
+    @register_backend("echo-test")
+    class EchoBackend(TranscriptionBackend):
+        """Backend returning a fixed transcript."""
+
+        def transcribe(self, audio):
+            return "echo"
+
+    backend = get_backend("echo-test")
+    assert isinstance(backend, EchoBackend)
+    assert backend.transcribe(make_audio(3000)) == "echo"
+
+
+def test_stub_backend_is_deterministic():
+    """
+    Test that the stub backend returns the same transcript for the same audio.
+    """
+    backend = StubBackend()
+    first = backend.transcribe(make_audio(3000))
+    assert first == StubBackend().transcribe(make_audio(3000))
+    assert first in StubBackend.PHRASES
+    with pytest.raises(UnknownValueError):
+        backend.transcribe(make_audio(0))
+
+
+def test_transcribe_batch_reports_errors_per_clip():
+    """
+    Test that batch transcription returns errors in place of failed clips.
+    """
+    recognizer = MagicMock()
+    recognizer.recognize_google.side_effect = ["first", RequestError("offline")]
+    results = GoogleBackend(recognizer).transcribe_batch(
+        [make_audio(3000), make_audio(3000)]
+    )
+    assert results[0] == "first"
+    assert isinstance(results[1], RequestError)
@@ -0,0 +1,82 @@
+"""
+Unit tests for silence-based chunking in chunking.py.
+"""
+
+from array import array
+from src.chunking import rms, split_on_silence
+
+RATE = 16000
+
+
+def tone(seconds, amplitude=3000):
+    """Build a square wave of the given length as 16-bit PCM."""
+    samples = array("h", [amplitude, -amplitude] * int(RATE * seconds / 2))
+    return samples.tobytes()
+
+
+def silence(seconds):
+    """Build silent 16-bit PCM of the given length."""
+    return bytes(int(RATE * seconds) * 2)
+
+
+def test_rms():
+    """
+    Test that RMS energy is zero for silence and the amplitude for a square wave.
+    """
+    assert rms(silence(0.1)) == 0.0
+    assert rms(tone(0.1)) == 3000
+    assert rms(b"") == 0.0
+
+
+def test_short_audio_is_a_single_chunk():
+    """
+    Test that audio shorter than the maximum chunk length is not split.
+    """
+    pcm = tone(3)
+    assert split_on_silence(pcm, RATE, max_chunk_seconds=5) == [(0, len(pcm))]
+
+
+def test_split_at_silence():
+    """
+    Test that long audio is cut inside the pause between two utterances.
+    """
+    pcm = tone(3) + silence(1) + tone(3)
+    chunks = split_on_silence(pcm, RATE, max_chunk_seconds=5, min_chunk_seconds=1)
+
+    assert len(chunks) == 2
+    first_end, second_start = chunks[0][1], chunks[1][0]
+    assert first_end == second_start
+    assert len(tone(3)) <= first_end <= len(tone(3) + silence(1))
+    assert chunks[-1][1] == len(pcm)
+    assert all(end - start <= 5 * RATE * 2 for start, end in chunks)
+
+
+def test_hard_cut_without_silence():
+    """
+    Test that continuous speech is cut at the maximum chunk length.
+    """
+    pcm = tone(7)
+    chunks = split_on_silence(pcm, RATE, max_chunk_seconds=3)
+    assert len(chunks) == 3
+    assert all(end - start <= 3 * RATE * 2 for start, end in chunks)
+
+
+def test_silent_chunks_are_dropped():
+    """
+    Test that fully silent audio produces no chunks.
+    """
+    assert not split_on_silence(silence(10), RATE, max_chunk_seconds=3)
+
+
+def test_speech_after_a_cut_is_kept():
+    """
+    Test that a quiet word just after a cut keeps its chunk, even though the
+    silence carried over with it pulls the average energy below the threshold.
+    """
+    word = tone(0.03, amplitude=310)
+    pcm = tone(2) + silence(2.98) + word + silence(3)
+    chunks = split_on_silence(pcm, RATE, max_chunk_seconds=5, min_chunk_seconds=1)
+
+    assert len(chunks) == 2
+    assert chunks[1][0] < len(pcm) - len(silence(3)) - len(word)
+    assert chunks[1][1] == len(pcm)
@@ -0,0 +1,96 @@
+"""
+Unit tests for the pooled MongoDB connection manager in db.py.
+"""
+
+from unittest.mock import patch, MagicMock
+import pytest
+from prometheus_client import REGISTRY
+from src import db
+
+
+@pytest.fixture(autouse=True)
+def reset_state():
+    """
+    Ensure every test starts without a cached client.
+    """
+    db.close_client()
+    yield
+    db.close_client()
+
+
+@patch("src.db.MongoClient")
+def test_get_client_is_reused(mock_mongo_client):
+    """
+    Test that the client is created once per process and then reused.
+    """
+    first = db.get_client()
+    second = db.get_client()
+    assert first is second
+    mock_mongo_client.assert_called_once()
+
+
+@patch("src.db.MongoClient")
+def test_get_client_recreated_after_fork(mock_mongo_client):
+    """
+    Test that a new client is built when the process id changes.
+    """
+    mock_mongo_client.side_effect = [MagicMock(), MagicMock()]
+    parent = db.get_client()
+    with patch("src.db.os.getpid", return_value=-1):
+        child = db.get_client()
+    assert child is not parent
+    assert mock_mongo_client.call_count == 2
+
+
+@patch("src.db.MongoClient")
+def test_pool_options_from_environment(mock_mongo_client, monkeypatch):
+    """
+    Test that pool sizing is read from the environment.
+    """
+    monkeypatch.setenv("MONGO_MAX_POOL_SIZE", "7")
+    monkeypatch.setenv("MONGO_MIN_POOL_SIZE", "2")
+    db.get_client()
+    kwargs = mock_mongo_client.call_args.kwargs
+    assert kwargs["maxPoolSize"] == 7
+    assert kwargs["minPoolSize"] == 2
+
+
+def test_pool_stats_listener_tracks_checkouts():
+    """
+    Test that the listener reports checked-out connections and wait time.
+    """
+    listener = db.PoolStatsListener()
+    event = MagicMock()
+    listener.connection_created(event)
+    listener.connection_check_out_started(event)
+    listener.connection_checked_out(event)
+
+    stats = listener.snapshot()
+    assert stats["open_connections"] == 1
+    assert stats["checked_out"] == 1
+    assert stats["checkouts"] == 1
+    assert stats["wait_time_max_ms"] >= 0
+
+    listener.connection_checked_in(event)
+    assert listener.snapshot()["checked_out"] == 0
+
+
+def test_pool_stats_are_exported_as_metrics():
+    """
+    Test that pool events show up in the Prometheus metrics.
+    """
+
+    def sample(name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0.0
+
+    before = sample("ml_client_mongo_pool_checkouts_total", outcome="ok")
+    open_before = sample("ml_client_mongo_pool_connections", state="open")
+    listener = db.PoolStatsListener()
+    event = MagicMock()
+    listener.connection_created(event)
+    listener.connection_check_out_started(event)
+    listener.connection_checked_out(event)
+
+    assert sample("ml_client_mongo_pool_checkouts_total", outcome="ok") == before + 1
+    assert sample("ml_client_mongo_pool_connections", state="open") == open_before + 1
+    assert sample("ml_client_mongo_pool_wait_seconds_count") >= 1
@@ -0,0 +1,84 @@
+"""
+Unit tests for index management in indexes.py.
+"""
+
+from unittest.mock import patch, MagicMock
+import pytest
+from pymongo.errors import OperationFailure, ServerSelectionTimeoutError
+from src import indexes
+
+
+def test_ensure_indexes_creates_hot_query_indexes():
+    """
+    Test that the compound entries index and the unique username index are created.
+    """
+    collection = MagicMock()
+    collection.create_index.return_value = "index_name"
+    database = MagicMock()
+    database.__getitem__.return_value = collection
+    indexes.ensure_indexes(database)
+
+    created = [
+        call.args + (call.kwargs,) for call in collection.create_index.call_args_list
+    ]
+    assert ([("user_id", 1), ("timestamp", -1), ("_id", -1)], {}) in created
+    assert ([("username", 1)], {"unique": True}) in created
+
+
+def test_verify_query_plans_rejects_collection_scans():
+    """
+    Test that a collection scan behind a sort is reported.
+    """
+    query = MagicMock()
+    query.explain.return_value = {
+        "queryPlanner": {
+            "winningPlan": {"stage": "SORT", "inputStage": {"stage": "COLLSCAN"}}
+        }
+    }
+    with pytest.raises(RuntimeError, match="recent_entries"):
+        indexes.verify_query_plans(MagicMock(), {"recent_entries": lambda _db: query})
+
+
+def test_startup_bootstrap_closes_client(monkeypatch):
+    """
+    Test that the bootstrap releases its client and only raises in strict mode.
+    """
+    database = MagicMock()
+    database.__getitem__.return_value.create_index.side_effect = (
+        ServerSelectionTimeoutError("down")
+    )
+    with patch("src.indexes.get_database", return_value=database), patch(
+        "src.indexes.close_client"
+    ) as mock_close:
+        indexes.run_startup_bootstrap()
+        monkeypatch.setenv("MONGO_VERIFY_QUERY_PLANS", "true")
+        with pytest.raises(ServerSelectionTimeoutError):
+            indexes.run_startup_bootstrap()
+    assert mock_close.call_count == 2
+
+
+def test_ensure_indexes_continues_past_failed_index():
+    """
+    Test that a failed index is logged and skipped, the remaining indexes are
+    still created and superseded ones dropped, and the failure is reported.
+    """
+    collection = MagicMock()
+    collection.create_index.side_effect = lambda keys, **options: (
+        raise_duplicates() if options.get("unique") else "index_name"
+    )
+    collection.index_information.return_value = {"user_id_1_timestamp_-1": {}}
+    database = MagicMock()
+    database.__getitem__.return_value = collection
+    with pytest.raises(RuntimeError, match="users"):
+        indexes.ensure_indexes(database)
+
+    created = [call.args[0] for call in collection.create_index.call_args_list]
+    assert [("finished_at", 1)] in created
+    collection.drop_index.assert_called_once_with("user_id_1_timestamp_-1")
+
+
+def raise_duplicates():
+    """
+    Fail like a unique index built over duplicate keys.
+    """
+    raise OperationFailure("E11000 duplicate key error", code=11000)
@@ -0,0 +1,135 @@
+"""
+Unit tests for bulk ingestion in ingest.py.
+"""
+
+import wave
+from array import array
+from unittest.mock import patch, MagicMock
+import pytest
+from pymongo.errors import AutoReconnect
+from src.backends import StubBackend
+from src.main import main
+
+
+def write_wav(path, seconds, amplitude=3000, rate=16000):
+    """
+    Write a 16-bit mono WAV file with a square wave of the given length.
+    """
+    samples = array(
+        "h", [amplitude if (i // 40) % 2 else -amplitude for i in range(rate)]
+    )
+    with wave.Wave_write(str(path)) as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(rate)
+        for _ in range(seconds):
+            wav_file.writeframes(samples.tobytes())
+
+
+@pytest.fixture(name="audio_dir")
+def audio_dir_fixture(tmp_path, monkeypatch):
+    """
+    A folder with two recordings, transcribed by the stub backend.
+    """
+    monkeypatch.setenv("TRANSCRIPTION_BACKEND", "stub")
+    folder = tmp_path / "audio"
+    folder.mkdir()
+    write_wav(folder / "a.wav", 2)
+    write_wav(folder / "b.wav", 1, amplitude=9000)
+    (folder / "notes.txt").write_text("not audio")
+    return folder
+
+
+def run(audio_dir, tmp_path, collection, workers=1):
+    """
+    Run the ingestion in-process against a mocked collection.
+    """
+    with patch("src.ingest.get_collection", return_value=collection):
+        return main(
+            [
+                "--audio-dir",
+                str(audio_dir),
+                "--user-id",
+                "user-1",
+                "--workers",
+                str(workers),
+                "--checkpoint",
+                str(tmp_path / "checkpoint.jsonl"),
+            ]
+        )
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_ingestion_stores_all_files_in_bulk(audio_dir, tmp_path, capsys, workers):
+    """
+    Test that every recording is stored with a single insert_many, in process
+    or on a process pool, and that the throughput is reported.
+    """
+    collection = MagicMock()
+    totals = run(audio_dir, tmp_path, collection, workers)
+
+    assert totals["files"] == totals["stored"] == 2
+    assert totals["audio_seconds"] == pytest.approx(3.0)
+    collection.insert_many.assert_called_once()
+    entries = collection.insert_many.call_args.args[0]
+    assert [entry["file_name"] for entry in entries] == ["a.wav", "b.wav"]
+    assert all(entry["user_id"] == "user-1" for entry in entries)
+    assert entries[0]["transcript"] in StubBackend.PHRASES
+    assert "files/s" in capsys.readouterr().out
+
+
+def test_ingestion_resumes_from_checkpoint(audio_dir, tmp_path):
+    """
+    Test that files handled by an earlier run are skipped, and changed or new
+    files are picked up.
+    """
+    run(audio_dir, tmp_path, MagicMock())
+
+    collection = MagicMock()
+    assert run(audio_dir, tmp_path, collection)["files"] == 0
+    collection.insert_many.assert_not_called()
+
+    write_wav(audio_dir / "c.wav", 1)
+    assert run(audio_dir, tmp_path, collection)["files"] == 1
+
+
+def test_unreadable_files_are_reported_not_stored(audio_dir, tmp_path):
+    """
+    Test that a broken file is checkpointed as failed and does not stop the run.
+    """
+    (audio_dir / "broken.wav").write_bytes(b"not a wav file")
+    collection = MagicMock()
+    totals = run(audio_dir, tmp_path, collection)
+
+    assert totals["files"] == 3
+    assert totals["stored"] == 2
+    checkpoint = (tmp_path / "checkpoint.jsonl").read_text()
+    assert checkpoint.count('"failed"') == 1
+
+
+def test_database_errors_leave_the_batch_for_the_next_pass(audio_dir, tmp_path):
+    """
+    Test that a batch MongoDB could not take is not checkpointed, so the next
+    pass stores it.
+    """
+    collection = MagicMock()
+    collection.insert_many.side_effect = AutoReconnect("connection lost")
+    totals = run(audio_dir, tmp_path, collection)
+    assert totals["files"] == 2
+    assert totals["stored"] == 0
+
+    collection.insert_many.side_effect = None
+    totals = run(audio_dir, tmp_path, collection)
+    assert totals["files"] == totals["stored"] == 2
+
+
+def test_ingestion_requires_a_user(audio_dir, monkeypatch):
+    """
+    Test that entries are never stored without a user to file them under.
+    """
+    monkeypatch.delenv("INGEST_USER_ID", raising=False)
+    collection = MagicMock()
+    with patch("src.ingest.get_collection", return_value=collection):
+        with pytest.raises(SystemExit):
+            main(["--audio-dir", str(audio_dir)])
+    collection.insert_many.assert_not_called()
@@ -2,10 +2,14 @@
 Unit tests for main.py functions, including Flask endpoints and MongoDB operations.
 """
 
+import os
 from unittest.mock import patch, MagicMock
 from io import BytesIO
 import pytest
+from bson.objectid import ObjectId
+from speech_recognition import RequestError
 from src.main import app
+from src.result_cache import LocalResultCache
 
 
 @pytest.fixture(name="flask_test_client")
@@ -18,20 +22,33 @@ def client_fixture():
         yield test_client
 
 
-@patch("src.main.MongoClient")
+@pytest.fixture(name="local_result_cache", autouse=True)
+def result_cache_fixture():
+    """
+    Replace the MongoDB result cache with an in-process one.
+    """
+    cache = LocalResultCache()
+    with patch("src.main.result_cache", cache):
+        yield cache
+
+
+@patch("src.main.get_collection")
 @patch("src.main.transcribe_audio", return_value="Test transcription")
 @patch(
     "src.main.analyze_sentiment",
     return_value={"polarity": 0.5, "subjectivity": 0.6, "mood": "Positive"},
 )
 def test_process_audio_success(
-    mock_analyze_sentiment, mock_transcribe_audio, mock_mongo_client, flask_test_client
+    mock_analyze_sentiment,
+    mock_transcribe_audio,
+    mock_get_collection,
+    flask_test_client,
 ):
     """
     Test successful audio processing via `/process-audio`.
     """
     mock_collection = MagicMock()
-    mock_mongo_client.return_value.__getitem__.return_value = mock_collection
+    mock_get_collection.return_value = mock_collection
 
     data = {"audio": (BytesIO(b"fake data"), "test.wav")}
 
@@ -43,6 +60,7 @@ def test_process_audio_success(
     assert response.json["status"] == "success"
     mock_transcribe_audio.assert_called_once()
     mock_analyze_sentiment.assert_called_once()
+    mock_collection.insert_one.assert_called_once()
 
 
 @patch("src.main.transcribe_audio", side_effect=RuntimeError("Transcription error"))
@@ -58,3 +76,251 @@ def test_process_audio_transcription_error(_mock_transcribe_audio, flask_test_cl
 
     assert response.status_code == 500
     assert "Transcription error" in response.json["details"]
+
+
+@patch("src.main.get_collection")
+def test_process_audio_rejects_unreadable_audio(
+    _mock_get_collection, flask_test_client
+):
+    """
+    Test that a file that is not a recording is rejected as a bad request.
+    """
+    data = {"audio": (BytesIO(b"not a recording"), "test.wav")}
+
+    response = flask_test_client.post(
+        "/process-audio", data=data, content_type="multipart/form-data"
+    )
+
+    assert response.status_code == 400
+    assert response.json["error"] == "Invalid audio file"
+
+
+@patch("src.main.get_collection")
+@patch(
+    "src.main.analyze_sentiment",
+    return_value={"polarity": 0.0, "subjectivity": 0.0, "mood": "Neutral"},
+)
+def test_process_audio_reads_spooled_upload(
+    _mock_analyze_sentiment,
+    _mock_get_collection,
+    flask_test_client,
+    tmp_path,
+    monkeypatch,
+):
+    """
+    Test that the upload is transcribed from its in-memory buffer without being saved.
+    """
+    received = []
+
+    def fake_transcribe(source, **_options):
+        received.append(source.read())
+        return ""
+
+    monkeypatch.chdir(tmp_path)
+    with patch("src.main.transcribe_audio", side_effect=fake_transcribe):
+        data = {"audio": (BytesIO(b"fake data"), "test.wav")}
+        response = flask_test_client.post(
+            "/process-audio", data=data, content_type="multipart/form-data"
+        )
+
+    assert response.status_code == 200
+    assert received == [b"fake data"]
+    assert not os.listdir(tmp_path)
+
+
+@patch("src.main.get_collection")
+@patch("src.main.transcribe_audio", return_value="Test transcription")
+@patch(
+    "src.main.analyze_sentiment",
+    return_value={"polarity": 0.5, "subjectivity": 0.6, "mood": "Positive"},
+)
+def test_process_audio_result_cache(
+    mock_analyze_sentiment,
+    mock_transcribe_audio,
+    mock_get_collection,
+    flask_test_client,
+    local_result_cache,
+):
+    """
+    Test that a re-uploaded recording reuses the cached results.
+    """
+    mock_collection = MagicMock()
+    mock_get_collection.return_value = mock_collection
+
+    responses = [
+        flask_test_client.post(
+            "/process-audio",
+            data={"audio": (BytesIO(b"same audio"), "test.wav")},
+            content_type="multipart/form-data",
+        )
+        for _ in range(2)
+    ]
+
+    assert [response.json["cached"] for response in responses] == [False, True]
+    assert responses[1].json["data"]["transcript"] == "Test transcription"
+    mock_transcribe_audio.assert_called_once()
+    mock_analyze_sentiment.assert_called_once()
+    assert mock_collection.insert_one.call_count == 2
+    assert local_result_cache.stats()["hits"] == 1
+
+    response = flask_test_client.post(
+        "/process-audio",
+        data={"audio": (BytesIO(b"same audio"), "test.wav"), "bypass_cache": "true"},
+        content_type="multipart/form-data",
+    )
+    assert response.json["cached"] is False
+    assert mock_transcribe_audio.call_count == 2
+    assert local_result_cache.stats()["bypassed"] == 1
+
+
+@patch("src.main.get_collection")
+@patch("src.utils.sr.AudioFile")
+@patch("src.utils.sr.Recognizer")
+def test_process_audio_does_not_cache_failed_transcriptions(
+    mock_recognizer, _mock_audio_file, _mock_get_collection, flask_test_client
+):
+    """
+    Test that a transcript lost to a speech backend outage is not cached, so
+    re-uploading the recording reaches the backend again.
+    """
+    recognize = mock_recognizer.return_value.recognize_google
+    recognize.side_effect = [RequestError("backend down"), "Test transcription"]
+
+    responses = [
+        flask_test_client.post(
+            "/process-audio",
+            data={"audio": (BytesIO(b"same audio"), "test.wav")},
+            content_type="multipart/form-data",
+        )
+        for _ in range(2)
+    ]
+
+    assert [response.status_code for response in responses] == [200, 200]
+    assert responses[0].json["data"]["transcript"] == ""
+    assert responses[1].json["cached"] is False
+    assert responses[1].json["data"]["transcript"] == "Test transcription"
+    assert recognize.call_count == 2
+
+
+@patch("src.main.get_collection")
+@patch(
+    "src.main.analyze_sentiment",
+    return_value={"polarity": 0.5, "subjectivity": 0.6, "mood": "Positive"},
+)
+def test_process_audio_batch_reports_partial_failures(
+    _mock_analyze_sentiment, mock_get_collection, flask_test_client
+):
+    """
+    Test that a batch stores its good files with one insert_many and reports
+    the failed file separately.
+    """
+    mock_collection = MagicMock()
+    mock_collection.insert_many.side_effect = lambda entries, ordered: [
+        entry.setdefault("_id", ObjectId()) for entry in entries
+    ]
+    mock_get_collection.return_value = mock_collection
+
+    def transcribe(stream, **_options):
+        if stream.read() == b"broken":
+            raise ValueError("Audio file could not be read")
+        return "Test transcription"
+
+    with patch("src.main.transcribe_audio", side_effect=transcribe):
+        response = flask_test_client.post(
+            "/process-audio-batch",
+            data={
+                "audio": [
+                    (BytesIO(b"first"), "first.wav"),
+                    (BytesIO(b"broken"), "broken.wav"),
+                    (BytesIO(b"third"), "third.wav"),
+                ],
+                "user_id": "user-1",
+            },
+            content_type="multipart/form-data",
+        )
+
+    assert response.status_code == 207
+    assert response.json["status"] == "partial"
+    assert response.json["stored"] == 2
+    items = response.json["items"]
+    assert [item["status"] for item in items] == ["success", "error", "success"]
+    assert items[0]["data"]["file_name"] == "first.wav"
+    assert isinstance(items[0]["data"]["_id"], str)
+    assert "could not be read" in items[1]["error"]
+    assert items[1]["code"] == 400
+
+    mock_collection.insert_many.assert_called_once()
+    stored = mock_collection.insert_many.call_args.args[0]
+    assert [entry["file_name"] for entry in stored] == ["first.wav", "third.wav"]
+    mock_collection.insert_one.assert_not_called()
+
+
+@patch("src.main.get_collection")
+@patch("src.main.transcribe_audio", side_effect=ValueError("not a WAV file"))
+def test_process_audio_batch_rejects_unreadable_batch(
+    _mock_transcribe_audio, mock_get_collection, flask_test_client
+):
+    """
+    Test that a batch of only unreadable files is a bad request, while a
+    batch failing on this side is a server error.
+    """
+    mock_get_collection.return_value.insert_many.return_value = []
+    batch = {
+        "audio": [(BytesIO(b"one"), "one.wav"), (BytesIO(b"two"), "two.wav")],
+        "user_id": "user-1",
+    }
+
+    response = flask_test_client.post(
+        "/process-audio-batch", data=batch, content_type="multipart/form-data"
+    )
+    assert response.status_code == 400
+    assert response.json["status"] == "error"
+    assert [item["code"] for item in response.json["items"]] == [400, 400]
+
+    batch["audio"] = [(BytesIO(b"one"), "one.wav"), (BytesIO(b"two"), "two.wav")]
+    with patch("src.main.transcribe_audio", side_effect=RuntimeError("model crashed")):
+        response = flask_test_client.post(
+            "/process-audio-batch", data=batch, content_type="multipart/form-data"
+        )
+    assert response.status_code == 500
+
+
+def test_process_audio_batch_limits_size(flask_test_client):
+    """
+    Test that empty and oversized batches are rejected.
+    """
+    response = flask_test_client.post(
+        "/process-audio-batch", data={}, content_type="multipart/form-data"
+    )
+    assert response.status_code == 400
+
+    with patch("src.main.BATCH_MAX_FILES", 1):
+        response = flask_test_client.post(
+            "/process-audio-batch",
+            data={"audio": [(BytesIO(b"a"), "a.wav"), (BytesIO(b"b"), "b.wav")]},
+            content_type="multipart/form-data",
+        )
+    assert response.status_code == 400
+
+
+@patch("src.main.get_collection")
+@patch("src.main.transcribe_audio", return_value="Test transcription")
+def test_process_audio_uses_write_buffer(
+    _mock_transcribe_audio, mock_get_collection, flask_test_client
+):
+    """
+    Test that entries are handed to the write buffer when it is enabled.
+    """
+    buffer = MagicMock()
+    buffer.add.side_effect = lambda entry: entry.setdefault("_id", ObjectId())
+    with patch("src.main.write_buffer", buffer):
+        response = flask_test_client.post(
+            "/process-audio",
+            data={"audio": (BytesIO(b"buffered"), "test.wav")},
+            content_type="multipart/form-data",
+        )
+
+    assert response.status_code == 200
+    buffer.add.assert_called_once()
+    assert response.json["data"]["_id"] == str(buffer.add.call_args.args[0]["_id"])
+    mock_get_collection.return_value.insert_one.assert_not_called()
@@ -0,0 +1,97 @@
+"""
+Unit tests for the Prometheus metrics in metrics.py.
+"""
+
+from io import BytesIO
+from unittest.mock import patch, MagicMock
+import pytest
+from prometheus_client import REGISTRY
+from src.main import app
+from src.metrics import reset_multiprocess_dir, timed_stage
+from src.result_cache import LocalResultCache
+
+
+def sample(name, **labels):
+    """
+    Read a sample of the default registry, 0 if it was never recorded.
+    """
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+@pytest.fixture(name="flask_test_client")
+def client_fixture():
+    """
+    Flask test client with an in-process result cache.
+    """
+    app.testing = True
+    with patch("src.main.result_cache", LocalResultCache()):
+        with app.test_client() as test_client:
+            yield test_client
+
+
+def test_timed_stage_records_failures():
+    """
+    Test that a stage is timed also when it raises.
+    """
+    before = sample("ml_client_stage_duration_seconds_count", stage="test")
+    with pytest.raises(ValueError):
+        with timed_stage("test"):
+            raise ValueError("boom")
+    assert sample("ml_client_stage_duration_seconds_count", stage="test") == before + 1
+
+
+@patch("src.main.get_collection", return_value=MagicMock())
+@patch("src.main.transcribe_audio", return_value="Test transcription")
+def test_process_audio_is_instrumented(
+    _mock_transcribe_audio, _mock_get_collection, flask_test_client
+):
+    """
+    Test that every stage of `/process-audio` is timed and shows on `/metrics`.
+    """
+    stages = ("cache_lookup", "transcribe", "sentiment", "store")
+    before = {
+        stage: sample("ml_client_stage_duration_seconds_count", stage=stage)
+        for stage in stages
+    }
+    requests = sample(
+        "ml_client_requests_total", endpoint="process_audio", status="200"
+    )
+
+    response = flask_test_client.post(
+        "/process-audio",
+        data={"audio": (BytesIO(b"fake data"), "test.wav")},
+        content_type="multipart/form-data",
+    )
+    assert response.status_code == 200
+
+    for stage in stages:
+        count = sample("ml_client_stage_duration_seconds_count", stage=stage)
+        assert count == before[stage] + 1
+    assert (
+        sample("ml_client_requests_total", endpoint="process_audio", status="200")
+        == requests + 1
+    )
+    assert sample("ml_client_requests_in_flight", endpoint="process_audio") == 0
+
+    metrics = flask_test_client.get("/metrics")
+    assert metrics.status_code == 200
+    assert metrics.mimetype == "text/plain"
+    assert (
+        b'ml_client_stage_duration_seconds_bucket{le="0.001",stage="transcribe"}'
+        in metrics.data
+    )
+
+
+def test_metrics_aggregate_multiprocess_dir(flask_test_client, tmp_path, monkeypatch):
+    """
+    Test that in multiprocess mode the worker files are read instead of the
+    registry of this process, and that stale files are cleared at startup.
+    """
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+    (tmp_path / "counter_123.db").write_bytes(b"")
+    reset_multiprocess_dir()
+    assert not list(tmp_path.iterdir())
+
+    metrics = flask_test_client.get("/metrics")
+    assert metrics.status_code == 200
+    assert b"ml_client_requests_total" not in metrics.data
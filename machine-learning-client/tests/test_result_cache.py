@@ -0,0 +1,95 @@
+"""
+Unit tests for the deduplication cache in result_cache.py.
+"""
+
+import io
+import wave
+from unittest.mock import MagicMock, patch
+import pytest
+from src.result_cache import (
+    LocalResultCache,
+    MongoResultCache,
+    audio_fingerprint,
+    create_result_cache,
+)
+
+
+def make_wav(frames, comment=b""):
+    """Build a mono 16 kHz WAV, optionally with an extra LIST chunk."""
+    buffer = io.BytesIO()
+    with wave.Wave_write(buffer) as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(16000)
+        wav_file.writeframes(frames)
+    data = buffer.getvalue()
+    if comment:
+        # Insert a LIST chunk between the fmt and data chunks
+        chunk = b"LIST" + len(comment).to_bytes(4, "little") + comment
+        data = data[:36] + chunk + data[36:]
+        data = data[:4] + (len(data) - 8).to_bytes(4, "little") + data[8:]
+    return data
+
+
+def test_fingerprint_ignores_header_metadata():
+    """
+    Test that WAV files with the same samples get the same fingerprint.
+    """
+    frames = b"\x01\x02" * 1000
+    plain = io.BytesIO(make_wav(frames))
+    tagged = io.BytesIO(make_wav(frames, comment=b"INFOtest"))
+
+    assert audio_fingerprint(plain) == audio_fingerprint(tagged)
+    assert plain.tell() == 0
+    assert audio_fingerprint(plain) != audio_fingerprint(
+        io.BytesIO(make_wav(b"\x03\x04" * 1000))
+    )
+
+
+def test_fingerprint_of_non_wav_data():
+    """
+    Test that data which is not WAV is hashed as raw bytes.
+    """
+    assert audio_fingerprint(io.BytesIO(b"fake data")) == audio_fingerprint(
+        io.BytesIO(b"fake data")
+    )
+
+
+def test_local_cache_counts_and_expires():
+    """
+    Test hit/miss counters and TTL expiry of the local cache.
+    """
+    cache = LocalResultCache(ttl_seconds=60)
+    assert cache.get("key") is None
+    cache.put("key", {"transcript": "hello"})
+    assert cache.get("key") == {"transcript": "hello"}
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+    with patch("src.result_cache.time.monotonic", return_value=float("inf")):
+        assert cache.get("key") is None
+
+
+def test_mongo_cache_creates_ttl_index():
+    """
+    Test that the Mongo cache creates a TTL index once and upserts results.
+    """
+    collection = MagicMock()
+    collection.find_one.return_value = {"result": {"transcript": "hello"}}
+    cache = MongoResultCache(lambda: collection, ttl_seconds=3600)
+
+    cache.put("key", {"transcript": "hello"})
+    assert cache.get("key") == {"transcript": "hello"}
+    collection.create_index.assert_called_once_with(
+        "created_at", expireAfterSeconds=3600
+    )
+    assert collection.update_one.call_args.kwargs["upsert"] is True
+
+
+def test_create_result_cache():
+    """
+    Test backend selection for the result cache.
+    """
+    assert isinstance(create_result_cache("local"), LocalResultCache)
+    with pytest.raises(ValueError):
+        create_result_cache("redis")
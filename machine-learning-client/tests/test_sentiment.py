@@ -0,0 +1,74 @@
+"""
+Unit tests for the cached sentiment engine in sentiment.py.
+"""
+
+from textblob import TextBlob
+from src.sentiment import SentimentEngine, mood_from_polarity
+
+
+def test_matches_textblob():
+    """
+    Test that results match a plain TextBlob analysis.
+    """
+    engine = SentimentEngine()
+    for text in ["I love coding", "I hate bugs", "The sky is above"]:
+        blob = TextBlob(text)
+        result = engine.analyze(text)
+        assert result == {
+            "polarity": blob.sentiment.polarity,
+            "subjectivity": blob.sentiment.subjectivity,
+            "mood": mood_from_polarity(blob.sentiment.polarity),
+        }
+
+
+def test_cache_hits_on_normalized_text():
+    """
+    Test that texts differing only in whitespace share one cache entry.
+    """
+    engine = SentimentEngine()
+    first = engine.analyze("I love coding")
+    second = engine.analyze("  I love\tcoding ")
+    assert first == second
+    assert engine.cache_info()["misses"] == 1
+    assert engine.cache_info()["hits"] == 1
+
+
+def test_cached_results_are_copies():
+    """
+    Test that mutating a returned result does not corrupt the cache.
+    """
+    engine = SentimentEngine()
+    engine.analyze("I love coding")["mood"] = "Changed"
+    assert engine.analyze("I love coding")["mood"] == "Positive"
+
+
+def test_cache_is_bounded():
+    """
+    Test that the least recently used entries are evicted and long texts skipped.
+    """
+    engine = SentimentEngine(cache_size=2, max_text_length=20)
+    engine.analyze("good")
+    engine.analyze("bad")
+    engine.analyze("good")
+    engine.analyze("fine")
+    engine.analyze("a very long transcript that will not be cached")
+
+    assert engine.cache_info()["size"] == 2
+    engine.analyze("bad")
+    assert engine.cache_info()["hits"] == 1
+
+
+def test_analyze_batch_computes_each_text_once():
+    """
+    Test that duplicate texts in a batch are analyzed once and order is kept.
+    """
+    engine = SentimentEngine()
+    texts = ["I love coding", "I hate bugs", "I love coding"]
+    results = engine.analyze_batch(texts)
+    assert [result["mood"] for result in results] == [
+        "Positive",
+        "Negative",
+        "Positive",
+    ]
+    assert engine.cache_info()["misses"] == 2
+    assert engine.cache_info()["hits"] == 0
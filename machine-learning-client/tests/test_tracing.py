@@ -0,0 +1,117 @@
+"""
+Unit tests for request correlation and span timing in tracing.py.
+"""
+
+import logging
+from io import BytesIO
+from unittest.mock import patch, MagicMock
+import pytest
+from src.main import app
+from src.result_cache import LocalResultCache
+from src.tracing import RequestIdFilter, collect_spans, parse_client_timings
+
+SENTIMENT = {"polarity": 0.5, "subjectivity": 0.6, "mood": "Positive"}
+
+
+@pytest.fixture(name="flask_test_client")
+def client_fixture():
+    """
+    Flask test client with an in-process result cache.
+    """
+    app.testing = True
+    with patch("src.main.result_cache", LocalResultCache()):
+        with app.test_client() as test_client:
+            yield test_client
+
+
+@patch("src.main.get_collection")
+@patch("src.main.transcribe_audio", return_value="Test transcription")
+@patch("src.main.analyze_sentiment", return_value=SENTIMENT)
+def test_entry_keeps_request_id_and_timings(
+    _mock_analyze_sentiment,
+    _mock_transcribe_audio,
+    mock_get_collection,
+    flask_test_client,
+):
+    """
+    Test that the stored entry carries the caller's correlation ID and the
+    duration of each stage, and that the ID is echoed in the response.
+    """
+    collection = MagicMock()
+    mock_get_collection.return_value = collection
+
+    response = flask_test_client.post(
+        "/process-audio",
+        data={
+            "audio": (BytesIO(b"fake data"), "test.wav"),
+            "timings": '{"save": 1.5, "queue": 30, "bad stage": 1, "convert": -1}',
+        },
+        content_type="multipart/form-data",
+        headers={"X-Request-ID": "upload-1"},
+    )
+
+    assert response.status_code == 200
+    assert response.headers["X-Request-ID"] == "upload-1"
+    entry = collection.insert_one.call_args.args[0]
+    assert entry["request_id"] == "upload-1"
+    assert set(entry["timings"]) == {"cache_lookup", "transcribe", "sentiment"}
+    assert all(value >= 0 for value in entry["timings"].values())
+    assert entry["web_timings"] == {"save": 1.5, "queue": 30.0}
+
+
+def test_malformed_client_timings_are_ignored():
+    """
+    Test that timings which are not a small JSON object of durations are
+    dropped instead of stored.
+    """
+    assert not parse_client_timings(None)
+    assert not parse_client_timings("not json")
+    assert not parse_client_timings("[1, 2]")
+    assert not parse_client_timings('{"save": "fast", "convert": true}')
+
+
+@patch("src.main.get_collection")
+@patch("src.main.transcribe_audio", return_value="Test transcription")
+@patch("src.main.analyze_sentiment", return_value=SENTIMENT)
+def test_batch_entries_keep_request_id_and_timings(
+    _mock_analyze_sentiment,
+    _mock_transcribe_audio,
+    mock_get_collection,
+    flask_test_client,
+):
+    """
+    Test that entries processed on the batch pool get their own timings and
+    the correlation ID of the batch request.
+    """
+    collection = MagicMock()
+    mock_get_collection.return_value = collection
+
+    response = flask_test_client.post(
+        "/process-audio-batch",
+        data={
+            "audio": [(BytesIO(b"one"), "a.wav"), (BytesIO(b"two"), "b.wav")],
+            "bypass_cache": "true",
+        },
+        content_type="multipart/form-data",
+        headers={"X-Request-ID": "batch-1"},
+    )
+
+    assert response.status_code == 200
+    entries = collection.insert_many.call_args.args[0]
+    assert [entry["request_id"] for entry in entries] == ["batch-1", "batch-1"]
+    assert all(
+        set(entry["timings"]) == {"transcribe", "sentiment"} for entry in entries
+    )
+
+
+def test_log_records_carry_request_id():
+    """
+    Test that log records are tagged with the active correlation ID.
+    """
+    record = logging.makeLogRecord({"msg": "hello"})
+    with collect_spans("job-1"):
+        RequestIdFilter().filter(record)
+    assert record.request_id == "job-1"
+
+    RequestIdFilter().filter(record)
+    assert record.request_id == "-"
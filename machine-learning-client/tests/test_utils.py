@@ -3,9 +3,23 @@ Unit tests for utility functions in utils.py, including file handling,
 transcription, sentiment analysis, and database operations.
 """
 
+from array import array
+from datetime import datetime
 from unittest.mock import patch, MagicMock
-from speech_recognition import RequestError, UnknownValueError
-from src.utils import get_audio_files, transcribe_audio, analyze_sentiment
+import pytest
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from speech_recognition import AudioData, RequestError, UnknownValueError
+from src.backends import GoogleBackend, StubBackend
+from src.utils import (
+    TranscriptionIncomplete,
+    get_audio_files,
+    transcribe_audio,
+    transcribe_chunked,
+    analyze_sentiment,
+    store_data,
+    store_many,
+)
 
 
 @patch("src.utils.glob.glob", return_value=["file1.wav", "file2.wav"])
@@ -89,6 +103,94 @@ def test_transcribe_audio_error2(mock_recognizer):
     ), "Expected the function to return an empty string on UnknownError"
 
 
+def make_speech_audio(segments):
+    """
+    Build AudioData of alternating 2 s square-wave "words" and 1 s pauses.
+    """
+    pause = bytes(16000 * 2)
+    word = array("h", [3000, -3000] * 16000).tobytes()
+    return AudioData((word + pause) * segments, 16000, 2)
+
+
+def test_transcribe_chunked_joins_chunks_in_order():
+    """
+    Test that chunk transcripts are stitched together in their original order.
+    """
+    recognizer = MagicMock()
+    recognizer.recognize_google.side_effect = lambda audio: str(len(audio.frame_data))
+
+    audio = make_speech_audio(4)
+    text = transcribe_chunked(GoogleBackend(recognizer), audio, max_chunk_seconds=4)
+
+    lengths = [int(part) for part in text.split()]
+    assert len(lengths) > 1
+    assert sum(lengths) <= len(audio.frame_data)
+    assert recognizer.recognize_google.call_count == len(lengths)
+
+
+def test_transcribe_chunked_keeps_partial_results():
+    """
+    Test that a failing chunk is skipped instead of blanking the transcript.
+    """
+    calls = []
+
+    def recognize(_audio):
+        calls.append(1)
+        if len(calls) == 1:
+            raise RequestError("Mocked RequestError")
+        if len(calls) == 2:
+            raise UnknownValueError()
+        return "words"
+
+    recognizer = MagicMock()
+    recognizer.recognize_google.side_effect = recognize
+
+    text = transcribe_chunked(
+        GoogleBackend(recognizer),
+        make_speech_audio(4),
+        max_chunk_seconds=3,
+        max_workers=1,
+    )
+    assert text.startswith("words")
+    assert len(calls) > 2
+
+    calls.clear()
+    with pytest.raises(TranscriptionIncomplete) as incomplete:
+        transcribe_chunked(
+            GoogleBackend(recognizer),
+            make_speech_audio(4),
+            max_chunk_seconds=3,
+            max_workers=1,
+            require_complete=True,
+        )
+    assert incomplete.value.text.startswith("words")
+
+
+def test_transcribe_chunked_sends_one_batch_to_batch_backends():
+    """
+    Test that batch-capable backends receive all chunks in a single call.
+    """
+    backend = StubBackend()
+    with patch.object(
+        backend, "transcribe_batch", wraps=backend.transcribe_batch
+    ) as mock_batch:
+        text = transcribe_chunked(backend, make_speech_audio(4), max_chunk_seconds=3)
+    mock_batch.assert_called_once()
+    assert len(mock_batch.call_args.args[0]) > 1
+    assert text
+
+
+@patch("src.utils.transcribe_chunked", return_value="chunked text")
+@patch("src.utils.sr.Recognizer")
+def test_transcribe_audio_chunked_mode(_mock_recognizer, mock_chunked):
+    """
+    Test that `transcribe_audio` dispatches to chunked transcription when asked.
+    """
+    with patch("src.utils.sr.AudioFile"):
+        assert transcribe_audio("mock_file.wav", chunked=True) == "chunked text"
+    mock_chunked.assert_called_once()
+
+
 def test_analyze_sentiment():
     """
     Test the `analyze_sentiment` function to ensure it returns correct sentiment analysis.
@@ -100,3 +202,96 @@ def test_analyze_sentiment():
     result = analyze_sentiment("I hate bugs")
     assert result["mood"] == "Negative"
     assert result["polarity"] < 0
+
+
+def test_store_data_updates_mood_counters():
+    """
+    Test that `store_data` inserts the entry and increments the user's counter.
+    """
+    collection = MagicMock()
+    data = {"user_id": "user-1", "sentiment": {"mood": "Negative"}}
+
+    store_data(collection, data)
+
+    # The pending write is announced before the entry is inserted
+    calls = [name for name, _, _ in collection.mock_calls]
+    assert calls.index("database.__getitem__().bulk_write") < calls.index("insert_one")
+    collection.insert_one.assert_called_once_with(data)
+    collection.database.__getitem__.assert_called_with("user_stats")
+    collection.database.__getitem__.return_value.update_one.assert_called_once_with(
+        {"_id": "user-1"},
+        {"$inc": {"version": 1, "mood_counts.Negative": 1}},
+        upsert=True,
+    )
+
+
+def test_store_many_counts_only_stored_entries():
+    """
+    Test that entries rejected by insert_many are reported and not counted.
+    """
+    collection = MagicMock()
+    collection.insert_many.side_effect = BulkWriteError(
+        {"writeErrors": [{"index": 1, "errmsg": "duplicate key"}]}
+    )
+    entries = [
+        {"user_id": "user-1", "sentiment": {"mood": "Positive"}},
+        {"user_id": "user-1", "sentiment": {"mood": "Negative"}},
+        {"user_id": "user-2", "sentiment": {"mood": "Positive"}},
+    ]
+
+    assert store_many(collection, entries) == [1]
+
+    collection.insert_many.assert_called_once_with(entries, ordered=False)
+    stats = collection.database.__getitem__.return_value
+    assert stats.bulk_write.call_args.args[0] == [
+        UpdateOne(
+            {"_id": "user-1"},
+            {"$inc": {"version": 1, "mood_counts.Positive": 1}},
+            upsert=True,
+        ),
+        UpdateOne(
+            {"_id": "user-2"},
+            {"$inc": {"version": 1, "mood_counts.Positive": 1}},
+            upsert=True,
+        ),
+    ]
+
+
+def test_store_many_updates_daily_rollups():
+    """
+    Test that stored entries are added to one rollup per user and day, with
+    the mood count and the polarity and subjectivity sums.
+    """
+    collections = {"user_stats": MagicMock(), "mood_rollups": MagicMock()}
+    collection = MagicMock()
+    collection.database.__getitem__.side_effect = collections.__getitem__
+    day = datetime(2024, 11, 3)
+    entries = [
+        {
+            "user_id": "user-1",
+            "timestamp": day.replace(hour=hour),
+            "sentiment": {"mood": mood, "polarity": polarity, "subjectivity": 0.5},
+        }
+        for hour, mood, polarity in ((8, "Positive", 0.75), (20, "Negative", -0.25))
+    ]
+
+    store_many(collection, entries)
+
+    assert collections["mood_rollups"].bulk_write.call_args.args[0] == [
+        UpdateOne(
+            {"_id": "user-1:2024-11-03"},
+            {
+                "$inc": {
+                    "count": 2,
+                    "mood_counts.Positive": 1,
+                    "mood_counts.Negative": 1,
+                    "polarity_sum": 0.5,
+                    "subjectivity_sum": 1.0,
+                },
+                "$setOnInsert": {"user_id": "user-1", "day": day},
+            },
+            upsert=True,
+        )
+    ]
+    # The pending write is announced first, then the counters are updated
+    assert collections["user_stats"].bulk_write.call_count == 2
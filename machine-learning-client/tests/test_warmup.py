@@ -0,0 +1,56 @@
+"""
+Unit tests for the startup warm-up and readiness endpoints.
+"""
+
+from unittest.mock import patch
+import pytest
+from src.main import app
+from src.sentiment import default_engine
+from src.warmup import warm_up
+
+
+@pytest.fixture(name="flask_test_client")
+def client_fixture(monkeypatch):
+    """
+    Flask test client for a process that has not warmed up yet.
+    """
+    monkeypatch.setenv("TRANSCRIPTION_BACKEND", "stub")
+    app.testing = True
+    with patch.dict("src.warmup._STATE", {"ready": False, "error": None, "phases": {}}):
+        with app.test_client() as test_client:
+            yield test_client
+
+
+def test_ready_only_after_warm_up(flask_test_client):
+    """
+    Test that the service is live at once but ready only after the warm-up,
+    which reports the time of every phase.
+    """
+    assert flask_test_client.get("/healthz").status_code == 200
+    assert flask_test_client.get("/readyz").status_code == 503
+
+    report = warm_up()
+
+    assert report["ready"] is True
+    assert {"warmup_sentiment", "warmup_transcription", "warmup_total"} <= set(
+        report["phases_ms"]
+    )
+    response = flask_test_client.get("/readyz")
+    assert response.status_code == 200
+    assert response.json == report
+    # The warm-up call does not count towards the sentiment cache statistics
+    assert default_engine.cache_info()["size"] == 0
+
+
+def test_failed_warm_up_stays_not_ready(flask_test_client):
+    """
+    Test that a failing phase is reported and keeps the service out of rotation.
+    """
+    with patch("src.warmup.warm_transcription", side_effect=OSError("no models")):
+        report = warm_up()
+
+    assert report["ready"] is False
+    assert report["error"] == "no models"
+    response = flask_test_client.get("/readyz")
+    assert response.status_code == 503
+    assert response.json["error"] == "no models"
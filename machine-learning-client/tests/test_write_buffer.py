@@ -0,0 +1,183 @@
+"""
+Unit tests for the write-behind buffer in write_buffer.py.
+"""
+
+import time
+from unittest.mock import MagicMock
+from pymongo.errors import AutoReconnect, BulkWriteError
+from src.write_buffer import WriteBuffer
+
+
+def make_buffer(tmp_path, collection, **options):
+    """
+    Build a buffer writing to the given collection, journaling under tmp_path.
+    """
+    options = {"flush_interval": 60, "retry_backoff": 0, **options}
+    return WriteBuffer(
+        lambda: collection, journal_path=str(tmp_path / "journal.jsonl"), **options
+    )
+
+
+def entry(number):
+    """
+    Build a journal entry.
+    """
+    return {"user_id": "user-1", "file_name": f"{number}.wav", "sentiment": {}}
+
+
+def test_entries_are_written_in_batches(tmp_path):
+    """
+    Test that many entries cost one insert_many per batch, not one per entry.
+    """
+    collection = MagicMock()
+    buffer = make_buffer(tmp_path, collection, max_entries=50)
+    for number in range(120):
+        buffer.add(entry(number))
+    buffer.close()
+
+    sizes = [len(call.args[0]) for call in collection.insert_many.call_args_list]
+    assert sizes == [50, 50, 20]
+    collection.insert_one.assert_not_called()
+    assert buffer.stats()["written"] == 120
+    assert buffer.stats()["buffered"] == 0
+
+
+def test_entry_ids_are_assigned_when_queued(tmp_path):
+    """
+    Test that queued entries get their ObjectId right away.
+    """
+    buffer = make_buffer(tmp_path, MagicMock())
+    queued = entry(1)
+    buffer.add(queued)
+    assert "_id" in queued
+    buffer.close()
+
+
+def test_failed_writes_are_retried(tmp_path):
+    """
+    Test that a transient failure is retried and duplicates from the earlier
+    attempt count as stored.
+    """
+    collection = MagicMock()
+    collection.insert_many.side_effect = [
+        AutoReconnect("primary stepped down"),
+        BulkWriteError({"writeErrors": [{"index": 0, "code": 11000}]}),
+    ]
+    buffer = make_buffer(tmp_path, collection)
+    buffer.add(entry(1))
+    buffer.add(entry(2))
+    buffer.close()
+
+    stats = buffer.stats()
+    assert (stats["retries"], stats["written"], stats["spilled"]) == (1, 2, 0)
+    assert not (tmp_path / "journal.jsonl").exists()
+
+
+def test_unwritable_entries_are_journaled_and_replayed(tmp_path):
+    """
+    Test that entries are spilled to the journal while MongoDB is down and
+    written by the next successful flush.
+    """
+    collection = MagicMock()
+    collection.insert_many.side_effect = AutoReconnect("down")
+    buffer = make_buffer(tmp_path, collection, max_retries=1)
+    first = entry(1)
+    buffer.add(first)
+    buffer.flush()
+
+    assert buffer.stats()["spilled"] == 1
+    assert (tmp_path / "journal.jsonl").read_text().count("\n") == 1
+
+    collection.insert_many.side_effect = None
+    buffer.add(entry(2))
+    buffer.close()
+
+    replayed = collection.insert_many.call_args.args[0]
+    assert [item["_id"] for item in replayed] == [first["_id"]]
+    assert buffer.stats()["replayed"] == 1
+    assert not list(tmp_path.iterdir())
+
+
+def test_entries_are_dropped_when_no_journal_can_be_written(tmp_path):
+    """
+    Test that entries go back into the buffer a limited number of times while
+    the journal cannot be written, and rejected entries are not put back.
+    """
+    collection = MagicMock()
+    collection.insert_many.side_effect = AutoReconnect("down")
+    buffer = WriteBuffer(
+        lambda: collection,
+        journal_path=str(tmp_path / "missing" / "journal.jsonl"),
+        max_retries=0,
+        max_requeues=2,
+    )
+    buffer.add(entry(1))
+    for _ in range(2):
+        buffer.flush()
+        assert buffer.stats()["buffered"] == 1
+    buffer.flush()
+    assert (buffer.stats()["buffered"], buffer.stats()["dropped"]) == (0, 1)
+
+    collection.insert_many.side_effect = TypeError("cannot encode object")
+    buffer.add(entry(2))
+    buffer.flush()
+    assert (buffer.stats()["buffered"], buffer.stats()["dropped"]) == (0, 2)
+
+
+def wait_for(condition, timeout=2.0):
+    """
+    Poll a condition until it holds or the timeout passes.
+    """
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_unexpected_errors_keep_entries_and_thread(tmp_path):
+    """
+    Test that a batch failing with a non-MongoDB error is kept in the rejected
+    journal, and that the background thread goes on writing later entries.
+    """
+    collection = MagicMock()
+    collection.insert_many.side_effect = [TypeError("cannot encode object"), None]
+    buffer = make_buffer(tmp_path, collection, flush_interval=0.01)
+    buffer.add(entry(1))
+    assert wait_for(lambda: buffer.stats()["spilled"] == 1)
+    assert collection.insert_many.call_count == 1
+
+    buffer.add(entry(2))
+    assert wait_for(lambda: buffer.stats()["written"] == 1)
+    assert buffer.stats()["buffered"] == 0
+    buffer.close()
+    assert (tmp_path / "journal.jsonl.rejected").read_text().count("\n") == 1
+
+
+def test_dead_thread_is_restarted(tmp_path):
+    """
+    Test that adding an entry restarts a background thread that has died.
+    """
+    buffer = make_buffer(tmp_path, MagicMock(), flush_interval=0.01)
+    buffer.add(entry(1))
+    buffer.close()
+    assert not buffer._worker["thread"].is_alive()  # pylint: disable=W0212
+
+    buffer.add(entry(2))
+    assert buffer._worker["thread"].is_alive()  # pylint: disable=W0212
+    assert wait_for(lambda: buffer.stats()["written"] == 2)
+    buffer.close()
+
+
+def test_corrupt_journal_lines_are_moved_aside(tmp_path):
+    """
+    Test that unreadable journal lines do not stop the replay of the others.
+    """
+    collection = MagicMock()
+    buffer = make_buffer(tmp_path, collection)
+    (tmp_path / "journal.jsonl").write_text(
+        '{"user_id": "user-1", "file_name": "1.wav"}\n{"truncated\n'
+    )
+
+    assert buffer.replay_journal() == 1
+    assert collection.insert_many.call_args.args[0][0]["file_name"] == "1.wav"
+    assert (tmp_path / "journal.jsonl.corrupt").read_text() == '{"truncated\n'
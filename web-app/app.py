@@ -4,13 +4,18 @@ It uses environment variables for configuration.
 """
 
 import os  # Standard library imports
+import json
+import itertools
 import subprocess
+import tempfile
 import uuid
 from datetime import datetime
 import logging
 import requests
 from flask import (
     Flask,
+    Request,
+    Response,
     render_template,
     jsonify,
     request,
@@ -18,6 +23,7 @@ from flask import (
     url_for,
     flash,
     session,
+    stream_with_context,
 )
 from flask_login import (
     LoginManager,
@@ -29,9 +35,33 @@ from flask_login import (
 )
 from werkzeug.security import generate_password_hash, check_password_hash
 from pymongo import MongoClient
-from pymongo.errors import PyMongoError
+from pymongo.errors import DuplicateKeyError, PyMongoError
 from dotenv import load_dotenv
 from bson.objectid import ObjectId
+from jobs import JobWorkerPool, create_job_store, new_job
+from audio import convert_audio_stream
+from user_stats import (
+    get_mood_counts,
+    get_mood_trends,
+    record_entry_removed,
+    record_write_pending,
+    trend_range,
+)
+from pagination import fetch_page, paginate
+from search import create_search_backend, search_entries
+from cache import LRUCache, TTLCache
+from serving import run_blocking
+from ml_transport import CircuitOpenError, create_transport
+from metrics import metrics_response, timed_stage, track_requests
+from tracing import (
+    collect_spans,
+    configure_logging,
+    current_request_id,
+    current_spans,
+    init_tracing,
+    record_span,
+    span_timings,
+)
 
 
 # User Class
@@ -60,18 +90,62 @@ class User(UserMixin):
 
 
 load_dotenv()
+configure_logging()
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
 ML_CLIENT_URL = os.getenv(
     "ML_CLIENT_URL", "http://machine-learning-client:5001/process-audio"
 )
+# "sync" processes uploads inside the request, "async" enqueues a job instead
+UPLOAD_MODE = os.getenv("UPLOAD_MODE", "sync")
+JOB_BACKEND = os.getenv("JOB_BACKEND", "mongo")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+# "stream" pipes audio through ffmpeg in memory, "file" converts on disk
+CONVERT_MODE = os.getenv("CONVERT_MODE", "stream")
+RECENT_ENTRIES_PAGE_SIZE = int(os.getenv("RECENT_ENTRIES_PAGE_SIZE", "100"))
+RECENT_ENTRIES_MAX_PAGE_SIZE = 500
+# "mongo" searches the text index, "memory" per-user indexes in the worker
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "mongo")
+SEARCH_PAGE_SIZE = int(os.getenv("SEARCH_PAGE_SIZE", "20"))
+SEARCH_MAX_PAGE_SIZE = 100
+# Users whose search index the "memory" backend keeps per process
+SEARCH_INDEX_CACHE_SIZE = int(os.getenv("SEARCH_INDEX_CACHE_SIZE", "64"))
+# Rendered homepages kept per process, one per user
+PAGE_CACHE_SIZE = int(os.getenv("PAGE_CACHE_SIZE", "1024"))
+# User records kept per process; 0 seconds disables the cache
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL_SECONDS = int(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+# Uploads and converted audio stay in memory up to this size
+AUDIO_SPOOL_MAX_BYTES = int(os.getenv("AUDIO_SPOOL_MAX_BYTES", str(8 * 1024 * 1024)))
+
+
+class SpooledRequest(Request):
+    """
+    Request that buffers uploaded files in memory up to AUDIO_SPOOL_MAX_BYTES
+    and only spills larger files to an anonymous temporary file.
+    """
+
+    def _get_file_stream(
+        self, total_content_length, content_type, filename=None, content_length=None
+    ):
+        return tempfile.SpooledTemporaryFile(  # pylint: disable=consider-using-with
+            max_size=AUDIO_SPOOL_MAX_BYTES, mode="rb+"
+        )
+
 
 app = Flask(__name__)
+app.request_class = SpooledRequest
+init_tracing(app)
 app.secret_key = "your_secret_key"  # Set a secret key for session management
 
 client = MongoClient(MONGO_URI)
 db = client["voice_mood_journal"]
 collection = db["entries"]
 
+# Rendered homepages by user
+page_cache = LRUCache(PAGE_CACHE_SIZE)
+search_backend = create_search_backend(SEARCH_BACKEND, db, SEARCH_INDEX_CACHE_SIZE)
+user_cache = TTLCache(USER_CACHE_SIZE, USER_CACHE_TTL_SECONDS)
+
 # Directory to temporarily store uploaded files
 UPLOAD_FOLDER = "./uploads"
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
@@ -89,13 +163,22 @@ def load_user(user_id):
     """
     User loader callback for Flask-Login.
 
+    User records are served from `user_cache` for up to
+    USER_CACHE_TTL_SECONDS, so most requests do not query MongoDB.
+
     Args:
         user_id (str): The user's unique ID.
 
     Returns:
         User: The User object if found, else None.
     """
-    user_data = db.users.find_one({"_id": ObjectId(user_id)})
+    user_data = user_cache.get(user_id)
+    if user_data is None:
+        user_data = db.users.find_one(
+            {"_id": ObjectId(user_id)}, {"username": 1, "password": 1}
+        )
+        if user_data:
+            user_cache.set(user_id, user_data)
     if user_data:
         return User(
             user_id=str(user_data["_id"]),
@@ -131,7 +214,12 @@ def register():
             flash("Username already exists.")
             return redirect(url_for("register"))
 
-        db.users.insert_one({"username": username, "password": hashed_password})
+        try:
+            db.users.insert_one({"username": username, "password": hashed_password})
+        except DuplicateKeyError:
+            # Registered concurrently; the unique username index rejected it
+            flash("Username already exists.")
+            return redirect(url_for("register"))
         flash("Registration successful. Please log in.")
         return redirect(url_for("login"))
 
@@ -181,6 +269,7 @@ def logout():
     Returns:
         Response: Redirects to the login page with a logout message.
     """
+    user_cache.pop(current_user.get_id())
     logout_user()
     session.pop("_flashes", None)
     flash("You have been logged out.")
@@ -190,21 +279,17 @@ def logout():
 @app.route("/")
 @login_required
 def index():
-    """Render the homepage with mood summary data."""
-    mood_entries = collection.find().sort("timestamp", -1).limit(100)
-    entries = [
-        {
-            "file_name": entry["file_name"],
-            "transcript": entry["transcript"],
-            "sentiment": entry["sentiment"],
-            "timestamp": entry["timestamp"],
-        }
-        for entry in mood_entries
-    ]
+    """
+    Render the homepage, reusing the user's cached page.
 
-    return render_template(
-        "index.html", username=current_user.username, entries=entries
-    )
+    The page only shows the username, so no entries are read for it.
+    """
+    cache_key = ("index", current_user.get_id())
+    page = page_cache.get(cache_key)
+    if page is None:
+        page = render_template("index.html", username=current_user.username)
+        page_cache.set(cache_key, page)
+    return page
 
 
 def convert_to_pcm_wav(input_file, output_file):
@@ -229,33 +314,209 @@ def convert_to_pcm_wav(input_file, output_file):
         raise RuntimeError(f"ffmpeg conversion failed: {e.stderr.decode()}") from e
 
 
-@app.route("/upload", methods=["POST"])
-def upload_audio():
+def prepare_audio(source, file_path, converted_file_path):
     """
-    Handle audio file uploads from the frontend.
-    Saves the file locally and forwards it to the machine learning client.
+    Produce the PCM WAV payload for the machine learning client.
+
+    In stream mode the audio is converted into a spooled in-memory buffer (and
+    passed through untouched when it already is 16 kHz mono PCM WAV). In file
+    mode the saved upload is converted on disk with `convert_to_pcm_wav`.
+
+    Args:
+        source (file): The uploaded audio, used in stream mode.
+        file_path (str): Path to the saved upload, used in file mode.
+        converted_file_path (str): Path for the converted file in file mode.
+
+    Returns:
+        file: A readable file object with the converted WAV data.
+
+    Raises:
+        RuntimeError: If the conversion fails.
     """
-    if "audio" not in request.files:
-        return jsonify({"error": "No audio file provided"}), 400
+    with timed_stage("convert"):
+        if CONVERT_MODE == "stream":
+            return convert_audio_stream(source, AUDIO_SPOOL_MAX_BYTES)
 
-    audio_file = request.files["audio"]
+        convert_to_pcm_wav(file_path, converted_file_path)
+    return open(converted_file_path, "rb")  # pylint: disable=consider-using-with
 
-    # Generate unique filenames
-    file_extension = os.path.splitext(audio_file.filename)[1]
-    unique_filename = f"{uuid.uuid4().hex}{file_extension}"
-    file_path = os.path.join(app.config["UPLOAD_FOLDER"], unique_filename)
-    converted_file_path = os.path.join(
-        app.config["UPLOAD_FOLDER"], f"converted_{unique_filename}"
-    )
 
+def remove_files(*paths):
+    """
+    Delete files written while handling an upload, ignoring missing ones.
+
+    Args:
+        *paths (str): The paths to delete.
+    """
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as os_error:
+            logging.error("Failed to remove %s: %s", path, os_error)
+
+
+ml_client = create_transport(ML_CLIENT_URL)
+
+
+def forward_to_ml_client(wav_file, file_name, user_id, request_id=None, timings=None):
+    """
+    Send a converted WAV file to the machine learning client.
+
+    Args:
+        wav_file (file): A readable file object with the PCM WAV data.
+        file_name (str): The file name reported to the machine learning client.
+        user_id (str): The ID of the user who owns the recording.
+        request_id (str): The correlation ID to pass on; defaults to that of
+            the current request.
+        timings (dict): The web app's stage timings to store with the entry;
+            defaults to the spans recorded so far.
+
+    Returns:
+        requests.Response: The response of the machine learning client.
+
+    Raises:
+        ml_transport.CircuitOpenError: If the ML client is failing.
+        requests.exceptions.RequestException: If the request fails.
+    """
+    if timings is None:
+        timings = span_timings(current_spans())
+    with timed_stage("forward"):
+        return ml_client.post_audio(
+            wav_file,
+            file_name,
+            user_id,
+            request_id or current_request_id(),
+            timings=timings,
+        )
+
+
+def process_upload_job(job, report):
+    """
+    Run conversion, transcription and sentiment analysis for a queued upload.
+
+    Runs under the correlation ID of the upload request. The upload's save
+    timing, the time spent queued and the conversion are forwarded to the
+    machine learning client to be stored with the entry. The stored upload
+    and any converted file are deleted once the job ends.
+
+    Args:
+        job (dict): The job document holding the stored file paths.
+        report (callable): Callback taking a stage name and a progress percentage.
+
+    Returns:
+        dict: The response of the machine learning client.
+
+    Raises:
+        RuntimeError: If conversion or the machine learning client fails.
+    """
+    payload = job["payload"]
+    file_path = payload["file_path"]
+    converted_file_path = payload["converted_file_path"]
     try:
-        audio_file.save(file_path)
-    except IOError as io_error:
-        return jsonify({"error": "Failed to save file", "details": str(io_error)}), 500
+        with collect_spans(payload.get("request_id")) as spans:
+            record_span(
+                "queue", (datetime.utcnow() - job["created_at"]).total_seconds()
+            )
+            report("converting", 20)
+            with open(file_path, "rb") as source:
+                with prepare_audio(source, file_path, converted_file_path) as wav_file:
+                    report("analyzing", 50)
+                    response = forward_to_ml_client(
+                        wav_file,
+                        os.path.basename(converted_file_path),
+                        job["user_id"],
+                        payload.get("request_id"),
+                        {**payload.get("timings", {}), **span_timings(spans)},
+                    )
+    except requests.exceptions.RequestException as req_error:
+        raise RuntimeError(
+            f"Failed to forward file to ML client: {req_error}"
+        ) from req_error
+    finally:
+        remove_files(file_path, converted_file_path)
+
+    if response.status_code != 200:
+        raise RuntimeError(f"ML client failed: {response.text}")
+    return response.json()
+
+
+def discard_upload_job(job):
+    """
+    Delete the files of a queued upload that will not be processed, e.g. one
+    abandoned after its workers kept dying.
+
+    Args:
+        job (dict): The job document holding the stored file paths.
+    """
+    payload = job["payload"]
+    remove_files(payload["file_path"], payload["converted_file_path"])
+
+
+job_store = create_job_store(JOB_BACKEND, db["jobs"])
+job_pool = JobWorkerPool(
+    job_store, process_upload_job, workers=JOB_WORKERS, on_abandon=discard_upload_job
+)
+
+
+def enqueue_upload(user_id, payload):
+    """
+    Queue a saved upload for the background workers.
+
+    Args:
+        user_id (str): The ID of the user who owns the recording.
+        payload (dict): The job payload holding the stored file paths.
+
+    Returns:
+        Response: 202 with the job ID, or 500 if the job could not be queued.
+    """
+    try:
+        job_id = job_store.enqueue(
+            new_job(
+                user_id,
+                dict(
+                    payload,
+                    request_id=current_request_id(),
+                    timings=span_timings(current_spans()),
+                ),
+            )
+        )
+    except PyMongoError as mongo_error:
+        remove_files(payload["file_path"])
+        return (
+            jsonify({"error": "Failed to queue file", "details": str(mongo_error)}),
+            500,
+        )
+    job_pool.start()
+    return (
+        jsonify(
+            {
+                "message": "File uploaded and queued for processing",
+                "job_id": job_id,
+                "status_url": url_for("job_status", job_id=job_id),
+            }
+        ),
+        202,
+    )
+
+
+def process_upload(user_id, source, file_path, converted_file_path):
+    """
+    Convert an upload and forward it to the machine learning client.
+
+    Args:
+        user_id (str): The ID of the user who owns the recording.
+        source (file): The uploaded audio, used in stream mode.
+        file_path (str): Path to the saved upload, used in file mode.
+        converted_file_path (str): Path to write the PCM WAV file to in file mode.
 
+    Returns:
+        Response: The JSON response for the upload request.
+    """
     try:
         # Convert the uploaded file to PCM WAV format
-        convert_to_pcm_wav(file_path, converted_file_path)
+        wav_file = prepare_audio(source, file_path, converted_file_path)
     except RuntimeError as conversion_error:
         return (
             jsonify(
@@ -267,16 +528,13 @@ def upload_audio():
             500,
         )
 
-    user_id = current_user.get_id()
     # Forward the **converted** file to the machine learning client
     try:
-        with open(converted_file_path, "rb") as file_obj:
-            response = requests.post(
-                ML_CLIENT_URL,
-                files={"audio": file_obj},
-                data={"user_id": user_id},  # Pass the user_id to the ML client
-                timeout=10,
+        with wav_file:
+            response = forward_to_ml_client(
+                wav_file, os.path.basename(converted_file_path), user_id
             )
+        logging.info("ML client answered %d", response.status_code)
 
         if response.status_code == 200:
 
@@ -295,6 +553,11 @@ def upload_audio():
             response.status_code,
         )
 
+    except CircuitOpenError as circuit_error:
+        return (
+            jsonify({"error": "ML client unavailable", "details": str(circuit_error)}),
+            503,
+        )
     except requests.exceptions.RequestException as req_error:
         return (
             jsonify(
@@ -307,6 +570,103 @@ def upload_audio():
         )
 
 
+@app.route("/upload", methods=["POST"])
+@track_requests("upload")
+def upload_audio():
+    """
+    Handle audio file uploads from the frontend.
+    Converts the spooled upload and forwards it to the machine learning client.
+
+    With `mode=async` (or UPLOAD_MODE=async), the file is saved and queued for
+    the background workers instead and a job ID is returned immediately.
+    """
+    if "audio" not in request.files:
+        return jsonify({"error": "No audio file provided"}), 400
+
+    audio_file = request.files["audio"]
+
+    # Generate unique filenames
+    file_extension = os.path.splitext(audio_file.filename)[1]
+    unique_filename = f"{uuid.uuid4().hex}{file_extension}"
+    file_path = os.path.join(app.config["UPLOAD_FOLDER"], unique_filename)
+    converted_file_path = os.path.join(
+        app.config["UPLOAD_FOLDER"], f"converted_{unique_filename}"
+    )
+
+    user_id = current_user.get_id()
+    async_mode = request.values.get("mode", UPLOAD_MODE) == "async"
+    logging.info(
+        "Upload %s from user %s (%s, %s conversion)",
+        audio_file.filename,
+        user_id,
+        "async" if async_mode else "sync",
+        CONVERT_MODE,
+    )
+    if not async_mode and CONVERT_MODE == "stream":
+        # Stream mode never writes the upload to disk
+        return process_upload(
+            user_id, audio_file.stream, file_path, converted_file_path
+        )
+
+    try:
+        with timed_stage("save"):
+            run_blocking(audio_file.save, file_path)
+    except IOError as io_error:
+        remove_files(file_path)
+        return jsonify({"error": "Failed to save file", "details": str(io_error)}), 500
+
+    if async_mode:
+        return enqueue_upload(
+            user_id,
+            {
+                "file_name": audio_file.filename,
+                "file_path": file_path,
+                "converted_file_path": converted_file_path,
+            },
+        )
+
+    try:
+        return process_upload(user_id, None, file_path, converted_file_path)
+    finally:
+        run_blocking(remove_files, file_path, converted_file_path)
+
+
+@app.route("/api/jobs/<job_id>")
+@login_required
+def job_status(job_id):
+    """
+    Report the progress of a queued upload.
+
+    Args:
+        job_id (str): The ID returned by `/upload` in async mode.
+
+    Returns:
+        JSON response with the job status, stage, progress and result.
+    """
+    try:
+        job = job_store.get(job_id)
+    except PyMongoError as mongo_error:
+        logging.error("Database error: %s", mongo_error)
+        return jsonify({"error": "Database error occurred"}), 500
+
+    if job is None or job["user_id"] != current_user.get_id():
+        return jsonify({"error": "Job not found"}), 404
+
+    return (
+        jsonify(
+            {
+                "job_id": job["_id"],
+                "status": job["status"],
+                "stage": job["stage"],
+                "progress": job["progress"],
+                "result": job["result"],
+                "error": job["error"],
+            }
+        ),
+        200,
+    )
+
+
 @app.route("/show_results")
 @login_required
 def show_results():
@@ -315,45 +675,142 @@ def show_results():
 
 
 @app.route("/api/mood-trends")
+@login_required
 def mood_trends():
-    """Provide mood trend data for visualization."""
+    """
+    Provide mood trend data for visualization.
+
+    Without parameters the all-time count per mood is returned. With
+    `granularity` (day, week or month) and optional `from` and `to` dates
+    (YYYY-MM-DD, inclusive), the counts and mean sentiment of every period in
+    the range are returned, read from the daily rollups.
+    """
     user_id = current_user.get_id()
-    mood_counts = {
-        "Positive": collection.count_documents(
-            {"sentiment.mood": "Positive", "user_id": user_id}
-        ),
-        "Negative": collection.count_documents(
-            {"sentiment.mood": "Negative", "user_id": user_id}
-        ),
-        "Neutral": collection.count_documents(
-            {"sentiment.mood": "Neutral", "user_id": user_id}
+    granularity = request.args.get("granularity")
+    try:
+        if granularity is None:
+            return jsonify(get_mood_counts(db, user_id))
+        first, last = trend_range(
+            granularity, request.args.get("from"), request.args.get("to")
+        )
+        buckets = get_mood_trends(db, user_id, granularity, first, last)
+    except ValueError as value_error:
+        return jsonify({"error": str(value_error)}), 400
+    except PyMongoError as mongo_error:
+        logging.error("Database error: %s", mongo_error)
+        return jsonify({"error": "Database error occurred"}), 500
+    return jsonify(
+        {
+            "granularity": granularity,
+            "from": first.strftime("%Y-%m-%d"),
+            "to": last.strftime("%Y-%m-%d"),
+            "buckets": buckets,
+        }
+    )
+
+
+def serialize_entry(entry):
+    """
+    Convert a projected journal entry into its JSON representation.
+
+    Args:
+        entry (dict): An entry as returned by `fetch_page`.
+
+    Returns:
+        dict: The entry ID, transcript, mood, and formatted timestamp.
+    """
+    timestamp = entry.get("timestamp", "")
+    return {
+        "_id": str(entry["_id"]),
+        "transcript": entry.get("transcript", ""),
+        "sentiment": {"mood": (entry.get("sentiment") or {}).get("mood", "")},
+        "timestamp": (
+            timestamp.strftime("%Y-%m-%d %H:%M:%S")
+            if isinstance(timestamp, datetime)
+            else timestamp
         ),
     }
-    return jsonify(mood_counts)
+
+
+def stream_entries_page(page):
+    """
+    Serialize a page of entries as a JSON document, one entry at a time.
+
+    Args:
+        page (iterable): The output of `paginate`.
+
+    Yields:
+        str: Consecutive pieces of the JSON document.
+    """
+    yield '{"entries": ['
+    separator = ""
+    for kind, value in page:
+        if kind == "entry":
+            yield separator + json.dumps(serialize_entry(value))
+            separator = ", "
+        else:
+            yield f'], "next_cursor": {json.dumps(value)}}}'
+
+
+@app.route("/api/cache-stats")
+@login_required
+def cache_stats():
+    """Report the usage of this worker's in-process caches, for sizing them."""
+    return jsonify({"users": user_cache.stats(), "pages": page_cache.stats()})
+
+
+@app.route("/api/ml-client-stats")
+@login_required
+def ml_client_stats():
+    """Report this worker's calls to the machine learning client."""
+    return jsonify(ml_client.stats())
+
+
+@app.route("/metrics")
+def metrics():
+    """
+    Expose upload stage timings and request counts to Prometheus.
+
+    Left unauthenticated for the scraper; restrict access at the network level.
+    """
+    return metrics_response()
 
 
 @app.route("/api/recent-entries")
 @login_required
 def recent_entries():
-    """Provide recent entries data for the current user."""
+    """
+    Provide a page of the current user's entries, newest first.
+
+    Query parameters: `cursor` is the `next_cursor` of the previous page,
+    `limit` the page size, and `stream=1` streams the JSON body instead of
+    building it in memory.
+    """
     user_id = current_user.get_id()
     try:
-        entries = collection.find({"user_id": user_id}).sort("timestamp", -1).limit(100)
-        entries_list = [
-            {
-                "_id": str(entry["_id"]),
-                "file_name": entry.get("file_name", ""),
-                "transcript": entry.get("transcript", ""),
-                "sentiment": entry.get("sentiment", ""),
-                "timestamp": (
-                    entry.get("timestamp", "").strftime("%Y-%m-%d %H:%M:%S")
-                    if isinstance(entry.get("timestamp"), datetime)
-                    else entry.get("timestamp", "")
-                ),
-            }
-            for entry in entries
-        ]
-        return jsonify(entries_list), 200
+        limit = int(request.args.get("limit", RECENT_ENTRIES_PAGE_SIZE))
+        limit = min(max(limit, 1), RECENT_ENTRIES_MAX_PAGE_SIZE)
+        page = paginate(
+            fetch_page(collection, user_id, request.args.get("cursor"), limit), limit
+        )
+        # Run the query now, so database errors are still reported as a 500
+        page = itertools.chain([next(page)], page)
+
+        if request.args.get("stream") == "1":
+            return Response(
+                stream_with_context(stream_entries_page(page)),
+                mimetype="application/json",
+            )
+
+        entries, next_cursor = [], None
+        for kind, value in page:
+            if kind == "entry":
+                entries.append(serialize_entry(value))
+            else:
+                next_cursor = value
+        return jsonify({"entries": entries, "next_cursor": next_cursor}), 200
+    except ValueError:
+        return jsonify({"error": "Invalid cursor or limit"}), 400
     except PyMongoError as mongo_error:
         # Log the error
         logging.error("Database error: %s", mongo_error)
@@ -365,7 +822,62 @@ def recent_entries():
         return jsonify({"error": "Data processing error occurred"}), 500
 
 
+@app.route("/api/search")
+@login_required
+def search():
+    """
+    Search the current user's transcripts, best matches first.
+
+    Query parameters: `q` is the query, `offset` the `next_offset` of the
+    previous page and `limit` the page size. Every result carries a snippet
+    of its transcript around the first match, with the offsets of the
+    matched words.
+    """
+    user_id = current_user.get_id()
+    try:
+        offset = int(request.args.get("offset", 0))
+        limit = int(request.args.get("limit", SEARCH_PAGE_SIZE))
+        limit = min(max(limit, 1), SEARCH_MAX_PAGE_SIZE)
+        results, next_offset = search_entries(
+            search_backend, user_id, request.args.get("q", ""), offset, limit
+        )
+    except ValueError as value_error:
+        return jsonify({"error": str(value_error)}), 400
+    except PyMongoError as mongo_error:
+        logging.error("Database error: %s", mongo_error)
+        return jsonify({"error": "Database error occurred"}), 500
+    return jsonify(
+        {
+            "results": [
+                dict(
+                    serialize_entry(result),
+                    score=round(result["score"], 4),
+                    snippet=result["snippet"],
+                )
+                for result in results
+            ],
+            "next_offset": next_offset,
+        }
+    )
+
+
+def release_recording(key):
+    """
+    Let the machine learning client delete a recording no entry links any more.
+
+    Failures are only logged; the retention purge removes the recording later.
+
+    Args:
+        key (str): The recording key.
+    """
+    try:
+        ml_client.release_audio(key, current_request_id())
+    except requests.exceptions.RequestException as req_error:
+        logging.warning("Failed to release recording %s: %s", key, req_error)
+
+
 @app.route("/delete-journal/<entry_id>", methods=["DELETE"])
+@login_required
 def delete_journal(entry_id):
     """
     Deletes a journal entry by its ID.
@@ -378,10 +890,22 @@ def delete_journal(entry_id):
     """
     try:
         user_id = current_user.get_id()
+        record_write_pending(db, user_id)
         # Attempt to delete the document with the specified ObjectId and user_id
-        result = collection.delete_one({"_id": ObjectId(entry_id), "user_id": user_id})
+        deleted = collection.find_one_and_delete(
+            {"_id": ObjectId(entry_id), "user_id": user_id},
+            projection={
+                "user_id": 1,
+                "timestamp": 1,
+                "sentiment": 1,
+                "audio.key": 1,
+            },
+        )
 
-        if result.deleted_count > 0:
+        if deleted is not None:
+            record_entry_removed(db, deleted)
+            if deleted.get("audio"):
+                release_recording(deleted["audio"]["key"])
             return jsonify({"message": "Entry deleted successfully"}), 200
 
         # Entry not found in the collection
@@ -396,4 +920,6 @@ def delete_journal(entry_id):
 
 
 if __name__ == "__main__":
+    if UPLOAD_MODE == "async":
+        job_pool.start()
     app.run(host="0.0.0.0", port=5000)
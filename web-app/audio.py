@@ -0,0 +1,216 @@
+"""
+Audio helpers for the web app: WAV header sniffing and in-memory conversion.
+
+Uploads that are already 16 kHz mono 16-bit PCM WAV are passed through as-is.
+Everything else is piped through ffmpeg over stdin/stdout into a spooled
+buffer, so neither the original nor the converted audio has to be written to
+disk unless it outgrows the spool size.
+"""
+
+import shutil
+import struct
+import tempfile
+import threading
+import subprocess
+
+TARGET_SAMPLE_RATE = 16000
+TARGET_CHANNELS = 1
+TARGET_SAMPLE_WIDTH = 2  # bytes, i.e. 16-bit samples
+WAVE_FORMAT_PCM = 1
+# Enough of the file to reach the "fmt " chunk, even behind LIST/JUNK chunks
+HEADER_SNIFF_BYTES = 4096
+WAV_HEADER_SIZE = 44
+DEFAULT_SPOOL_MAX_BYTES = 8 * 1024 * 1024
+
+
+def read_wav_format(header):
+    """
+    Parses the format chunk of a RIFF/WAVE header.
+
+    Args:
+        header (bytes): The first bytes of the file.
+
+    Returns:
+        dict: The audio format, sample rate, channel count and sample width,
+        or None if the data is not a WAV file with a readable "fmt " chunk.
+    """
+    if len(header) < 12 or header[:4] != b"RIFF" or header[8:12] != b"WAVE":
+        return None
+
+    offset = 12
+    while offset + 8 <= len(header):
+        chunk_id = header[offset : offset + 4]
+        (chunk_size,) = struct.unpack("<I", header[offset + 4 : offset + 8])
+        if chunk_id == b"fmt ":
+            if chunk_size < 16 or offset + 24 > len(header):
+                return None
+            audio_format, channels, sample_rate = struct.unpack(
+                "<HHI", header[offset + 8 : offset + 16]
+            )
+            (bits_per_sample,) = struct.unpack("<H", header[offset + 22 : offset + 24])
+            return {
+                "audio_format": audio_format,
+                "channels": channels,
+                "sample_rate": sample_rate,
+                "sample_width": bits_per_sample // 8,
+            }
+        # Chunks are padded to an even number of bytes
+        offset += 8 + chunk_size + (chunk_size % 2)
+    return None
+
+
+def is_pcm_wav(header):
+    """
+    Checks whether audio is already in the format the ML client expects.
+
+    Args:
+        header (bytes): The first bytes of the file.
+
+    Returns:
+        bool: True if the data is 16 kHz mono 16-bit PCM WAV.
+    """
+    audio_format = read_wav_format(header)
+    return audio_format == {
+        "audio_format": WAVE_FORMAT_PCM,
+        "channels": TARGET_CHANNELS,
+        "sample_rate": TARGET_SAMPLE_RATE,
+        "sample_width": TARGET_SAMPLE_WIDTH,
+    }
+
+
+def wav_header(data_size):
+    """
+    Builds the canonical 44-byte header of a 16 kHz mono 16-bit PCM WAV file.
+
+    Args:
+        data_size (int): The number of bytes of sample data following the header.
+
+    Returns:
+        bytes: The WAV header.
+    """
+    block_align = TARGET_CHANNELS * TARGET_SAMPLE_WIDTH
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF",
+        WAV_HEADER_SIZE - 8 + data_size,
+        b"WAVE",
+        b"fmt ",
+        16,
+        WAVE_FORMAT_PCM,
+        TARGET_CHANNELS,
+        TARGET_SAMPLE_RATE,
+        TARGET_SAMPLE_RATE * block_align,
+        block_align,
+        TARGET_SAMPLE_WIDTH * 8,
+        b"data",
+        data_size,
+    )
+
+
+def ffmpeg_command():
+    """
+    Returns the ffmpeg command that converts stdin to raw samples on stdout.
+
+    Returns:
+        list: The command line.
+    """
+    return [
+        "ffmpeg",
+        "-hide_banner",
+        "-loglevel",
+        "error",
+        "-i",
+        "pipe:0",
+        "-f",
+        "s16le",
+        "-acodec",
+        "pcm_s16le",
+        "-ar",
+        str(TARGET_SAMPLE_RATE),
+        "-ac",
+        str(TARGET_CHANNELS),
+        "pipe:1",
+    ]
+
+
+def _feed_stdin(source, stdin):
+    try:
+        shutil.copyfileobj(source, stdin)
+        stdin.close()
+    except BrokenPipeError:
+        pass  # ffmpeg exited early; its stderr explains why
+    finally:
+        # Closing flushes the buffer, which fails too once ffmpeg is gone;
+        # the pipe is closed nonetheless
+        if not stdin.closed:
+            try:
+                stdin.close()
+            except BrokenPipeError:
+                pass
+
+
+def convert_audio_stream(source, spool_max_bytes=DEFAULT_SPOOL_MAX_BYTES):
+    """
+    Converts audio to 16 kHz mono PCM WAV without touching the disk.
+
+    The upload is fed to ffmpeg over stdin and raw samples are copied from
+    stdout into a spooled buffer; the WAV header is filled in afterwards
+    because ffmpeg cannot seek back to write the sizes when writing to a pipe.
+    Input that is already in the target format skips ffmpeg entirely.
+
+    Args:
+        source (file): A readable, seekable binary file object with the upload.
+        spool_max_bytes (int): Size above which the output spills to disk.
+
+    Returns:
+        file: A file object positioned at the start of the WAV data. This is
+        `source` itself when no conversion was needed.
+
+    Raises:
+        RuntimeError: If ffmpeg is missing or fails to convert the audio.
+    """
+    header = source.read(HEADER_SNIFF_BYTES)
+    source.seek(0)
+    if is_pcm_wav(header):
+        return source
+
+    try:
+        process = subprocess.Popen(  # pylint: disable=consider-using-with
+            ffmpeg_command(),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+    except FileNotFoundError as e:
+        raise RuntimeError("ffmpeg conversion failed: ffmpeg not found") from e
+
+    # Feed stdin and drain stderr in threads so no pipe can fill up and block
+    stderr_chunks = []
+    feeder = threading.Thread(target=_feed_stdin, args=(source, process.stdin))
+    drainer = threading.Thread(
+        target=lambda: stderr_chunks.append(process.stderr.read())
+    )
+    feeder.start()
+    drainer.start()
+
+    output = tempfile.SpooledTemporaryFile(  # pylint: disable=consider-using-with
+        max_size=spool_max_bytes
+    )
+    output.write(bytes(WAV_HEADER_SIZE))
+    with process:
+        shutil.copyfileobj(process.stdout, output)
+        feeder.join()
+        drainer.join()
+        returncode = process.wait()
+
+    if returncode != 0:
+        output.close()
+        raise RuntimeError(
+            f"ffmpeg conversion failed: {b''.join(stderr_chunks).decode()}"
+        )
+
+    data_size = output.tell() - WAV_HEADER_SIZE
+    output.seek(0)
+    output.write(wav_header(data_size))
+    output.seek(0)
+    return output
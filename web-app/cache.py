@@ -0,0 +1,126 @@
+"""
+In-process caches for the web app.
+
+`LRUCache` holds rendered pages, keyed by user. The homepage only shows the
+username, so a cached page stays valid until it ages out of the cache.
+`TTLCache` additionally expires entries after a fixed lifetime, for data
+that can change while it is cached, such as user records.
+"""
+
+import time
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    Thread-safe, size-bounded least-recently-used cache.
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0}
+
+    def get(self, key):
+        """
+        Looks up a value and marks it as recently used.
+
+        Args:
+            key (hashable): The cache key.
+
+        Returns:
+            object: The cached value, or None on a miss.
+        """
+        with self._lock:
+            if key not in self._entries:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return self._entries[key]
+
+    def set(self, key, value):
+        """
+        Stores a value, evicting the least recently used ones beyond maxsize.
+
+        Args:
+            key (hashable): The cache key.
+            value (object): The value to cache.
+        """
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def pop(self, key):
+        """
+        Removes one entry, if present.
+
+        Args:
+            key (hashable): The cache key.
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def invalidate(self, predicate=None):
+        """
+        Removes entries from the cache.
+
+        Args:
+            predicate (callable): Takes a key and returns True for the entries
+                to remove. Removes everything if omitted.
+        """
+        with self._lock:
+            if predicate is None:
+                self._entries.clear()
+                return
+            for key in [key for key in self._entries if predicate(key)]:
+                del self._entries[key]
+
+    def stats(self):
+        """
+        Reports cache usage of this process.
+
+        Returns:
+            dict: Hits, misses, hit rate, current size and maximum size.
+        """
+        with self._lock:
+            stats = dict(self._stats, size=len(self._entries), maxsize=self.maxsize)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+
+class TTLCache(LRUCache):
+    """
+    LRU cache whose entries also expire a fixed time after they were stored.
+    """
+
+    def __init__(self, maxsize=1024, ttl_seconds=60):
+        super().__init__(maxsize)
+        self.ttl_seconds = ttl_seconds
+
+    def get(self, key):
+        entry = super().get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            with self._lock:
+                # Count the expired hit as a miss
+                self._stats["hits"] -= 1
+                self._stats["misses"] += 1
+                if self._entries.get(key) is entry:
+                    del self._entries[key]
+            return None
+        return value
+
+    def set(self, key, value):
+        if self.ttl_seconds <= 0:
+            return
+        super().set(key, (time.monotonic() + self.ttl_seconds, value))
@@ -0,0 +1,58 @@
+"""
+Gunicorn configuration for the web app.
+
+GUNICORN_WORKER_CLASS=gevent selects cooperative workers, which keep serving
+other requests while an upload waits on ffmpeg or the machine learning
+client. Each such worker handles up to GUNICORN_WORKER_CONNECTIONS requests
+at once.
+
+With UPLOAD_MODE=async every worker starts its upload job threads as soon
+as it boots, so jobs left in the queue are picked up without waiting for a
+new upload.
+
+Workers report metrics through files in PROMETHEUS_MULTIPROC_DIR, so that
+`/metrics` covers all of them whichever worker serves the scrape.
+"""
+
+import os
+import tempfile
+
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "sync")
+if worker_class == "gevent":
+    # Patch before pymongo and the app are imported, so every lock and
+    # socket they create is cooperative
+    from gevent import monkey
+
+    monkey.patch_all()
+
+# Set before any worker imports prometheus_client
+os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "web-metrics")
+)
+
+# pylint: disable=wrong-import-position
+from indexes import run_startup_bootstrap
+from metrics import mark_worker_dead, reset_multiprocess_dir
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5000")
+workers = int(os.getenv("GUNICORN_WORKERS", "3"))
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", "100"))
+
+
+def on_starting(_server):
+    """Ensures the MongoDB indexes once, in the master, before workers fork."""
+    reset_multiprocess_dir()
+    run_startup_bootstrap()
+
+
+def post_worker_init(_worker):
+    """Starts the upload job workers of a freshly booted worker."""
+    if os.getenv("UPLOAD_MODE", "sync") == "async":
+        from app import job_pool  # pylint: disable=import-outside-toplevel
+
+        job_pool.start()
+
+
+def child_exit(_server, worker):
+    """Stops counting the in-flight requests of a worker that exited."""
+    mark_worker_dead(worker.pid)
@@ -0,0 +1,360 @@
+"""
+Background job queue for audio uploads.
+
+Uploads are persisted and enqueued by the web request, then picked up by a
+pool of worker threads that run conversion and the ML client call. Job state
+lives in a pluggable store: MongoDB for multi-process deployments, or an
+in-process store for tests and single-process runs.
+
+A claimed job holds a lease of JOB_LEASE_SECONDS, renewed whenever it
+reports progress. Jobs whose worker died are claimed again once their lease
+has expired, up to MAX_JOB_ATTEMPTS times, so a job may run more than once.
+Finished jobs carry a `finished_at` time, which the TTL index on the jobs
+collection expires after JOB_RETENTION_SECONDS.
+
+The uploads themselves stay in the web app's local UPLOAD_FOLDER, so the
+queue is single-host: only worker processes that share that directory may
+consume the same jobs collection.
+"""
+
+import os
+import copy
+import time
+import uuid
+import queue
+import logging
+import threading
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument
+from pymongo.errors import PyMongoError
+
+logger = logging.getLogger(__name__)
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "300"))
+MAX_JOB_ATTEMPTS = int(os.getenv("MAX_JOB_ATTEMPTS", "3"))
+
+
+def new_job(user_id, payload):
+    """
+    Builds a new job document in the queued state.
+
+    Args:
+        user_id (str): The ID of the user who owns the job.
+        payload (dict): Handler-specific data, such as the stored file path.
+
+    Returns:
+        dict: The job document.
+    """
+    now = datetime.utcnow()
+    return {
+        "_id": uuid.uuid4().hex,
+        "user_id": user_id,
+        "status": STATUS_QUEUED,
+        "stage": STATUS_QUEUED,
+        "progress": 0,
+        "payload": payload,
+        "result": None,
+        "error": None,
+        "attempts": 0,
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+class InMemoryJobStore:
+    """
+    Job store that keeps jobs in the memory of the current process.
+    """
+
+    def __init__(self):
+        self._jobs = {}
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+
+    def enqueue(self, job):
+        """
+        Adds a job to the store and the pending queue.
+
+        Args:
+            job (dict): The job document created by `new_job`.
+
+        Returns:
+            str: The job ID.
+        """
+        with self._lock:
+            self._jobs[job["_id"]] = copy.deepcopy(job)
+        self._queue.put(job["_id"])
+        return job["_id"]
+
+    def claim(self, timeout=1.0):
+        """
+        Takes the next queued job and marks it as running.
+
+        Args:
+            timeout (float): Seconds to wait for a job before giving up.
+
+        Returns:
+            dict: The claimed job, or None if no job became available.
+        """
+        try:
+            job_id = self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        with self._lock:
+            attempts = self._jobs[job_id].get("attempts", 0) + 1
+        return self.update(job_id, status=STATUS_RUNNING, attempts=attempts)
+
+    def update(self, job_id, **fields):
+        """
+        Updates fields of a job.
+
+        Args:
+            job_id (str): The job ID.
+            **fields: The fields to set.
+
+        Returns:
+            dict: A copy of the updated job, or None if it does not exist.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            job.update(fields, updated_at=datetime.utcnow())
+            return copy.deepcopy(job)
+
+    def get(self, job_id):
+        """
+        Looks up a job by its ID.
+
+        Args:
+            job_id (str): The job ID.
+
+        Returns:
+            dict: A copy of the job, or None if it does not exist.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return copy.deepcopy(job) if job else None
+
+
+class MongoJobStore:
+    """
+    Job store backed by a MongoDB collection, shared by all worker processes.
+    """
+
+    def __init__(self, collection, poll_interval=0.5, lease_seconds=JOB_LEASE_SECONDS):
+        self.collection = collection
+        self.poll_interval = poll_interval
+        self.lease = timedelta(seconds=lease_seconds)
+        self._wakeup = threading.Event()
+
+    def enqueue(self, job):
+        """
+        Inserts a job document and wakes up local workers.
+
+        Args:
+            job (dict): The job document created by `new_job`.
+
+        Returns:
+            str: The job ID.
+        """
+        self.collection.insert_one(job)
+        self._wakeup.set()
+        return job["_id"]
+
+    def claim(self, timeout=1.0):
+        """
+        Atomically claims the oldest queued job, or a running job whose
+        lease has expired because its worker died.
+
+        Args:
+            timeout (float): Seconds to keep polling before giving up.
+
+        Returns:
+            dict: The claimed job, or None if no job became available.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            now = datetime.utcnow()
+            job = self.collection.find_one_and_update(
+                {
+                    "$or": [
+                        {"status": STATUS_QUEUED},
+                        {"status": STATUS_RUNNING, "lease_expires_at": {"$lt": now}},
+                    ]
+                },
+                {
+                    "$set": {
+                        "status": STATUS_RUNNING,
+                        "updated_at": now,
+                        "lease_expires_at": now + self.lease,
+                    },
+                    "$inc": {"attempts": 1},
+                },
+                sort=[("created_at", 1)],
+                return_document=ReturnDocument.AFTER,
+            )
+            remaining = deadline - time.monotonic()
+            if job is not None or remaining <= 0:
+                return job
+            self._wakeup.wait(min(self.poll_interval, remaining))
+            self._wakeup.clear()
+
+    def update(self, job_id, **fields):
+        """
+        Updates fields of a job.
+
+        Args:
+            job_id (str): The job ID.
+            **fields: The fields to set.
+
+        Returns:
+            dict: The updated job, or None if it does not exist.
+        """
+        fields["updated_at"] = datetime.utcnow()
+        if fields.get("status", STATUS_RUNNING) == STATUS_RUNNING:
+            # Progress shows the worker is alive, so its lease is renewed
+            fields["lease_expires_at"] = fields["updated_at"] + self.lease
+        return self.collection.find_one_and_update(
+            {"_id": job_id},
+            {"$set": fields},
+            return_document=ReturnDocument.AFTER,
+        )
+
+    def get(self, job_id):
+        """
+        Looks up a job by its ID.
+
+        Args:
+            job_id (str): The job ID.
+
+        Returns:
+            dict: The job, or None if it does not exist.
+        """
+        return self.collection.find_one({"_id": job_id})
+
+
+def create_job_store(backend, collection=None):
+    """
+    Creates a job store for the configured backend.
+
+    Args:
+        backend (str): Either "mongo" or "memory".
+        collection (pymongo.collection.Collection): The jobs collection,
+            required for the "mongo" backend.
+
+    Returns:
+        InMemoryJobStore | MongoJobStore: The job store.
+
+    Raises:
+        ValueError: If the backend is unknown.
+    """
+    if backend == "memory":
+        return InMemoryJobStore()
+    if backend == "mongo":
+        return MongoJobStore(collection)
+    raise ValueError(f"Unknown job backend: {backend}")
+
+
+class JobWorkerPool:  # pylint: disable=too-many-instance-attributes
+    """
+    Pool of daemon threads that claim jobs from a store and run a handler.
+
+    The handler is called as `handler(job, report)`, where `report(stage,
+    progress)` records progress on the job. Its return value is stored as the
+    job result; any exception marks the job as failed, as does a job claimed
+    more than MAX_JOB_ATTEMPTS times. An abandoned job is not run again; it is
+    passed to `on_abandon(job)` instead, if given, to release what it holds.
+    """
+
+    def __init__(self, store, handler, workers=2, poll_timeout=1.0, on_abandon=None):
+        self.store = store
+        self.handler = handler
+        self.on_abandon = on_abandon
+        self.workers = workers
+        self.poll_timeout = poll_timeout
+        self._threads = []
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Starts the worker threads if they are not already running."""
+        with self._lock:
+            self._threads = [t for t in self._threads if t.is_alive()]
+            self._stop.clear()
+            for index in range(len(self._threads), self.workers):
+                thread = threading.Thread(
+                    target=self._run, name=f"job-worker-{index}", daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self, timeout=None):
+        """
+        Signals the workers to stop and waits for them to exit.
+
+        Args:
+            timeout (float): Seconds to wait for each thread.
+        """
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def run_once(self, timeout=0):
+        """
+        Claims and runs a single job in the calling thread.
+
+        Args:
+            timeout (float): Seconds to wait for a job.
+
+        Returns:
+            dict: The finished job, or None if the queue was empty.
+        """
+        job = self.store.claim(timeout=timeout)
+        if job is None:
+            return None
+        return self._execute(job)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once(timeout=self.poll_timeout)
+            except PyMongoError as error:
+                logger.error("Job queue error: %s", error)
+                self._stop.wait(self.poll_timeout)
+
+    def _execute(self, job):
+        job_id = job["_id"]
+
+        def report(stage, progress):
+            self.store.update(job_id, stage=stage, progress=progress)
+
+        try:
+            if job.get("attempts", 1) > MAX_JOB_ATTEMPTS:
+                if self.on_abandon is not None:
+                    self.on_abandon(job)
+                raise RuntimeError(f"Abandoned after {MAX_JOB_ATTEMPTS} attempts")
+            result = self.handler(job, report)
+        except Exception as error:  # pylint: disable=broad-exception-caught
+            logger.error("Job %s failed: %s", job_id, error)
+            return self.store.update(
+                job_id,
+                status=STATUS_FAILED,
+                stage=STATUS_FAILED,
+                error=str(error),
+                finished_at=datetime.utcnow(),
+            )
+        return self.store.update(
+            job_id,
+            status=STATUS_DONE,
+            stage=STATUS_DONE,
+            progress=100,
+            result=result,
+            finished_at=datetime.utcnow(),
+        )
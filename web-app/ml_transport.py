@@ -0,0 +1,374 @@
+"""
+Shared HTTP transport to the machine learning client.
+
+Uploads go through one pooled keep-alive `requests.Session` per process
+instead of a new connection per request. Failures to connect and 503
+responses are retried a bounded number of times with jittered backoff; a
+connection dropped after the upload was sent is not, as the clip may have
+been stored already. A circuit breaker fails fast while the machine learning
+client is unreachable or overloaded, so uploads do not pile up behind it.
+Errors caused by a bad upload do not count towards it. Every call is timed
+for `stats`.
+"""
+
+import os
+import json
+import time
+import random
+import logging
+import threading
+from collections import deque
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ConnectTimeoutError, MaxRetryError, NewConnectionError
+from tracing import REQUEST_ID_HEADER
+
+logger = logging.getLogger(__name__)
+
+# Only responses that guarantee the clip was not processed are retried
+RETRY_STATUSES = (503,)
+# Responses that mean the ML client is down or overloaded, not a bad upload
+BREAKER_STATUSES = (502, 503, 504)
+LATENCY_WINDOW = 1000
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """Raised instead of calling the machine learning client while the circuit is open."""
+
+
+def never_sent(error):
+    """
+    Tells whether a failed request certainly did not reach the server.
+
+    Args:
+        error (requests.exceptions.RequestException): The failure.
+
+    Returns:
+        bool: True if no connection could be established; False if the
+            request may have been received, e.g. the connection was aborted.
+    """
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    if not isinstance(error, requests.exceptions.ConnectionError):
+        return False
+    cause = error.args[0] if error.args else None
+    if isinstance(cause, MaxRetryError):
+        cause = cause.reason
+    return isinstance(cause, (NewConnectionError, ConnectTimeoutError))
+
+
+def signals_outage(error):
+    """
+    Tells whether a failed request counts towards the circuit breaker.
+
+    Args:
+        error (Exception): The failure.
+
+    Returns:
+        bool: True for connection failures and timeouts.
+    """
+    return isinstance(
+        error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)
+    )
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    After `failure_threshold` failures in a row the circuit opens and calls
+    fail immediately. Once `reset_timeout` seconds have passed, one trial call
+    is let through: success closes the circuit, failure opens it again.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = {"failures": 0, "opened_at": None, "trial_running": False}
+
+    @property
+    def state(self):
+        """
+        The current state of the circuit.
+
+        Returns:
+            str: "closed", "open" or "half_open".
+        """
+        with self._lock:
+            if self._state["opened_at"] is None:
+                return "closed"
+            if time.monotonic() - self._state["opened_at"] < self.reset_timeout:
+                return "open"
+            return "half_open"
+
+    def before_call(self):
+        """
+        Checks that a call may go ahead.
+
+        Returns:
+            bool: Whether the call is the trial call of a half-open circuit;
+                if so, its outcome has to be recorded or `end_trial` called.
+
+        Raises:
+            CircuitOpenError: If the circuit is open, or a trial call is
+                already running.
+        """
+        with self._lock:
+            opened_at = self._state["opened_at"]
+            if opened_at is None:
+                return False
+            retry_in = opened_at + self.reset_timeout - time.monotonic()
+            if retry_in > 0 or self._state["trial_running"]:
+                raise CircuitOpenError(
+                    f"ML client circuit open, retry in {max(retry_in, 0):.0f}s"
+                )
+            self._state["trial_running"] = True
+            return True
+
+    def end_trial(self):
+        """Lets another trial call through if this one recorded no outcome."""
+        with self._lock:
+            self._state["trial_running"] = False
+
+    def record_success(self):
+        """Closes the circuit and resets the failure count."""
+        with self._lock:
+            self._state = {"failures": 0, "opened_at": None, "trial_running": False}
+
+    def record_failure(self):
+        """Counts a failure, opening the circuit at the threshold."""
+        with self._lock:
+            self._state["failures"] += 1
+            self._state["trial_running"] = False
+            trial_failed = self._state["opened_at"] is not None
+            if trial_failed or self._state["failures"] >= self.failure_threshold:
+                if not trial_failed:
+                    logger.warning(
+                        "ML client circuit opened after %d failures",
+                        self._state["failures"],
+                    )
+                self._state["opened_at"] = time.monotonic()
+
+
+class MLClientTransport:
+    """
+    Pooled, retrying and circuit-broken client for the audio endpoint.
+    """
+
+    def __init__(self, url, breaker=None, **options):
+        """
+        Args:
+            url (str): The /process-audio URL of the machine learning client.
+            breaker (CircuitBreaker): The circuit breaker to use.
+            **options: pool_size, retries, backoff, connect_timeout and
+                read_timeout, overriding `options_from_env()`.
+        """
+        self.url = url
+        self.breaker = breaker or CircuitBreaker()
+        self.options = dict(options_from_env(), **options)
+        self._session = {"session": None, "pid": None}
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._counters = {"calls": 0, "failures": 0, "retries": 0, "rejected": 0}
+
+    @property
+    def release_url(self):
+        """The /release-audio URL, next to /process-audio."""
+        return self.url.rsplit("/", 1)[0] + "/release-audio"
+
+    def session(self):
+        """
+        Returns this process's keep-alive session, creating it on first use.
+
+        Returns:
+            requests.Session: A session with a bounded connection pool.
+        """
+        with self._lock:
+            if self._session["pid"] != os.getpid():
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=1,
+                    pool_maxsize=self.options["pool_size"],
+                    pool_block=True,
+                )
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._session = {"session": session, "pid": os.getpid()}
+            return self._session["session"]
+
+    def _count(self, name, latency=None):
+        with self._lock:
+            self._counters[name] += 1
+            if latency is not None:
+                self._latencies.append(latency)
+
+    def _backoff(self, attempt):
+        # Full jitter keeps retrying web workers from hitting the ML client in step
+        time.sleep(random.uniform(0, self.options["backoff"] * 2**attempt))
+        self._count("retries")
+
+    def post_audio(
+        self, wav_file, file_name, user_id, request_id=None, *, timings=None
+    ):
+        """
+        Sends a WAV file to the machine learning client.
+
+        Args:
+            wav_file (file): A readable, seekable file object with the WAV data.
+            file_name (str): The file name reported to the machine learning client.
+            user_id (str): The ID of the user who owns the recording.
+            request_id (str): Correlation ID sent along as X-Request-ID.
+            timings (dict): Milliseconds per stage spent in the web app, sent
+                along to be stored with the entry.
+
+        Returns:
+            requests.Response: The response of the machine learning client.
+
+        Raises:
+            CircuitOpenError: If the circuit is open.
+            requests.exceptions.RequestException: If the request fails.
+        """
+        try:
+            trial = self.breaker.before_call()
+        except CircuitOpenError:
+            self._count("rejected")
+            raise
+        try:
+            return self._post_with_retries(
+                wav_file,
+                file_name=file_name,
+                form=(
+                    {"user_id": user_id, "timings": json.dumps(timings)}
+                    if timings
+                    else {"user_id": user_id}
+                ),
+                headers={REQUEST_ID_HEADER: request_id} if request_id else {},
+            )
+        finally:
+            if trial:
+                # E.g. an unexpected exception, which neither closes nor opens
+                self.breaker.end_trial()
+
+    def _post_with_retries(self, wav_file, file_name, form, headers):
+        start_position = wav_file.tell()
+        attempt = 0
+        while True:
+            wav_file.seek(start_position)
+            started = time.perf_counter()
+            try:
+                response = self.session().post(
+                    self.url,
+                    files={"audio": (file_name, wav_file)},
+                    data=form,
+                    headers=headers,
+                    timeout=(
+                        self.options["connect_timeout"],
+                        self.options["read_timeout"],
+                    ),
+                )
+            except requests.exceptions.RequestException as error:
+                self._count("calls", time.perf_counter() - started)
+                # Only a request that never reached the ML client is safe to
+                # send again; anything else may have been stored already
+                if attempt < self.options["retries"] and never_sent(error):
+                    self._backoff(attempt)
+                    attempt += 1
+                    continue
+                self._count("failures")
+                if signals_outage(error):
+                    self.breaker.record_failure()
+                raise
+
+            self._count("calls", time.perf_counter() - started)
+            if (
+                response.status_code in RETRY_STATUSES
+                and attempt < self.options["retries"]
+            ):
+                self._backoff(attempt)
+                attempt += 1
+                continue
+            if response.status_code >= 500:
+                self._count("failures")
+            if response.status_code in BREAKER_STATUSES:
+                self.breaker.record_failure()
+            else:
+                # The ML client answered, even if it rejected the upload
+                self.breaker.record_success()
+            return response
+
+    def release_audio(self, key, request_id=None):
+        """
+        Asks the machine learning client to delete a stored recording that no
+        entry references any more. Not retried: recordings missed here are
+        removed by the retention purge.
+
+        Args:
+            key (str): The recording key from the entry's `audio` link.
+            request_id (str): Correlation ID sent along as X-Request-ID.
+
+        Returns:
+            requests.Response: The response of the machine learning client.
+
+        Raises:
+            requests.exceptions.RequestException: If the request fails.
+        """
+        return self.session().post(
+            self.release_url,
+            json={"key": key},
+            headers={REQUEST_ID_HEADER: request_id} if request_id else {},
+            timeout=(self.options["connect_timeout"], self.options["read_timeout"]),
+        )
+
+    def stats(self):
+        """
+        Reports the calls of this process.
+
+        Returns:
+            dict: Call, failure, retry and rejection counts, the circuit state,
+                and latency percentiles in milliseconds over recent calls.
+        """
+        with self._lock:
+            stats = dict(self._counters)
+            latencies = sorted(self._latencies)
+        stats["circuit"] = self.breaker.state
+        for name, fraction in (("p50_ms", 0.5), ("p95_ms", 0.95), ("max_ms", 1.0)):
+            index = min(int(fraction * len(latencies)), len(latencies) - 1)
+            stats[name] = latencies[index] * 1000 if latencies else 0.0
+        stats["mean_ms"] = sum(latencies) / len(latencies) * 1000 if latencies else 0.0
+        return stats
+
+
+def options_from_env():
+    """
+    Reads the transport settings from the environment.
+
+    Returns:
+        dict: pool_size, retries, backoff, connect_timeout and read_timeout.
+    """
+    return {
+        "pool_size": int(os.getenv("ML_CLIENT_POOL_SIZE", "10")),
+        "retries": int(os.getenv("ML_CLIENT_RETRIES", "2")),
+        "backoff": float(os.getenv("ML_CLIENT_BACKOFF_SECONDS", "0.2")),
+        "connect_timeout": float(os.getenv("ML_CLIENT_CONNECT_TIMEOUT", "3")),
+        "read_timeout": float(os.getenv("ML_CLIENT_READ_TIMEOUT", "10")),
+    }
+
+
+def create_transport(url):
+    """
+    Creates the transport with breaker settings from the environment.
+
+    Args:
+        url (str): The /process-audio URL of the machine learning client.
+
+    Returns:
+        MLClientTransport: The transport.
+    """
+    return MLClientTransport(
+        url,
+        breaker=CircuitBreaker(
+            failure_threshold=int(os.getenv("ML_CLIENT_BREAKER_THRESHOLD", "5")),
+            reset_timeout=float(os.getenv("ML_CLIENT_BREAKER_RESET_SECONDS", "30")),
+        ),
+    )
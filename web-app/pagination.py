@@ -0,0 +1,131 @@
+"""
+Keyset pagination over a user's journal entries.
+
+Pages are ordered newest first on `(timestamp, _id)`, which the
+`{user_id, timestamp, _id}` index serves directly, so fetching any page costs
+the same no matter how deep into the journal it is. The position of the last
+entry of a page is handed to the client as an opaque `next_cursor` token.
+"""
+
+import json
+import base64
+import binascii
+from datetime import datetime
+from bson.errors import InvalidId
+from bson.objectid import ObjectId
+
+ENTRY_SORT = [("timestamp", -1), ("_id", -1)]
+
+# Only the fields the entries table renders
+ENTRY_PROJECTION = {"transcript": 1, "sentiment.mood": 1, "timestamp": 1}
+
+
+def encode_cursor(entry):
+    """
+    Builds the cursor pointing just past an entry.
+
+    Args:
+        entry (dict): The last entry of a page.
+
+    Returns:
+        str: A URL-safe cursor token.
+    """
+    position = {"ts": entry["timestamp"].isoformat(), "id": str(entry["_id"])}
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+
+def decode_cursor(token):
+    """
+    Reads the position stored in a cursor token.
+
+    Args:
+        token (str): A token from `encode_cursor`.
+
+    Returns:
+        tuple: The timestamp and ObjectId of the entry before the next page.
+
+    Raises:
+        ValueError: If the token is malformed.
+    """
+    try:
+        position = json.loads(base64.urlsafe_b64decode(token.encode()))
+        return datetime.fromisoformat(position["ts"]), ObjectId(position["id"])
+    except (binascii.Error, ValueError, TypeError, KeyError, InvalidId) as error:
+        raise ValueError("Invalid cursor") from error
+
+
+def page_filter(user_id, cursor=None):
+    """
+    Builds the query for the page of entries after a cursor.
+
+    Args:
+        user_id (str): The user's ID.
+        cursor (str): The `next_cursor` of the previous page, if any.
+
+    Returns:
+        dict: The MongoDB filter.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    if not cursor:
+        return {"user_id": user_id}
+    timestamp, entry_id = decode_cursor(cursor)
+    return {
+        "user_id": user_id,
+        "$or": [
+            {"timestamp": {"$lt": timestamp}},
+            {"timestamp": timestamp, "_id": {"$lt": entry_id}},
+        ],
+    }
+
+
+def fetch_page(entries, user_id, cursor=None, limit=100):
+    """
+    Opens a MongoDB cursor over one page of entries.
+
+    One entry more than the page size is requested; if it comes back, there
+    is a next page.
+
+    Args:
+        entries (pymongo.collection.Collection): The entries collection.
+        user_id (str): The user's ID.
+        cursor (str): The `next_cursor` of the previous page, if any.
+        limit (int): The page size.
+
+    Returns:
+        pymongo.cursor.Cursor: Up to `limit + 1` projected entries.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    return (
+        entries.find(page_filter(user_id, cursor), ENTRY_PROJECTION)
+        .sort(ENTRY_SORT)
+        .limit(limit + 1)
+    )
+
+
+def paginate(documents, limit):
+    """
+    Splits fetched entries into the page and the next cursor.
+
+    Yields the entries of the page one at a time, then the cursor, so large
+    pages can be serialized as they are read.
+
+    Args:
+        documents (iterable): The result of `fetch_page`.
+        limit (int): The page size.
+
+    Yields:
+        tuple: ("entry", document) for each entry, then ("next_cursor", token),
+            where the token is None on the last page.
+    """
+    last = None
+    for count, document in enumerate(documents):
+        if count == limit:
+            yield "next_cursor", encode_cursor(last)
+            return
+        last = document
+        yield "entry", document
+    yield "next_cursor", None
@@ -0,0 +1,327 @@
+"""
+Ranked full-text search over a user's journal transcripts.
+
+SEARCH_BACKEND selects where the search runs:
+
+- "mongo", the default, queries the `{user_id, transcript: "text"}` index
+  and ranks by MongoDB's text score. The user ID prefix keeps every search
+  within one user's postings, however large the collection grows.
+- "memory" builds a compact inverted index of a user's transcripts in the
+  worker and ranks with BM25, for local runs without a text index. Indexes
+  are cached under the user's data version, so they are rebuilt after the
+  next search once an entry is added or deleted.
+
+Both backends match any of the query words, after dropping stop words and
+common English suffixes, and page through the results by offset.
+"""
+
+import re
+import math
+import heapq
+from array import array
+from collections import Counter
+from cache import LRUCache
+from user_stats import get_data_version
+
+# Only the fields search results render
+SEARCH_PROJECTION = {"transcript": 1, "sentiment.mood": 1, "timestamp": 1}
+MAX_QUERY_TERMS = 10
+# Ranked results are paged by offset; deeper pages are not served
+MAX_SEARCH_OFFSET = 1000
+SNIPPET_CHARS = 160
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+WORD = re.compile(r"\w+")
+STOP_WORDS = frozenset(
+    "a an and are as at be but by for from had has have he her his i if in is "
+    "it its me my of on or our she so that the their them then there they "
+    "this to too was we were what when which who will with you your".split()
+)
+SUFFIXES = ("ing", "ed", "ly", "es", "s")
+
+
+def stem(word):
+    """
+    Reduces a lowercase word to a crude stem, so that e.g. "walked" and
+    "walking" match.
+
+    Args:
+        word (str): The lowercase word.
+
+    Returns:
+        str: The word without a common suffix.
+    """
+    for suffix in SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[: -len(suffix)]
+    return word
+
+
+def words(text):
+    """
+    Splits text into lowercase words other than stop words.
+
+    Args:
+        text (str): The text.
+
+    Yields:
+        tuple: The word, and its start and end offsets.
+    """
+    for match in WORD.finditer(text):
+        word = match.group().lower()
+        if word not in STOP_WORDS:
+            yield word, match.start(), match.end()
+
+
+def query_terms(query):
+    """
+    Extracts the searchable words of a query.
+
+    Args:
+        query (str): The query as typed by the user.
+
+    Returns:
+        list: Up to MAX_QUERY_TERMS distinct lowercase words, in query order.
+
+    Raises:
+        ValueError: If the query has no searchable words.
+    """
+    terms = list(dict.fromkeys(word for word, _, _ in words(query or "")))
+    if not terms:
+        raise ValueError("The query has no searchable words")
+    return terms[:MAX_QUERY_TERMS]
+
+
+def make_snippet(transcript, terms, width=SNIPPET_CHARS):
+    """
+    Cuts the part of a transcript around its first match.
+
+    Args:
+        transcript (str): The transcript.
+        terms (list): The query words.
+        width (int): The maximum snippet length, without ellipses.
+
+    Returns:
+        dict: The snippet text and the [start, end) offsets of the matched
+            words within it.
+    """
+    stems = {stem(term) for term in terms}
+    matches = [
+        (start, end) for word, start, end in words(transcript) if stem(word) in stems
+    ]
+    first = matches[0][0] if matches else 0
+    start = max(0, min(first - width // 4, len(transcript) - width))
+    if start > 0:
+        # Begin on a word boundary
+        boundary = transcript.rfind(" ", 0, start + 1)
+        start = boundary + 1 if boundary >= 0 else start
+    end = min(len(transcript), start + width)
+    prefix = "…" if start > 0 else ""
+    text = prefix + transcript[start:end] + ("…" if end < len(transcript) else "")
+    shift = len(prefix) - start
+    return {
+        "text": text,
+        "highlights": [
+            [match_start + shift, match_end + shift]
+            for match_start, match_end in matches
+            if match_start >= start and match_end <= end
+        ],
+    }
+
+
+class MongoTextSearch:  # pylint: disable=too-few-public-methods
+    """
+    Search backed by the MongoDB text index on entries.
+    """
+
+    def __init__(self, entries):
+        self.entries = entries
+
+    def search(self, user_id, terms, offset, limit):
+        """
+        Finds a user's entries matching any of the terms, best first.
+
+        Args:
+            user_id (str): The user's ID.
+            terms (list): The query words.
+            offset (int): The number of results to skip.
+            limit (int): The maximum number of results.
+
+        Returns:
+            list: Projected entries with their `score`.
+        """
+        score = {"$meta": "textScore"}
+        return list(
+            self.entries.find(
+                {"user_id": user_id, "$text": {"$search": " ".join(terms)}},
+                {**SEARCH_PROJECTION, "score": score},
+            )
+            .sort([("score", score), ("_id", -1)])
+            .skip(offset)
+            .limit(limit)
+        )
+
+
+class InvertedIndex:  # pylint: disable=too-few-public-methods
+    """
+    In-memory inverted index of transcripts, ranked with BM25.
+
+    Postings are kept as compact arrays of document numbers and term
+    frequencies, so a search only touches the postings of its terms.
+    """
+
+    def __init__(self, documents):
+        self.documents = []
+        self.postings = {}
+        self.lengths = array("I")
+        for number, document in enumerate(documents):
+            self.documents.append(document)
+            frequencies = Counter(
+                stem(word) for word, _, _ in words(document.get("transcript") or "")
+            )
+            self.lengths.append(sum(frequencies.values()))
+            for term, frequency in frequencies.items():
+                numbers, counts = self.postings.setdefault(
+                    term, (array("I"), array("I"))
+                )
+                numbers.append(number)
+                counts.append(frequency)
+        self.average_length = (
+            sum(self.lengths) / len(self.lengths) if self.lengths else 0
+        )
+
+    def search(self, terms, limit):
+        """
+        Ranks the documents matching any of the terms.
+
+        Args:
+            terms (list): The query words.
+            limit (int): The number of best results to return.
+
+        Returns:
+            list: (score, document) pairs, best first; ties go to the
+                document indexed last.
+        """
+        scores = {}
+        for term in {stem(term) for term in terms}:
+            numbers, counts = self.postings.get(term, ((), ()))
+            if not numbers:
+                continue
+            idf = math.log(
+                1 + (len(self.documents) - len(numbers) + 0.5) / (len(numbers) + 0.5)
+            )
+            for number, count in zip(numbers, counts):
+                norm = 1 - BM25_B + BM25_B * self.lengths[number] / self.average_length
+                scores[number] = scores.get(number, 0.0) + idf * count * (
+                    BM25_K1 + 1
+                ) / (count + BM25_K1 * norm)
+        best = heapq.nlargest(limit, scores.items(), key=lambda item: item[::-1])
+        return [(score, self.documents[number]) for number, score in best]
+
+
+class LocalSearch:
+    """
+    Search over per-user inverted indexes built in this process.
+    """
+
+    def __init__(self, database, cache_size=64):
+        self.database = database
+        self.indexes = LRUCache(cache_size)
+
+    def index_for(self, user_id):
+        """
+        Returns the index of a user's current entries, building it if needed.
+
+        Args:
+            user_id (str): The user's ID.
+
+        Returns:
+            InvertedIndex: The index.
+        """
+        key = (user_id, get_data_version(self.database, user_id))
+        index = self.indexes.get(key)
+        if index is None:
+            index = InvertedIndex(
+                self.database["entries"]
+                .find({"user_id": user_id}, SEARCH_PROJECTION)
+                .sort("_id", 1)
+            )
+            # Older versions of the user's index are never read again
+            self.indexes.invalidate(lambda cached: cached[0] == user_id)
+            self.indexes.set(key, index)
+        return index
+
+    def search(self, user_id, terms, offset, limit):
+        """
+        Finds a user's entries matching any of the terms, best first.
+
+        Args:
+            user_id (str): The user's ID.
+            terms (list): The query words.
+            offset (int): The number of results to skip.
+            limit (int): The maximum number of results.
+
+        Returns:
+            list: Projected entries with their `score`.
+        """
+        ranked = self.index_for(user_id).search(terms, offset + limit)
+        return [dict(document, score=score) for score, document in ranked[offset:]]
+
+
+def create_search_backend(backend, database, cache_size=64):
+    """
+    Creates the search backend for the configured name.
+
+    Args:
+        backend (str): Either "mongo" or "memory".
+        database (pymongo.database.Database): The journal database.
+        cache_size (int): Users whose index the "memory" backend keeps.
+
+    Returns:
+        MongoTextSearch | LocalSearch: The backend.
+
+    Raises:
+        ValueError: If the backend is unknown.
+    """
+    if backend == "mongo":
+        return MongoTextSearch(database["entries"])
+    if backend == "memory":
+        return LocalSearch(database, cache_size)
+    raise ValueError(f"Unknown search backend: {backend}")
+
+
+def search_entries(backend, user_id, query, offset=0, limit=20):
+    """
+    Runs a search and fetches one page of results with snippets.
+
+    One result more than the page size is requested; if it comes back, there
+    is a next page.
+
+    Args:
+        backend (MongoTextSearch | LocalSearch): The search backend.
+        user_id (str): The user's ID.
+        query (str): The query as typed by the user.
+        offset (int): The number of results to skip.
+        limit (int): The page size.
+
+    Returns:
+        tuple: The entries of the page, each with its `score` and `snippet`,
+            and the offset of the next page, or None on the last page.
+
+    Raises:
+        ValueError: If the query has no searchable words or the offset is
+            out of range.
+    """
+    terms = query_terms(query)
+    if not 0 <= offset <= MAX_SEARCH_OFFSET:
+        raise ValueError(f"offset must be between 0 and {MAX_SEARCH_OFFSET}")
+    documents = backend.search(user_id, terms, offset, limit + 1)
+    page = documents[:limit]
+    for document in page:
+        document["snippet"] = make_snippet(document.get("transcript") or "", terms)
+    next_offset = offset + limit if len(documents) > limit else None
+    if next_offset is not None and next_offset > MAX_SEARCH_OFFSET:
+        next_offset = None
+    return page, next_offset
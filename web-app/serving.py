@@ -0,0 +1,44 @@
+"""
+Support for serving the web app with cooperative gevent workers.
+
+Under the gevent worker class, sockets, subprocesses and threads are patched
+to yield to other greenlets. Waiting on ffmpeg or the machine learning client
+therefore lets the worker serve other requests. Disk I/O is not patched, so
+`run_blocking` hands it to the gevent hub's thread pool. With sync workers
+everything runs inline.
+"""
+
+try:
+    from gevent import get_hub, monkey
+except ImportError:  # gevent is only needed for the cooperative worker
+    get_hub = monkey = None
+
+
+def gevent_active():
+    """
+    Tells whether the process runs under gevent's monkey patches.
+
+    Returns:
+        bool: True inside a gevent worker.
+    """
+    return monkey is not None and monkey.is_module_patched("socket")
+
+
+def run_blocking(func, *args, **kwargs):
+    """
+    Calls a function that blocks on I/O gevent cannot patch, such as disk I/O.
+
+    Under gevent the call runs on the hub's thread pool and only the calling
+    greenlet waits for it; otherwise the function is simply called.
+
+    Args:
+        func (callable): The blocking function.
+        *args: Positional arguments for the function.
+        **kwargs: Keyword arguments for the function.
+
+    Returns:
+        object: The function's return value.
+    """
+    if not gevent_active():
+        return func(*args, **kwargs)
+    return get_hub().threadpool.apply(func, args, kwargs)
@@ -8,13 +8,26 @@ recent entries retrieval, and deletion of journal entries.
 
 import io
 import os
+import json
 import shutil
+from datetime import datetime, timedelta
 from unittest.mock import patch, MagicMock
 from pathlib import Path  # Import Path for file operations
 import pytest
+import requests
 from bson.objectid import ObjectId
+from pymongo.errors import DuplicateKeyError
 from werkzeug.security import generate_password_hash
-from app import app  # Adjust this import based on your project structure
+from app import (
+    app,
+    discard_upload_job,
+    load_user,
+    process_upload_job,
+)  # Adjust this import based on your project structure
+from jobs import MAX_JOB_ATTEMPTS, InMemoryJobStore, JobWorkerPool, new_job
+from pagination import encode_cursor
+from cache import LRUCache, TTLCache
+from ml_transport import CircuitOpenError
 
 
 @pytest.fixture(name="app_fixture")
@@ -33,6 +46,13 @@ def fixture_client(app_fixture):
             yield test_client
 
 
+@pytest.fixture(name="login_disabled")
+def fixture_login_disabled(app_fixture):
+    """Fixture to let requests through routes that require a login."""
+    with patch.dict(app_fixture.config, {"LOGIN_DISABLED": True}):
+        yield
+
+
 @pytest.fixture(name="mock_user_fixture")
 def fixture_mock_user():
     """Fixture to provide a mocked user."""
@@ -64,6 +84,23 @@ def test_register(mock_db, client_fixture):
     assert b"Redirecting..." in response.data
 
 
+@patch("app.db")
+def test_register_concurrent_duplicate(mock_db, client_fixture):
+    """
+    Test that a username taken between the check and the insert is reported
+    to the user instead of failing the request.
+    """
+    mock_db.users.find_one.return_value = None
+    mock_db.users.insert_one.side_effect = DuplicateKeyError("E11000 duplicate key")
+    response = client_fixture.post(
+        "/register",
+        data={"username": "new_user", "password": "pw", "repassword": "pw"},
+        follow_redirects=True,
+    )
+    assert response.status_code == 200
+    assert b"Username already exists." in response.data
+
+
 @patch("app.db")
 @patch("app.login_user")
 def test_login(mock_login_user, mock_db, client_fixture):
@@ -89,8 +126,8 @@ def test_login(mock_login_user, mock_db, client_fixture):
 
 
 @patch("app.current_user")
-@patch("app.requests.post")
-@patch("app.convert_to_pcm_wav")
+@patch("app.ml_client.post_audio")
+@patch("app.convert_audio_stream", side_effect=lambda source, _spool_size: source)
 def test_upload_audio(
     mock_convert, mock_post, mock_current_user, client_fixture, mock_user_fixture
 ):
@@ -99,6 +136,32 @@ def test_upload_audio(
 
     This test mocks the file upload process to the '/upload' route,
     processes the audio, and verifies that the file is uploaded and processed successfully.
+    In the default stream mode the upload is converted in memory and never saved.
+    """
+    mock_user = mock_user_fixture
+    mock_current_user.get_id.return_value = mock_user.id
+    mock_post.return_value.status_code = 200
+    mock_post.return_value.json.return_value = {"status": "success"}
+
+    data = {"audio": (io.BytesIO(b"fake audio data"), "fake_audio.wav")}
+    response = client_fixture.post(
+        "/upload", data=data, content_type="multipart/form-data"
+    )
+    assert response.status_code == 200
+    assert b"File uploaded and processed successfully" in response.data
+    mock_convert.assert_called_once()
+    upload_folder = app.config["UPLOAD_FOLDER"]
+    assert not os.path.isdir(upload_folder) or not os.listdir(upload_folder)
+
+
+@patch("app.current_user")
+@patch("app.ml_client.post_audio")
+@patch("app.convert_to_pcm_wav")
+def test_upload_audio_file_mode(
+    mock_convert, mock_post, mock_current_user, client_fixture, mock_user_fixture
+):
+    """
+    Test the upload audio route with on-disk ffmpeg conversion.
     """
     mock_user = mock_user_fixture
     upload_folder = "./uploads"
@@ -113,56 +176,579 @@ def test_upload_audio(
         mock_post.return_value.json.return_value = {"status": "success"}
 
         data = {"audio": (io.BytesIO(b"fake audio data"), "fake_audio.wav")}
-        response = client_fixture.post(
-            "/upload", data=data, content_type="multipart/form-data"
-        )
+        with patch("app.CONVERT_MODE", "file"):
+            response = client_fixture.post(
+                "/upload", data=data, content_type="multipart/form-data"
+            )
         assert response.status_code == 200
         assert b"File uploaded and processed successfully" in response.data
+        mock_convert.assert_called_once()
+        assert not os.listdir(upload_folder)  # Both files are cleaned up
     finally:
         shutil.rmtree(upload_folder)  # Clean up after the test
 
 
-@patch("app.current_user")
-@patch("app.collection")
-def test_mood_trends(
-    mock_collection, mock_current_user, client_fixture, mock_user_fixture
+@patch("app.ml_client.post_audio")
+@patch("app.convert_audio_stream", side_effect=lambda source, _spool_size: source)
+def test_upload_audio_async_job(
+    mock_convert, mock_post, client_fixture, mock_user_fixture
 ):
+    """
+    Test the async upload mode.
+
+    The upload should return a job ID immediately, and the job status endpoint
+    should report the result once a worker has processed the job. The job
+    forwards the upload's correlation ID and the web app's stage timings.
+    """
+    upload_folder = "./uploads"
+    os.makedirs(upload_folder, exist_ok=True)
+    store = InMemoryJobStore()
+    mock_user_fixture.get_id.return_value = mock_user_fixture.id
+
+    try:
+        mock_post.return_value.status_code = 200
+        mock_post.return_value.json.return_value = {"status": "success"}
+
+        with patch("app.current_user", mock_user_fixture), patch(
+            "app.job_store", store
+        ), patch("app.job_pool") as mock_pool:
+            data = {"audio": (io.BytesIO(b"fake audio data"), "fake_audio.wav")}
+            response = client_fixture.post(
+                "/upload?mode=async",
+                data=data,
+                content_type="multipart/form-data",
+                headers={"X-Request-ID": "upload-1"},
+            )
+            assert response.status_code == 202
+            job_id = response.json["job_id"]
+            mock_pool.start.assert_called_once()
+            mock_post.assert_not_called()
+
+            JobWorkerPool(store, process_upload_job).run_once()
+
+            app.config["LOGIN_DISABLED"] = True
+            response = client_fixture.get(f"/api/jobs/{job_id}")
+        assert response.status_code == 200
+        assert response.json["status"] == "done"
+        assert response.json["result"] == {"status": "success"}
+        mock_convert.assert_called_once()
+        assert not os.listdir(upload_folder)  # The stored upload is cleaned up
+        assert mock_post.call_args.args[3] == "upload-1"
+        timings = mock_post.call_args.kwargs["timings"]
+        assert set(timings) == {"save", "queue", "convert"}
+    finally:
+        app.config["LOGIN_DISABLED"] = False
+        shutil.rmtree(upload_folder)
+
+
+@pytest.mark.usefixtures("login_disabled")
+@patch("app.current_user")
+@patch("app.db")
+def test_mood_trends(mock_db, mock_current_user, client_fixture, mock_user_fixture):
     """
     Test the mood trends API route.
 
     This test simulates a request to the '/api/mood-trends' route
-    and verifies that the correct mood counts are returned.
+    and verifies that the mood counts are read from the user's counter document.
     """
     mock_user = mock_user_fixture
     mock_current_user.get_id.return_value = mock_user.id
 
-    mock_collection.count_documents.side_effect = [
-        5,
-        3,
-        2,
-    ]  # Positive, Negative, Neutral counts
+    stats = mock_db.__getitem__.return_value
+    stats.find_one.return_value = {
+        "_id": mock_user.id,
+        "mood_counts": {"Positive": 5, "Negative": 3, "Neutral": 2},
+        "seeded": True,
+    }
 
     response = client_fixture.get("/api/mood-trends")
     assert response.status_code == 200
     assert response.json == {"Positive": 5, "Negative": 3, "Neutral": 2}
+    stats.aggregate.assert_not_called()
 
 
+@pytest.mark.usefixtures("login_disabled")
 @patch("app.current_user")
+@patch("app.db")
+def test_mood_trends_seeds_counters(
+    mock_db, mock_current_user, client_fixture, mock_user_fixture
+):
+    """
+    Test that missing counters are seeded with a single aggregation.
+    """
+    mock_user = mock_user_fixture
+    mock_current_user.get_id.return_value = mock_user.id
+
+    collections = {"user_stats": MagicMock(), "entries": MagicMock()}
+    mock_db.__getitem__.side_effect = collections.__getitem__
+    collections["user_stats"].find_one.return_value = None
+    collections["entries"].aggregate.return_value = [
+        {"_id": "Positive", "count": 5},
+        {"_id": "Negative", "count": 3},
+    ]
+
+    response = client_fixture.get("/api/mood-trends")
+    assert response.status_code == 200
+    assert response.json == {"Positive": 5, "Negative": 3, "Neutral": 0}
+    collections["entries"].aggregate.assert_called_once()
+    collections["entries"].count_documents.assert_not_called()
+    seeded = collections["user_stats"].insert_one.call_args.args[0]
+    assert seeded["seeded"] is True
+    assert seeded["mood_counts"]["Positive"] == 5
+
+
+@pytest.mark.usefixtures("login_disabled")
+@patch("app.current_user", new_callable=MagicMock)
+@patch("app.db")
+def test_mood_trends_reseeds_counters_changed_meanwhile(
+    mock_db, mock_current_user, client_fixture
+):
+    """
+    Test that seeded counters are only stored if no entry was stored or
+    deleted during the aggregation, and otherwise seeded again.
+    """
+    mock_current_user.get_id.return_value = "user-1"
+    collections = {"user_stats": MagicMock(), "entries": MagicMock()}
+    mock_db.__getitem__.side_effect = collections.__getitem__
+    stats = collections["user_stats"]
+    stats.find_one.side_effect = [{"version": 3}, {"version": 4}]
+    # The entry stored during the first aggregation bumped the version
+    stats.update_one.side_effect = [
+        MagicMock(matched_count=0),
+        MagicMock(matched_count=1),
+    ]
+    collections["entries"].aggregate.side_effect = [
+        [{"_id": "Positive", "count": 1}],
+        [{"_id": "Positive", "count": 2}],
+    ]
+
+    response = client_fixture.get("/api/mood-trends")
+    assert response.json == {"Positive": 2, "Negative": 0, "Neutral": 0}
+    guards = [call.args[0] for call in stats.update_one.call_args_list]
+    assert [guard["version"] for guard in guards] == [3, 4]
+    assert all("writing_until" in guard for guard in guards)
+
+
+@pytest.mark.usefixtures("login_disabled")
+@patch("app.current_user", new_callable=MagicMock)
+@patch("app.db")
+def test_mood_trends_does_not_seed_during_writes(
+    mock_db, mock_current_user, client_fixture
+):
+    """
+    Test that counters aggregated while a write is pending are returned but
+    not stored, since the write may still update them.
+    """
+    mock_current_user.get_id.return_value = "user-1"
+    collections = {"user_stats": MagicMock(), "entries": MagicMock()}
+    mock_db.__getitem__.side_effect = collections.__getitem__
+    collections["user_stats"].find_one.return_value = {
+        "version": 3,
+        "writing_until": datetime.utcnow() + timedelta(seconds=30),
+    }
+    collections["entries"].aggregate.return_value = [{"_id": "Neutral", "count": 4}]
+
+    response = client_fixture.get("/api/mood-trends")
+    assert response.json == {"Positive": 0, "Negative": 0, "Neutral": 4}
+    collections["user_stats"].update_one.assert_not_called()
+    collections["user_stats"].insert_one.assert_not_called()
+
+
+@pytest.mark.usefixtures("login_disabled")
+@patch("app.current_user", new_callable=MagicMock)
+@patch("app.db")
 @patch("app.collection")
 def test_delete_entry(
-    mock_collection, mock_current_user, client_fixture, mock_user_fixture
+    mock_collection, mock_db, mock_current_user, client_fixture, mock_user_fixture
 ):
     """
     Test deleting a journal entry.
 
     This test simulates a DELETE request to the '/delete-journal/<id>' route
-    and verifies that the journal entry is deleted successfully.
+    and verifies that the journal entry is deleted successfully, after the
+    pending write was announced to mood counter seeding.
     """
     mock_user = mock_user_fixture
     mock_current_user.get_id.return_value = mock_user.id
 
-    mock_collection.delete_one.return_value.deleted_count = 1
+    mock_collection.find_one_and_delete.return_value = {
+        "user_id": mock_user.id,
+        "sentiment": {"mood": "Positive"},
+    }
 
     response = client_fixture.delete("/delete-journal/1234567890abcdef12345678")
     assert response.status_code == 200
     assert b"Entry deleted successfully" in response.data
+    pending, removed = mock_db.__getitem__.return_value.update_one.call_args_list
+    assert pending.args[0] == {"_id": mock_user.id}
+    assert pending.args[1]["$max"]["writing_until"] > datetime.utcnow()
+    assert removed.args == (
+        {"_id": mock_user.id},
+        {"$inc": {"version": 1, "mood_counts.Positive": -1}},
+    )
+
+
+@pytest.mark.usefixtures("login_disabled")
+@patch("app.current_user")
+@patch("app.db")
+@patch("app.collection")
+@patch("app.ml_client.release_audio")
+def test_delete_entry_releases_recording(
+    mock_release, mock_collection, _mock_db, mock_current_user, client_fixture
+):
+    """
+    Test that deleting an entry releases its stored recording, and that the
+    delete succeeds even if the machine learning client cannot be reached.
+    """
+    mock_current_user.get_id.return_value = "user-1"
+    mock_collection.find_one_and_delete.return_value = {
+        "user_id": "user-1",
+        "sentiment": {"mood": "Positive"},
+        "audio": {"key": "abc"},
+    }
+
+    response = client_fixture.delete("/delete-journal/1234567890abcdef12345678")
+    assert response.status_code == 200
+    assert mock_release.call_args.args[0] == "abc"
+
+    mock_release.side_effect = requests.exceptions.ConnectionError("down")
+    response = client_fixture.delete("/delete-journal/1234567890abcdef12345678")
+    assert response.status_code == 200
+
+
+@pytest.mark.usefixtures("login_disabled")
+@patch("app.current_user", new_callable=MagicMock)
+@patch("app.db")
+@patch("app.collection")
+def test_delete_entry_decrements_rollup(
+    mock_collection, mock_db, mock_current_user, client_fixture
+):
+    """
+    Test that deleting an entry subtracts it from its day's mood rollup.
+    """
+    mock_current_user.get_id.return_value = "user-1"
+    mock_collection.find_one_and_delete.return_value = {
+        "user_id": "user-1",
+        "timestamp": datetime(2024, 11, 3, 21, 30),
+        "sentiment": {"mood": "Negative", "polarity": -0.5, "subjectivity": 0.25},
+    }
+
+    response = client_fixture.delete("/delete-journal/1234567890abcdef12345678")
+    assert response.status_code == 200
+    (update,) = mock_db.__getitem__.return_value.bulk_write.call_args.args[0]
+    assert update._filter == {"_id": "user-1:2024-11-03"}  # pylint: disable=W0212
+    assert update._doc == {  # pylint: disable=protected-access
+        "$inc": {
+            "count": -1,
+            "mood_counts.Negative": -1,
+            "polarity_sum": 0.5,
+            "subjectivity_sum": -0.25,
+        }
+    }
+
+
+@pytest.mark.usefixtures("login_disabled")
+@patch("app.current_user", new_callable=MagicMock)
+@patch("app.db")
+def test_mood_trends_by_week(mock_db, mock_current_user, client_fixture):
+    """
+    Test that daily rollups are merged into weekly buckets, empty weeks
+    included, with the mean sentiment per week.
+    """
+    mock_current_user.get_id.return_value = "user-1"
+    collections = {"user_stats": MagicMock(), "mood_rollups": MagicMock()}
+    mock_db.__getitem__.side_effect = collections.__getitem__
+    collections["user_stats"].find_one.return_value = {"rollups_seeded": True}
+    collections["mood_rollups"].find.return_value.sort.return_value = [
+        {
+            "day": datetime(2024, 11, 4),
+            "count": 2,
+            "mood_counts": {"Positive": 2},
+            "polarity_sum": 1.0,
+            "subjectivity_sum": 0.5,
+        },
+        {
+            "day": datetime(2024, 11, 6),
+            "count": 2,
+            "mood_counts": {"Negative": 1, "Neutral": 1},
+            "polarity_sum": -0.2,
+            "subjectivity_sum": 0.3,
+        },
+    ]
+
+    response = client_fixture.get(
+        "/api/mood-trends?granularity=week&from=2024-11-05&to=2024-11-17"
+    )
+    assert response.status_code == 200
+    assert response.json["from"] == "2024-11-05"
+    first, second = response.json["buckets"]
+    assert first == {
+        "start": "2024-11-04",
+        "count": 4,
+        "mood_counts": {"Positive": 2, "Negative": 1, "Neutral": 1},
+        "mean_polarity": 0.2,
+        "mean_subjectivity": 0.2,
+    }
+    assert second["start"] == "2024-11-11" and second["count"] == 0
+    query = collections["mood_rollups"].find.call_args.args[0]
+    assert query["day"] == {
+        "$gte": datetime(2024, 11, 5),
+        "$lte": datetime(2024, 11, 17),
+    }
+
+
+@pytest.mark.usefixtures("login_disabled")
+@patch("app.current_user", new_callable=MagicMock)
+@patch("app.db")
+def test_mood_trends_seeds_rollups(mock_db, mock_current_user, client_fixture):
+    """
+    Test that rollups are built from existing entries on the first request.
+    """
+    mock_current_user.get_id.return_value = "user-1"
+    collections = {
+        "user_stats": MagicMock(),
+        "entries": MagicMock(),
+        "mood_rollups": MagicMock(),
+    }
+    mock_db.__getitem__.side_effect = collections.__getitem__
+    collections["user_stats"].find_one.return_value = None
+    collections["entries"].aggregate.return_value = [
+        {
+            "_id": "2024-11-03",
+            "count": 1,
+            "polarity_sum": 0.5,
+            "subjectivity_sum": 0.5,
+            "Positive": 1,
+            "Negative": 0,
+            "Neutral": 0,
+        }
+    ]
+    collections["mood_rollups"].find.return_value.sort.return_value = []
+
+    response = client_fixture.get(
+        "/api/mood-trends?granularity=month&from=2024-11-01&to=2024-11-30"
+    )
+    assert response.status_code == 200
+    assert len(response.json["buckets"]) == 1
+    (upsert,) = collections["mood_rollups"].bulk_write.call_args.args[0]
+    assert upsert._filter == {"_id": "user-1:2024-11-03"}  # pylint: disable=W0212
+    seeded = collections["user_stats"].insert_one.call_args.args[0]
+    assert seeded["rollups_seeded"] is True
+
+
+@pytest.mark.usefixtures("login_disabled")
+@patch("app.current_user", new_callable=MagicMock)
+@patch("app.db")
+def test_mood_trends_unseeds_rollups_changed_meanwhile(
+    mock_db, mock_current_user, client_fixture
+):
+    """
+    Test that rollups are rebuilt while entries keep changing during the
+    seed, and left unseeded if no pass completes unchanged.
+    """
+    mock_current_user.get_id.return_value = "user-1"
+    collections = {
+        "user_stats": MagicMock(),
+        "entries": MagicMock(),
+        "mood_rollups": MagicMock(),
+    }
+    mock_db.__getitem__.side_effect = collections.__getitem__
+    stats = collections["user_stats"]
+    stats.find_one.return_value = {"version": 1}
+    stats.update_one.return_value.matched_count = 0
+    collections["entries"].aggregate.return_value = []
+    collections["mood_rollups"].find.return_value.sort.return_value = []
+
+    response = client_fixture.get("/api/mood-trends?granularity=day")
+    assert response.status_code == 200
+    assert collections["entries"].aggregate.call_count == 3
+    assert stats.update_one.call_args.args[1] == {"$unset": {"rollups_seeded": ""}}
+
+
+@patch("app.db")
+def test_mood_trends_requires_login(mock_db, client_fixture):
+    """
+    Test that anonymous callers are redirected to the login page without
+    reading or seeding any statistics.
+    """
+    response = client_fixture.get("/api/mood-trends")
+    assert response.status_code == 302
+    mock_db.__getitem__.assert_not_called()
+
+
+@pytest.mark.usefixtures("login_disabled")
+@patch("app.current_user", new_callable=MagicMock)
+@patch("app.db")
+def test_mood_trends_rejects_bad_ranges(mock_db, mock_current_user, client_fixture):
+    """
+    Test that unknown granularities, malformed dates and inverted or overlong
+    ranges are rejected without a database query.
+    """
+    mock_current_user.get_id.return_value = "user-1"
+    for query in (
+        "granularity=year",
+        "granularity=day&from=11/05/2024",
+        "granularity=day&from=2024-11-05&to=2024-11-01",
+        "granularity=month&from=2000-01-01&to=2024-01-01",
+    ):
+        response = client_fixture.get(f"/api/mood-trends?{query}")
+        assert response.status_code == 400
+    mock_db.__getitem__.assert_not_called()
+
+
+@patch("app.collection")
+def test_recent_entries_pages(mock_collection, client_fixture, mock_user_fixture):
+    """
+    Test that recent entries are returned a page at a time with a next cursor,
+    both as a regular and as a streamed JSON response.
+    """
+    mock_user_fixture.get_id.return_value = mock_user_fixture.id
+    documents = [
+        {
+            "_id": ObjectId(),
+            "transcript": f"entry {index}",
+            "sentiment": {"mood": "Positive"},
+            "timestamp": datetime(2024, 11, 3 - index, 12, 0),
+        }
+        for index in range(3)
+    ]
+    query = mock_collection.find.return_value.sort.return_value.limit
+    query.return_value = documents
+
+    try:
+        app.config["LOGIN_DISABLED"] = True
+        with patch("app.current_user", mock_user_fixture):
+            response = client_fixture.get("/api/recent-entries?limit=2")
+            streamed = client_fixture.get("/api/recent-entries?limit=2&stream=1")
+    finally:
+        app.config["LOGIN_DISABLED"] = False
+
+    assert response.status_code == 200
+    assert [entry["transcript"] for entry in response.json["entries"]] == [
+        "entry 0",
+        "entry 1",
+    ]
+    assert response.json["entries"][0]["timestamp"] == "2024-11-03 12:00:00"
+    assert response.json["next_cursor"] == encode_cursor(documents[1])
+    query.assert_called_with(3)
+    projection = mock_collection.find.call_args.args[1]
+    assert "file_name" not in projection
+
+    assert streamed.status_code == 200
+    assert json.loads(streamed.data) == response.json
+
+
+@patch("app.collection")
+def test_recent_entries_rejects_bad_cursor(
+    mock_collection, client_fixture, mock_user_fixture
+):
+    """
+    Test that a malformed cursor is rejected before querying the database.
+    """
+    try:
+        app.config["LOGIN_DISABLED"] = True
+        with patch("app.current_user", mock_user_fixture):
+            response = client_fixture.get("/api/recent-entries?cursor=not-a-cursor")
+    finally:
+        app.config["LOGIN_DISABLED"] = False
+
+    assert response.status_code == 400
+    mock_collection.find.assert_not_called()
+
+
+@patch("app.db")
+@patch("app.collection")
+def test_index_is_cached_per_user(
+    mock_collection, mock_db, client_fixture, mock_user_fixture
+):
+    """
+    Test that the homepage reads no entries, and that repeat visits reuse the
+    user's rendered page.
+    """
+    mock_user_fixture.get_id.return_value = mock_user_fixture.id
+
+    try:
+        app.config["LOGIN_DISABLED"] = True
+        with patch("app.current_user", mock_user_fixture), patch(
+            "app.page_cache", LRUCache()
+        ) as cache:
+            first = client_fixture.get("/")
+            second = client_fixture.get("/")
+            stats = cache.stats()
+    finally:
+        app.config["LOGIN_DISABLED"] = False
+
+    assert first.status_code == second.status_code == 200
+    assert b"test_user" in first.data
+    assert second.data == first.data
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+    mock_collection.find.assert_not_called()
+    mock_db.__getitem__.assert_not_called()
+
+
+def test_abandoned_upload_job_removes_files(tmp_path):
+    """
+    Test that the stored upload of a job abandoned after repeated worker
+    deaths is deleted, since the handler never runs to clean it up.
+    """
+    upload = tmp_path / "upload.webm"
+    upload.write_bytes(b"audio")
+    payload = {
+        "file_path": str(upload),
+        "converted_file_path": str(tmp_path / "converted_upload.webm"),
+    }
+    store = InMemoryJobStore()
+    store.enqueue(dict(new_job("user-1", payload), attempts=MAX_JOB_ATTEMPTS))
+
+    handler = MagicMock()
+    JobWorkerPool(store, handler, on_abandon=discard_upload_job).run_once()
+
+    handler.assert_not_called()
+    assert not list(tmp_path.iterdir())
+
+
+@patch("app.db")
+def test_load_user_is_cached(mock_db, client_fixture):
+    """
+    Test that repeated user loads are served from the cache until logout.
+    """
+    user_id = str(ObjectId())
+    mock_db.users.find_one.return_value = {
+        "_id": ObjectId(user_id),
+        "username": "test_user",
+        "password": "hash",
+    }
+    cache = TTLCache()
+    with patch("app.user_cache", cache):
+        assert load_user(user_id).username == "test_user"
+        assert load_user(user_id).username == "test_user"
+        assert mock_db.users.find_one.call_count == 1
+
+        with client_fixture.session_transaction() as session:
+            session["_user_id"] = user_id
+        assert client_fixture.get("/logout").status_code == 302
+        assert cache.get(user_id) is None
+
+        try:
+            app.config["LOGIN_DISABLED"] = True
+            stats = client_fixture.get("/api/cache-stats").json
+        finally:
+            app.config["LOGIN_DISABLED"] = False
+    assert stats["users"]["hits"] >= 2
+    assert "hit_rate" in stats["pages"]
+
+
+@patch("app.ml_client.post_audio", side_effect=CircuitOpenError("circuit open"))
+@patch("app.convert_audio_stream", side_effect=lambda source, _spool_size: source)
+def test_upload_audio_fails_fast_when_circuit_open(
+    _mock_convert, _mock_post, client_fixture, mock_user_fixture
+):
+    """
+    Test that uploads are answered with 503 while the ML client circuit is open.
+    """
+    with patch("app.current_user", mock_user_fixture):
+        data = {"audio": (io.BytesIO(b"fake audio data"), "fake_audio.wav")}
+        response = client_fixture.post(
+            "/upload", data=data, content_type="multipart/form-data"
+        )
+    assert response.status_code == 503
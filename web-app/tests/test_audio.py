@@ -0,0 +1,92 @@
+"""
+Unit tests for the WAV sniffing and in-memory conversion helpers in audio.py.
+"""
+
+import io
+import wave
+from unittest.mock import patch
+import pytest
+from audio import convert_audio_stream, is_pcm_wav, read_wav_format
+
+
+def make_wav(sample_rate=16000, channels=1, sample_width=2, frames=160):
+    """Build a silent WAV file with the given format."""
+    buffer = io.BytesIO()
+    with wave.Wave_write(buffer) as wav_file:
+        wav_file.setnchannels(channels)
+        wav_file.setsampwidth(sample_width)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(b"\x00" * frames * channels * sample_width)
+    return buffer.getvalue()
+
+
+def test_is_pcm_wav_accepts_target_format():
+    """
+    Test that 16 kHz mono 16-bit WAV is recognised as already converted.
+    """
+    assert is_pcm_wav(make_wav())
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [{"sample_rate": 44100}, {"channels": 2}, {"sample_width": 1}],
+)
+def test_is_pcm_wav_rejects_other_formats(kwargs):
+    """
+    Test that WAV files in other formats still need conversion.
+    """
+    assert not is_pcm_wav(make_wav(**kwargs))
+
+
+def test_read_wav_format_rejects_non_wav():
+    """
+    Test that non-RIFF data is not parsed as WAV.
+    """
+    assert read_wav_format(b"\x1aE\xdf\xa3 webm data") is None
+    assert not is_pcm_wav(b"")
+
+
+@patch("audio.subprocess.Popen")
+def test_convert_audio_stream_skips_ffmpeg_for_pcm(mock_popen):
+    """
+    Test that audio already in the target format bypasses ffmpeg.
+    """
+    source = io.BytesIO(make_wav())
+    assert convert_audio_stream(source) is source
+    assert source.tell() == 0
+    mock_popen.assert_not_called()
+
+
+@patch("audio.ffmpeg_command", return_value=["cat"])
+def test_convert_audio_stream_pipes_through_ffmpeg(_mock_command):
+    """
+    Test that other audio is piped through the converter and wrapped as WAV.
+
+    `cat` stands in for ffmpeg, echoing the input back as raw samples.
+    """
+    samples = b"\x01\x00" * 16000
+    with convert_audio_stream(io.BytesIO(samples), spool_max_bytes=1024) as result:
+        data = result.read()
+
+    assert is_pcm_wav(data)
+    with wave.open(io.BytesIO(data)) as wav_file:
+        assert wav_file.getnframes() == 16000
+        assert wav_file.readframes(16000) == samples
+
+
+@patch("audio.ffmpeg_command", return_value=["sh", "-c", "echo bad input >&2; exit 1"])
+def test_convert_audio_stream_error(_mock_command):
+    """
+    Test that ffmpeg failures are raised as RuntimeError.
+    """
+    with pytest.raises(RuntimeError, match="bad input"):
+        convert_audio_stream(io.BytesIO(b"webm data"))
+
+
+@patch("audio.ffmpeg_command", return_value=["ffmpeg-does-not-exist"])
+def test_convert_audio_stream_missing_ffmpeg(_mock_command):
+    """
+    Test that a missing ffmpeg binary is reported as RuntimeError.
+    """
+    with pytest.raises(RuntimeError, match="not found"):
+        convert_audio_stream(io.BytesIO(b"webm data"))
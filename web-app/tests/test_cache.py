@@ -0,0 +1,72 @@
+"""
+Unit tests for the in-process caches in cache.py.
+"""
+
+from unittest.mock import patch
+from cache import LRUCache, TTLCache
+
+
+def test_lru_cache_evicts_least_recently_used():
+    """
+    Test that the least recently used entry is evicted beyond maxsize.
+    """
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats() == {
+        "hits": 3,
+        "misses": 1,
+        "size": 2,
+        "maxsize": 2,
+        "hit_rate": 0.75,
+    }
+
+
+def test_lru_cache_invalidates_matching_keys():
+    """
+    Test that invalidation removes only the keys matching the predicate.
+    """
+    cache = LRUCache()
+    cache.set(("index", "user-1", 1), "page")
+    cache.set(("index", "user-2", 1), "page")
+
+    cache.invalidate(lambda key: key[1] == "user-1")
+    assert cache.get(("index", "user-1", 1)) is None
+    assert cache.get(("index", "user-2", 1)) == "page"
+
+    cache.invalidate()
+    assert cache.stats()["size"] == 0
+
+
+def test_ttl_cache_expires_entries():
+    """
+    Test that entries expire after the TTL and count as misses.
+    """
+    cache = TTLCache(maxsize=10, ttl_seconds=30)
+    with patch("cache.time.monotonic", return_value=100.0):
+        cache.set("user-1", {"username": "a"})
+        assert cache.get("user-1") == {"username": "a"}
+    with patch("cache.time.monotonic", return_value=131.0):
+        assert cache.get("user-1") is None
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["size"]) == (1, 1, 0)
+
+
+def test_ttl_cache_pop_invalidates_one_key():
+    """
+    Test that pop removes a single entry and tolerates missing keys.
+    """
+    cache = TTLCache()
+    cache.set("user-1", "a")
+    cache.set("user-2", "b")
+    cache.pop("user-1")
+    cache.pop("user-3")
+    assert cache.get("user-1") is None
+    assert cache.get("user-2") == "b"
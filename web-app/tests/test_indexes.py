@@ -0,0 +1,142 @@
+"""
+Unit tests for index management in indexes.py.
+"""
+
+from unittest.mock import patch, MagicMock
+import pytest
+from pymongo.errors import OperationFailure, ServerSelectionTimeoutError
+from indexes import (
+    ensure_indexes,
+    plan_stages,
+    run_startup_bootstrap,
+    verify_query_plans,
+)
+
+
+def explained(stage_tree):
+    """
+    Build a query whose explain() returns the given winning plan.
+    """
+    query = MagicMock()
+    query.explain.return_value = {"queryPlanner": {"winningPlan": stage_tree}}
+    return lambda _db: query
+
+
+def test_ensure_indexes_creates_hot_query_indexes():
+    """
+    Test that the compound entries index and the unique username index are created.
+    """
+    collection = MagicMock()
+    collection.create_index.return_value = "index_name"
+    database = MagicMock()
+    database.__getitem__.return_value = collection
+    ensure_indexes(database)
+
+    created = [
+        call.args + (call.kwargs,) for call in collection.create_index.call_args_list
+    ]
+    assert ([("user_id", 1), ("timestamp", -1), ("_id", -1)], {}) in created
+    assert ([("username", 1)], {"unique": True}) in created
+    assert ([("status", 1), ("created_at", 1)], {}) in created
+    assert any(options.get("expireAfterSeconds") for _, options in created)
+    assert (
+        [("user_id", 1), ("transcript", "text")],
+        {"default_language": "english"},
+    ) in created
+
+
+def test_plan_stages_walks_nested_plans():
+    """
+    Test that stages are collected from single, multiple and SBE child plans.
+    """
+    plan = {
+        "queryPlan": {
+            "stage": "LIMIT",
+            "inputStage": {
+                "stage": "OR",
+                "inputStages": [{"stage": "IXSCAN"}, {"stage": "COLLSCAN"}],
+            },
+        }
+    }
+    assert plan_stages(plan) == ["LIMIT", "OR", "IXSCAN", "COLLSCAN"]
+
+
+def test_verify_query_plans_accepts_index_scans():
+    """
+    Test that plans backed by an index pass and are returned.
+    """
+    queries = {
+        "recent_entries": explained(
+            {"stage": "LIMIT", "inputStage": {"stage": "IXSCAN"}}
+        ),
+        "load_user": explained({"stage": "IDHACK"}),
+    }
+    plans = verify_query_plans(MagicMock(), queries)
+    assert plans == {"recent_entries": ["LIMIT", "IXSCAN"], "load_user": ["IDHACK"]}
+
+
+def test_verify_query_plans_rejects_collection_scans():
+    """
+    Test that a collection scan in any hot query raises an error naming it.
+    """
+    queries = {
+        "login": explained({"stage": "COLLSCAN"}),
+        "load_user": explained({"stage": "IDHACK"}),
+    }
+    with pytest.raises(RuntimeError, match="login"):
+        verify_query_plans(MagicMock(), queries)
+
+
+def test_startup_bootstrap_logs_failures_unless_strict(monkeypatch):
+    """
+    Test that an unreachable database only fails startup in strict mode.
+    """
+    with patch("indexes.MongoClient") as mock_client:
+        collection = mock_client.return_value["voice_mood_journal"]["entries"]
+        collection.create_index.side_effect = ServerSelectionTimeoutError("down")
+        run_startup_bootstrap()
+        monkeypatch.setenv("MONGO_VERIFY_QUERY_PLANS", "true")
+        with pytest.raises(ServerSelectionTimeoutError):
+            run_startup_bootstrap()
+    assert mock_client.return_value.close.call_count == 2
+
+
+def test_ensure_indexes_drops_superseded_index():
+    """
+    Test that the old {user_id, timestamp} index is dropped once replaced.
+    """
+    collection = MagicMock()
+    collection.create_index.return_value = "index_name"
+    collection.index_information.return_value = {"user_id_1_timestamp_-1": {}}
+    database = MagicMock()
+    database.__getitem__.return_value = collection
+    ensure_indexes(database)
+
+    collection.drop_index.assert_called_once_with("user_id_1_timestamp_-1")
+
+
+def test_ensure_indexes_continues_past_failed_index():
+    """
+    Test that a failed index is logged and skipped, the remaining indexes are
+    still created and superseded ones dropped, and the failure is reported.
+    """
+    collection = MagicMock()
+    collection.create_index.side_effect = lambda keys, **options: (
+        raise_duplicates() if options.get("unique") else "index_name"
+    )
+    collection.index_information.return_value = {"user_id_1_timestamp_-1": {}}
+    database = MagicMock()
+    database.__getitem__.return_value = collection
+    with pytest.raises(RuntimeError, match="users"):
+        ensure_indexes(database)
+
+    created = [call.args[0] for call in collection.create_index.call_args_list]
+    assert [("finished_at", 1)] in created
+    collection.drop_index.assert_called_once_with("user_id_1_timestamp_-1")
+
+
+def raise_duplicates():
+    """
+    Fail like a unique index built over duplicate keys.
+    """
+    raise OperationFailure("E11000 duplicate key error", code=11000)
@@ -0,0 +1,135 @@
+"""
+Unit tests for the background job queue in jobs.py.
+"""
+
+from unittest.mock import MagicMock
+import pytest
+from jobs import (
+    InMemoryJobStore,
+    JobWorkerPool,
+    MongoJobStore,
+    create_job_store,
+    new_job,
+    MAX_JOB_ATTEMPTS,
+    STATUS_DONE,
+    STATUS_FAILED,
+    STATUS_QUEUED,
+)
+
+
+def test_in_memory_store_round_trip():
+    """
+    Test that a queued job can be claimed, updated and read back.
+    """
+    store = InMemoryJobStore()
+    job_id = store.enqueue(new_job("user-1", {"file_path": "a.wav"}))
+    assert store.get(job_id)["status"] == STATUS_QUEUED
+
+    claimed = store.claim(timeout=0)
+    assert claimed["_id"] == job_id
+    assert claimed["status"] == "running"
+    assert store.claim(timeout=0) is None
+
+
+def test_worker_pool_records_result_and_progress():
+    """
+    Test that the worker pool stores the handler result and marks the job done.
+    """
+    store = InMemoryJobStore()
+    stages = []
+
+    def handler(job, report):
+        report("converting", 20)
+        stages.append(store.get(job["_id"])["stage"])
+        return {"transcript": "hello"}
+
+    job_id = store.enqueue(new_job("user-1", {}))
+    JobWorkerPool(store, handler).run_once()
+
+    job = store.get(job_id)
+    assert stages == ["converting"]
+    assert job["status"] == STATUS_DONE
+    assert job["progress"] == 100
+    assert job["result"] == {"transcript": "hello"}
+    assert job["finished_at"] is not None
+
+
+def test_worker_pool_marks_failures():
+    """
+    Test that an exception in the handler marks the job as failed.
+    """
+    store = InMemoryJobStore()
+
+    def handler(_job, _report):
+        raise RuntimeError("ffmpeg conversion failed")
+
+    job_id = store.enqueue(new_job("user-1", {}))
+    JobWorkerPool(store, handler).run_once()
+
+    job = store.get(job_id)
+    assert job["status"] == STATUS_FAILED
+    assert "ffmpeg" in job["error"]
+
+
+def test_mongo_store_claims_oldest_queued_job():
+    """
+    Test that the Mongo store claims jobs with an atomic find_one_and_update.
+    """
+    collection = MagicMock()
+    collection.find_one_and_update.return_value = {"_id": "job-1"}
+    store = MongoJobStore(collection)
+
+    assert store.claim(timeout=0) == {"_id": "job-1"}
+    query, update = collection.find_one_and_update.call_args.args
+    assert query["$or"][0] == {"status": STATUS_QUEUED}
+    assert update["$set"]["status"] == "running"
+    assert update["$inc"] == {"attempts": 1}
+
+
+def test_mongo_store_reclaims_expired_leases():
+    """
+    Test that running jobs are claimed again once their lease has expired,
+    and that reporting progress renews the lease.
+    """
+    collection = MagicMock()
+    store = MongoJobStore(collection, lease_seconds=60)
+    store.claim(timeout=0)
+    query, update = collection.find_one_and_update.call_args.args
+    expired = query["$or"][1]
+    assert expired["status"] == "running"
+    lease = update["$set"]["lease_expires_at"] - update["$set"]["updated_at"]
+    assert lease.total_seconds() == 60
+    assert expired["lease_expires_at"]["$lt"] == update["$set"]["updated_at"]
+
+    store.update("job-1", stage="converting", progress=20)
+    assert (
+        "lease_expires_at" in collection.find_one_and_update.call_args.args[1]["$set"]
+    )
+    store.update("job-1", status=STATUS_DONE)
+    assert "lease_expires_at" not in (
+        collection.find_one_and_update.call_args.args[1]["$set"]
+    )
+
+
+def test_worker_pool_abandons_jobs_after_too_many_attempts():
+    """
+    Test that a job whose workers kept dying is failed instead of run again.
+    """
+    store = InMemoryJobStore()
+    handler, on_abandon = MagicMock(), MagicMock()
+    job_id = store.enqueue(dict(new_job("user-1", {}), attempts=MAX_JOB_ATTEMPTS))
+    JobWorkerPool(store, handler, on_abandon=on_abandon).run_once()
+
+    handler.assert_not_called()
+    assert on_abandon.call_args.args[0]["_id"] == job_id
+    assert store.get(job_id)["status"] == STATUS_FAILED
+    assert "Abandoned" in store.get(job_id)["error"]
+
+
+def test_create_job_store_rejects_unknown_backend():
+    """
+    Test that an unknown backend name raises a ValueError.
+    """
+    assert isinstance(create_job_store("memory"), InMemoryJobStore)
+    with pytest.raises(ValueError):
+        create_job_store("redis")
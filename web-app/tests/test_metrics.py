@@ -0,0 +1,97 @@
+"""
+Unit tests for the Prometheus metrics in metrics.py.
+"""
+
+import io
+from pathlib import Path
+from unittest.mock import patch
+import pytest
+from prometheus_client import REGISTRY
+from app import app
+from metrics import reset_multiprocess_dir, timed_stage
+
+
+def sample(name, **labels):
+    """Read a sample of the default registry, 0 if it was never recorded."""
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+@pytest.fixture(name="client_fixture")
+def fixture_client():
+    """Fixture to set up the test client."""
+    app.config["TESTING"] = True
+    with app.test_client() as test_client:
+        yield test_client
+
+
+def test_timed_stage_records_failures():
+    """Test that a stage is timed also when it raises."""
+    before = sample("web_stage_duration_seconds_count", stage="test")
+    with pytest.raises(RuntimeError):
+        with timed_stage("test"):
+            raise RuntimeError("boom")
+    assert sample("web_stage_duration_seconds_count", stage="test") == before + 1
+
+
+@patch("app.current_user")
+@patch("app.ml_client.post_audio")
+@patch("app.convert_to_pcm_wav")
+def test_upload_is_instrumented(
+    mock_convert, mock_post, mock_current_user, client_fixture, tmp_path
+):
+    """
+    Test that the save, convert and forward stages of an upload are timed and
+    that the request is counted and shows on `/metrics`.
+    """
+    mock_current_user.get_id.return_value = "user-1"
+    mock_convert.side_effect = lambda _input, output: Path(output).touch()
+    mock_post.return_value.status_code = 200
+    mock_post.return_value.json.return_value = {"status": "success"}
+    stages = ("save", "convert", "forward")
+    before = {
+        stage: sample("web_stage_duration_seconds_count", stage=stage)
+        for stage in stages
+    }
+    requests = sample("web_requests_total", endpoint="upload", status="200")
+
+    data = {"audio": (io.BytesIO(b"fake audio data"), "fake_audio.wav")}
+    with patch("app.CONVERT_MODE", "file"), patch.dict(
+        app.config, {"UPLOAD_FOLDER": str(tmp_path)}
+    ):
+        response = client_fixture.post(
+            "/upload", data=data, content_type="multipart/form-data"
+        )
+    assert response.status_code == 200
+
+    for stage in stages:
+        count = sample("web_stage_duration_seconds_count", stage=stage)
+        assert count == before[stage] + 1
+    assert sample("web_requests_total", endpoint="upload", status="200") == requests + 1
+    assert sample("web_requests_in_flight", endpoint="upload") == 0
+
+    metrics = client_fixture.get("/metrics")
+    assert metrics.status_code == 200
+    assert b'web_stage_duration_seconds_count{stage="forward"}' in metrics.data
+
+
+def test_upload_errors_are_counted(client_fixture):
+    """Test that rejected uploads are counted with their status code."""
+    before = sample("web_requests_total", endpoint="upload", status="400")
+    response = client_fixture.post("/upload", data={})
+    assert response.status_code == 400
+    assert sample("web_requests_total", endpoint="upload", status="400") == before + 1
+
+
+def test_metrics_aggregate_multiprocess_dir(client_fixture, tmp_path, monkeypatch):
+    """
+    Test that in multiprocess mode the worker files are read instead of the
+    registry of this process, and that stale files are cleared at startup.
+    """
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+    (tmp_path / "counter_123.db").write_bytes(b"")
+    reset_multiprocess_dir()
+    assert not list(tmp_path.iterdir())
+
+    metrics = client_fixture.get("/metrics")
+    assert metrics.status_code == 200
+    assert b"web_requests_total" not in metrics.data
@@ -0,0 +1,208 @@
+"""
+Unit tests for the machine learning client transport in ml_transport.py.
+"""
+
+import io
+from unittest.mock import patch, MagicMock
+import pytest
+import requests
+from urllib3.exceptions import MaxRetryError, NewConnectionError, ProtocolError
+from ml_transport import CircuitBreaker, CircuitOpenError, MLClientTransport
+
+
+def make_transport(responses, retries=2, breaker=None):
+    """
+    Build a transport whose session returns or raises the given responses.
+    """
+    transport = MLClientTransport(
+        "http://ml/process-audio", breaker=breaker, retries=retries, backoff=0
+    )
+    session = MagicMock()
+    session.post.side_effect = responses
+    transport.session = lambda: session
+    return transport, session
+
+
+def refused():
+    """
+    Build the error requests raises when no connection could be established.
+    """
+    reason = NewConnectionError(None, "Connection refused")
+    return requests.exceptions.ConnectionError(
+        MaxRetryError(None, "/process-audio", reason)
+    )
+
+
+def response(status_code):
+    """
+    Build a response stub with the given status code.
+    """
+    return MagicMock(status_code=status_code)
+
+
+def test_session_is_pooled_and_reused():
+    """
+    Test that one keep-alive session with a bounded pool is reused per process.
+    """
+    transport = MLClientTransport("http://ml/process-audio", pool_size=4)
+    session = transport.session()
+    assert transport.session() is session
+    adapter = session.get_adapter("http://ml/process-audio")
+    assert adapter._pool_maxsize == 4  # pylint: disable=protected-access
+
+
+def test_connection_errors_are_retried_with_rewound_file():
+    """
+    Test that a failed connection is retried and the upload is re-sent from the start.
+    """
+    sent = []
+
+    def post(_url, files, **_kwargs):
+        sent.append(files["audio"][1].read())
+        if len(sent) == 1:
+            raise refused()
+        return response(200)
+
+    transport, session = make_transport(None)
+    session.post.side_effect = post
+    result = transport.post_audio(io.BytesIO(b"wav data"), "clip.wav", "user")
+
+    assert result.status_code == 200
+    assert sent == [b"wav data", b"wav data"]
+    stats = transport.stats()
+    assert (stats["calls"], stats["retries"], stats["failures"]) == (2, 1, 0)
+
+
+def test_aborted_connections_are_not_retried():
+    """
+    Test that a connection dropped after the upload was sent is not retried,
+    as the ML client may have stored the entry already.
+    """
+    aborted = requests.exceptions.ConnectionError(
+        ProtocolError("Connection aborted.", ConnectionResetError())
+    )
+    transport, session = make_transport([aborted])
+    with pytest.raises(requests.exceptions.ConnectionError):
+        transport.post_audio(io.BytesIO(b"wav"), "clip.wav", "user")
+    assert session.post.call_count == 1
+
+
+def test_read_timeouts_are_not_retried():
+    """
+    Test that a request that may have been processed is not sent again.
+    """
+    transport, session = make_transport([requests.exceptions.ReadTimeout("slow")])
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        transport.post_audio(io.BytesIO(b"wav"), "clip.wav", "user")
+    assert session.post.call_count == 1
+
+
+def test_unavailable_responses_are_retried_up_to_the_limit():
+    """
+    Test that 503 responses are retried a bounded number of times.
+    """
+    transport, session = make_transport([response(503)] * 3, retries=2)
+    result = transport.post_audio(io.BytesIO(b"wav"), "clip.wav", "user")
+    assert result.status_code == 503
+    assert session.post.call_count == 3
+    assert transport.stats()["failures"] == 1
+
+
+def test_circuit_opens_and_fails_fast():
+    """
+    Test that repeated failures open the circuit so further calls are rejected.
+    """
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+    transport, session = make_transport(
+        [response(502), refused()], retries=0, breaker=breaker
+    )
+    transport.post_audio(io.BytesIO(b"wav"), "clip.wav", "user")
+    with pytest.raises(requests.exceptions.ConnectionError):
+        transport.post_audio(io.BytesIO(b"wav"), "clip.wav", "user")
+
+    with pytest.raises(CircuitOpenError):
+        transport.post_audio(io.BytesIO(b"wav"), "clip.wav", "user")
+    assert session.post.call_count == 2
+    assert transport.stats()["rejected"] == 1
+    assert transport.stats()["circuit"] == "open"
+
+
+def test_bad_uploads_do_not_open_the_circuit():
+    """
+    Test that errors the ML client returns for a bad upload do not count
+    as failures of the ML client.
+    """
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+    transport, _ = make_transport([response(500), response(400)] * 2, breaker=breaker)
+    for _ in range(4):
+        transport.post_audio(io.BytesIO(b"wav"), "clip.wav", "user")
+    assert transport.stats()["circuit"] == "closed"
+
+
+def test_unexpected_error_ends_the_trial_call():
+    """
+    Test that a trial call failing with an unexpected exception lets the
+    next trial call through instead of keeping the circuit open for good.
+    """
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    transport, _ = make_transport([TypeError("bad argument"), response(200)])
+    transport.breaker = breaker
+    with pytest.raises(TypeError):
+        transport.post_audio(io.BytesIO(b"wav"), "clip.wav", "user")
+    transport.post_audio(io.BytesIO(b"wav"), "clip.wav", "user")
+    assert breaker.state == "closed"
+
+
+def test_circuit_half_opens_after_reset_timeout():
+    """
+    Test that a single trial call is let through after the reset timeout.
+    """
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    with patch("ml_transport.time.monotonic", return_value=100.0):
+        breaker.record_failure()
+    with patch("ml_transport.time.monotonic", return_value=131.0):
+        assert breaker.state == "half_open"
+        breaker.before_call()
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()  # Only one trial call at a time
+        breaker.record_success()
+    assert breaker.state == "closed"
+
+
+def test_request_id_is_sent_as_header():
+    """
+    Test that the correlation ID reaches the ML client as X-Request-ID.
+    """
+    transport, session = make_transport([response(200), response(200)])
+    transport.post_audio(io.BytesIO(b"wav"), "clip.wav", "user", "abc123")
+    assert session.post.call_args.kwargs["headers"] == {"X-Request-ID": "abc123"}
+
+    transport.post_audio(io.BytesIO(b"wav"), "clip.wav", "user")
+    assert session.post.call_args.kwargs["headers"] == {}
+
+
+def test_timings_are_sent_in_the_form():
+    """
+    Test that the web app's stage timings reach the ML client as JSON.
+    """
+    transport, session = make_transport([response(200), response(200)])
+    transport.post_audio(io.BytesIO(b"wav"), "clip.wav", "user", timings={"save": 1.5})
+    assert session.post.call_args.kwargs["data"] == {
+        "user_id": "user",
+        "timings": '{"save": 1.5}',
+    }
+
+    transport.post_audio(io.BytesIO(b"wav"), "clip.wav", "user")
+    assert session.post.call_args.kwargs["data"] == {"user_id": "user"}
+
+
+def test_release_audio_posts_next_to_process_audio():
+    """
+    Test that recordings are released through the endpoint next to /process-audio.
+    """
+    transport, session = make_transport([response(200)])
+    transport.release_audio("abc", "req-1")
+    assert session.post.call_args.args[0] == "http://ml/release-audio"
+    assert session.post.call_args.kwargs["json"] == {"key": "abc"}
+    assert session.post.call_args.kwargs["headers"] == {"X-Request-ID": "req-1"}
@@ -0,0 +1,61 @@
+"""
+Unit tests for keyset pagination in pagination.py.
+"""
+
+from datetime import datetime
+import pytest
+from bson.objectid import ObjectId
+from pagination import decode_cursor, encode_cursor, page_filter, paginate
+
+
+def make_entry(day):
+    """
+    Build a stored entry for the given day of November 2024.
+    """
+    return {"_id": ObjectId(), "timestamp": datetime(2024, 11, day, 8, 30)}
+
+
+def test_cursor_round_trip():
+    """
+    Test that a cursor decodes to the position of the entry it was built from.
+    """
+    entry = make_entry(5)
+    assert decode_cursor(encode_cursor(entry)) == (entry["timestamp"], entry["_id"])
+
+
+@pytest.mark.parametrize("token", ["", "not-a-cursor", "eyJ0cyI6IDF9"])
+def test_decode_cursor_rejects_malformed_tokens(token):
+    """
+    Test that malformed tokens raise ValueError.
+    """
+    with pytest.raises(ValueError):
+        decode_cursor(token)
+
+
+def test_page_filter_continues_after_cursor():
+    """
+    Test that the filter selects older entries, breaking timestamp ties on _id.
+    """
+    entry = make_entry(5)
+    query = page_filter("user", encode_cursor(entry))
+    assert query["user_id"] == "user"
+    assert query["$or"] == [
+        {"timestamp": {"$lt": entry["timestamp"]}},
+        {"timestamp": entry["timestamp"], "_id": {"$lt": entry["_id"]}},
+    ]
+    assert page_filter("user") == {"user_id": "user"}
+
+
+def test_paginate_reports_next_cursor_only_when_more_entries_exist():
+    """
+    Test that the extra fetched entry becomes the next cursor, not page content.
+    """
+    entries = [make_entry(day) for day in (9, 8, 7)]
+
+    page = list(paginate(entries, 2))
+    assert page == [
+        ("entry", entries[0]),
+        ("entry", entries[1]),
+        ("next_cursor", encode_cursor(entries[1])),
+    ]
+    assert list(paginate(entries, 3))[-1] == ("next_cursor", None)
@@ -0,0 +1,142 @@
+"""
+Unit tests for transcript search in search.py.
+"""
+
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+import pytest
+from bson.objectid import ObjectId
+from app import app
+from search import (
+    InvertedIndex,
+    LocalSearch,
+    MongoTextSearch,
+    make_snippet,
+    query_terms,
+    search_entries,
+)
+
+TRANSCRIPTS = [
+    "Walked the dog in the park and felt calm",
+    "Work was stressful, another deadline slipped",
+    "Long walk by the river after work, a good evening",
+    "Nothing much happened today",
+]
+
+
+def make_database(transcripts, version=1):
+    """
+    Build a database whose entries collection holds the given transcripts.
+    """
+    documents = [
+        {
+            "_id": ObjectId(),
+            "transcript": transcript,
+            "sentiment": {"mood": "Neutral"},
+            "timestamp": datetime(2024, 11, 1 + number, 9, 0),
+        }
+        for number, transcript in enumerate(transcripts)
+    ]
+    collections = {"entries": MagicMock(), "user_stats": MagicMock()}
+    collections["entries"].find.return_value.sort.return_value = documents
+    collections["user_stats"].find_one.return_value = {"version": version}
+    database = MagicMock()
+    database.__getitem__.side_effect = collections.__getitem__
+    return database, collections
+
+
+def test_query_terms_drop_stop_words():
+    """
+    Test that queries are reduced to their distinct searchable words and that
+    queries without any are rejected.
+    """
+    assert query_terms("The walk, and THE Walk to work") == ["walk", "work"]
+    with pytest.raises(ValueError):
+        query_terms("and the")
+
+
+def test_inverted_index_ranks_matches():
+    """
+    Test that only matching transcripts are returned, stemmed words match,
+    and transcripts matching more terms rank first.
+    """
+    index = InvertedIndex({"transcript": text} for text in TRANSCRIPTS)
+    ranked = [document["transcript"] for _, document in index.search(["walking"], 10)]
+    # The shorter transcript ranks first for a single match
+    assert ranked == [TRANSCRIPTS[0], TRANSCRIPTS[2]]
+
+    ranked = index.search(["walk", "work"], 10)
+    assert ranked[0][1]["transcript"] == TRANSCRIPTS[2]
+    assert len(ranked) == 3
+    assert not index.search(["holiday"], 10)
+
+
+def test_make_snippet_highlights_matches():
+    """
+    Test that snippets are cut around the first match on a word boundary,
+    with ellipses and highlight offsets into the snippet.
+    """
+    transcript = "filler " * 40 + "a walk by the river" + " filler" * 40
+    snippet = make_snippet(transcript, ["walking"], width=60)
+    assert snippet["text"].startswith("…filler")
+    assert snippet["text"].endswith("…")
+    ((start, end),) = snippet["highlights"]
+    assert snippet["text"][start:end] == "walk"
+
+
+def test_local_search_pages_and_rebuilds_per_version():
+    """
+    Test that the local backend pages through ranked results and rebuilds a
+    user's index only when their data version changes.
+    """
+    database, collections = make_database(TRANSCRIPTS)
+    backend = LocalSearch(database)
+
+    first, next_offset = search_entries(backend, "user-1", "work walk", 0, 2)
+    assert len(first) == 2 and next_offset == 2
+    assert first[0]["snippet"]["highlights"]
+    rest, next_offset = search_entries(backend, "user-1", "work walk", 2, 2)
+    assert len(rest) == 1 and next_offset is None
+    assert collections["entries"].find.call_count == 1
+
+    collections["user_stats"].find_one.return_value = {"version": 2}
+    search_entries(backend, "user-1", "work", 0, 2)
+    assert collections["entries"].find.call_count == 2
+    assert collections["entries"].find.call_args.args[0] == {"user_id": "user-1"}
+
+
+def test_mongo_search_uses_text_index():
+    """
+    Test that the Mongo backend queries the user's text index, ranked by
+    text score.
+    """
+    entries = MagicMock()
+    MongoTextSearch(entries).search("user-1", ["walk", "work"], 20, 11)
+    query, projection = entries.find.call_args.args
+    assert query == {"user_id": "user-1", "$text": {"$search": "walk work"}}
+    assert projection["score"] == {"$meta": "textScore"}
+    entries.find.return_value.sort.return_value.skip.assert_called_once_with(20)
+
+
+@patch("app.current_user", new_callable=MagicMock)
+def test_search_route(mock_current_user):
+    """
+    Test that the search route returns ranked results with snippets and
+    rejects empty queries and out of range offsets.
+    """
+    mock_current_user.get_id.return_value = "user-1"
+    database, _ = make_database(TRANSCRIPTS)
+    app.config["TESTING"] = True
+    with patch("app.search_backend", LocalSearch(database)), patch.dict(
+        app.config, {"LOGIN_DISABLED": True}
+    ), app.test_client() as client:
+        response = client.get("/api/search?q=river+walk&limit=1")
+        assert response.status_code == 200
+        (result,) = response.json["results"]
+        assert result["transcript"] == TRANSCRIPTS[2]
+        assert result["score"] > 0
+        assert "river" in result["snippet"]["text"]
+        assert response.json["next_offset"] == 1
+
+        assert client.get("/api/search?q=the").status_code == 400
+        assert client.get("/api/search?q=walk&offset=5000").status_code == 400
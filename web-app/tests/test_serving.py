@@ -0,0 +1,37 @@
+"""
+Unit tests for the cooperative serving helpers in serving.py.
+"""
+
+from unittest.mock import patch, MagicMock
+import serving
+
+
+def test_run_blocking_calls_inline_without_gevent():
+    """
+    Test that blocking calls run directly under sync workers.
+    """
+    with patch("serving.gevent_active", return_value=False), patch(
+        "serving.get_hub"
+    ) as mock_hub:
+        assert serving.run_blocking(divmod, 7, 2) == (3, 1)
+    mock_hub.assert_not_called()
+
+
+def test_run_blocking_uses_hub_threadpool_under_gevent():
+    """
+    Test that blocking calls are handed to the gevent thread pool when patched.
+    """
+    hub = MagicMock()
+    hub.threadpool.apply.side_effect = lambda func, args, kwargs: func(*args, **kwargs)
+    with patch("serving.gevent_active", return_value=True), patch(
+        "serving.get_hub", return_value=hub
+    ):
+        assert serving.run_blocking(int, "ff", base=16) == 255
+    hub.threadpool.apply.assert_called_once_with(int, ("ff",), {"base": 16})
+
+
+def test_gevent_inactive_in_unpatched_process():
+    """
+    Test that the test process itself is not reported as patched.
+    """
+    assert serving.gevent_active() is False
@@ -0,0 +1,78 @@
+"""
+Unit tests for request correlation and span timing in tracing.py.
+"""
+
+import io
+import logging
+from unittest.mock import patch
+import pytest
+from app import app
+from tracing import collect_spans, current_request_id, record_span, span_timings
+
+
+@pytest.fixture(name="client_fixture")
+def fixture_client():
+    """Fixture to set up the test client."""
+    app.config["TESTING"] = True
+    with app.test_client() as test_client:
+        yield test_client
+
+
+def test_request_id_is_generated_or_passed_through(client_fixture):
+    """Test that valid caller IDs are kept and others replaced."""
+    generated = client_fixture.get("/metrics").headers["X-Request-ID"]
+    assert len(generated) == 32
+
+    response = client_fixture.get("/metrics", headers={"X-Request-ID": "abc-123"})
+    assert response.headers["X-Request-ID"] == "abc-123"
+
+    response = client_fixture.get("/metrics", headers={"X-Request-ID": "bad id!"})
+    assert response.headers["X-Request-ID"] != "bad id!"
+
+
+@patch("app.current_user")
+@patch("app.ml_client.post_audio")
+@patch("app.convert_audio_stream", side_effect=lambda source, _size: source)
+def test_upload_forwards_request_id(
+    _mock_convert, mock_post, mock_current_user, client_fixture
+):
+    """Test that an upload passes its correlation ID on to the ML client."""
+    mock_current_user.get_id.return_value = "user-1"
+    mock_post.return_value.status_code = 200
+    mock_post.return_value.json.return_value = {"status": "success"}
+
+    response = client_fixture.post(
+        "/upload",
+        data={"audio": (io.BytesIO(b"fake audio data"), "fake_audio.wav")},
+        content_type="multipart/form-data",
+        headers={"X-Request-ID": "upload-1"},
+    )
+    assert response.status_code == 200
+    assert mock_post.call_args.args[3] == "upload-1"
+
+
+def test_slow_requests_are_logged_with_spans(client_fixture, caplog):
+    """Test that requests over the threshold are logged with their spans."""
+    with patch("tracing.SLOW_REQUEST_MS", 0), caplog.at_level(logging.WARNING):
+        client_fixture.get("/metrics", headers={"X-Request-ID": "slow-1"})
+    assert '"request_id": "slow-1"' in caplog.text
+    assert '"endpoint": "metrics"' in caplog.text
+
+    caplog.clear()
+    with patch("tracing.SLOW_REQUEST_SAMPLE_RATE", 0), patch(
+        "tracing.SLOW_REQUEST_MS", 0
+    ), caplog.at_level(logging.WARNING):
+        client_fixture.get("/metrics")
+    assert "Slow request" not in caplog.text
+
+
+def test_collected_spans_are_summarized():
+    """Test that spans outside a request are collected and summed per stage."""
+    record_span("ignored", 1.0)
+    with collect_spans("job-1") as spans:
+        assert current_request_id() == "job-1"
+        record_span("convert", 0.25)
+        record_span("forward", 0.5)
+        record_span("forward", 0.25)
+    assert current_request_id() is None
+    assert span_timings(spans) == {"convert": 250.0, "forward": 750.0}
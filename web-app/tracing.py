@@ -0,0 +1,199 @@
+"""
+Request correlation and lightweight span timing.
+
+Every request gets a correlation ID, taken from the X-Request-ID header when
+the caller sent a valid one and generated otherwise. The ID is echoed in the
+response, added to log records as `request_id` and forwarded to the machine
+learning client, so an upload can be followed across both services' logs.
+
+Stages timed with `metrics.timed_stage` are also recorded as spans of the
+current request, or of the queued job handling an async upload. The stages
+completed before an upload is forwarded are sent along with it and stored
+with the entry. Requests slower than SLOW_REQUEST_MS are logged with their
+span breakdown, for a sampled fraction SLOW_REQUEST_SAMPLE_RATE of them.
+"""
+
+import os
+import re
+import json
+import time
+import uuid
+import random
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from flask import request
+
+logger = logging.getLogger(__name__)
+
+REQUEST_ID_HEADER = "X-Request-ID"
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "1000"))
+SLOW_REQUEST_SAMPLE_RATE = float(os.getenv("SLOW_REQUEST_SAMPLE_RATE", "1.0"))
+# Accept caller IDs that are safe to log and to pass on as a header
+VALID_REQUEST_ID = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+LOG_FORMAT = "%(asctime)s [%(levelname)s] [%(request_id)s] %(name)s: %(message)s"
+
+_request_id = ContextVar("request_id", default=None)
+_spans = ContextVar("spans", default=None)
+
+
+def new_request_id():
+    """
+    Generates a correlation ID.
+
+    Returns:
+        str: A random hex ID.
+    """
+    return uuid.uuid4().hex
+
+
+def current_request_id():
+    """
+    Returns the correlation ID of the request being handled, or None.
+    """
+    return _request_id.get()
+
+
+def current_spans():
+    """
+    Returns the spans recorded so far for the request being handled.
+
+    Returns:
+        list: (name, seconds) pairs, empty outside a request.
+    """
+    return list(_spans.get() or [])
+
+
+def record_span(name, seconds):
+    """
+    Adds a timed stage to the spans being collected, if any.
+
+    Args:
+        name (str): The stage name.
+        seconds (float): The duration.
+    """
+    spans = _spans.get()
+    if spans is not None:
+        spans.append((name, seconds))
+
+
+@contextmanager
+def collect_spans(request_id=None):
+    """
+    Collects the spans recorded within the block, e.g. for a job or batch item
+    handled outside the request context.
+
+    Args:
+        request_id (str): Correlation ID for log records within the block.
+
+    Yields:
+        list: The (name, seconds) spans, filled as they are recorded.
+    """
+    spans = []
+    tokens = (_spans.set(spans), _request_id.set(request_id or current_request_id()))
+    try:
+        yield spans
+    finally:
+        _spans.reset(tokens[0])
+        _request_id.reset(tokens[1])
+
+
+def span_timings(spans):
+    """
+    Summarizes spans compactly for storage.
+
+    Args:
+        spans (list): (name, seconds) pairs; repeated names are added up.
+
+    Returns:
+        dict: Milliseconds per stage, rounded to 0.1 ms.
+    """
+    timings = {}
+    for name, seconds in spans:
+        timings[name] = timings.get(name, 0.0) + seconds * 1000
+    return {name: round(value, 1) for name, value in timings.items()}
+
+
+class RequestIdFilter(logging.Filter):  # pylint: disable=too-few-public-methods
+    """
+    Adds the correlation ID of the current request to log records.
+    """
+
+    def filter(self, record):
+        record.request_id = current_request_id() or "-"
+        return True
+
+
+def configure_logging(level=None):
+    """
+    Sends log records to stderr, tagged with the correlation ID.
+
+    Does nothing if logging is already configured.
+
+    Args:
+        level (str): The log level; defaults to LOG_LEVEL or INFO.
+    """
+    handler = logging.StreamHandler()
+    handler.addFilter(RequestIdFilter())
+    logging.basicConfig(
+        level=level or os.getenv("LOG_LEVEL", "INFO"),
+        format=LOG_FORMAT,
+        handlers=[handler],
+    )
+
+
+def _start_request():
+    incoming = request.headers.get(REQUEST_ID_HEADER, "")
+    request_id = incoming if VALID_REQUEST_ID.match(incoming) else new_request_id()
+    request.environ["tracing.tokens"] = (
+        _request_id.set(request_id),
+        _spans.set([]),
+    )
+    request.environ["tracing.started"] = time.perf_counter()
+
+
+def _finish_request(response):
+    request_id = current_request_id()
+    if request_id is None:
+        return response
+    response.headers[REQUEST_ID_HEADER] = request_id
+    total_ms = (time.perf_counter() - request.environ["tracing.started"]) * 1000
+    if total_ms >= SLOW_REQUEST_MS and random.random() < SLOW_REQUEST_SAMPLE_RATE:
+        logger.warning(
+            "Slow request %s",
+            json.dumps(
+                {
+                    "request_id": request_id,
+                    "endpoint": request.endpoint,
+                    "status": response.status_code,
+                    "total_ms": round(total_ms, 1),
+                    "spans": span_timings(_spans.get() or []),
+                }
+            ),
+        )
+    return response
+
+
+def _end_request(_error=None):
+    tokens = request.environ.pop("tracing.tokens", None)
+    if tokens:
+        try:
+            _request_id.reset(tokens[0])
+            _spans.reset(tokens[1])
+        except ValueError:
+            # Torn down in another context, e.g. after a streamed response
+            _request_id.set(None)
+            _spans.set(None)
+
+
+def init_tracing(app):
+    """
+    Assigns correlation IDs and collects spans for every request of an app.
+
+    Args:
+        app (flask.Flask): The application.
+    """
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    app.teardown_request(_end_request)
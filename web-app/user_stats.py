@@ -0,0 +1,462 @@
+"""
+Materialized per-user journal statistics.
+
+Each user has one document in the `user_stats` collection holding the number
+of entries per mood. The machine learning client increments it when it stores
+an entry and the web app decrements it when an entry is deleted, so the mood
+trends endpoint is a single point read. Users whose counters predate this
+document are seeded once with a single aggregation over their entries.
+
+The document also holds a data version that every insert and delete bumps
+after writing the entry. Anything derived from a user's entries can be cached
+under it.
+
+Seeding aggregates the entries and then sets the counters, which races with
+writers that update the counters after writing an entry. Before writing,
+writers therefore push `writing_until` at least STATS_WRITE_GRACE_SECONDS
+ahead. Seeded values are only stored if the version did not change since
+before the aggregation and no write is pending, otherwise the seed is
+retried, so the counter update of an entry written or deleted meanwhile is
+neither overwritten nor counted twice. This holds as long as a write takes
+less than the grace period and the services' clocks agree within it.
+
+Mood trends over time are served from the `mood_rollups` collection, which
+holds one document per user and UTC day with the number of entries, the
+count per mood and the sums of polarity and subjectivity. The machine
+learning client adds to it on insert and the web app subtracts on delete.
+Users whose entries predate the rollups are seeded once with a single
+aggregation.
+"""
+
+import os
+import logging
+from datetime import datetime, timedelta
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+MOODS = ("Positive", "Negative", "Neutral")
+GRANULARITIES = ("day", "week", "month")
+# Range served when the request gives no start date
+DEFAULT_TREND_DAYS = {"day": 30, "week": 12 * 7, "month": 365}
+# At most about three years of daily rollups per request
+MAX_TREND_DAYS = 3 * 366
+# Seeds raced by concurrent writes are retried this many times
+SEED_ATTEMPTS = 3
+# Writes of an entry and its counter updates finish within this time
+STATS_WRITE_GRACE_SECONDS = float(os.getenv("STATS_WRITE_GRACE_SECONDS", "30"))
+ROLLUP_PROJECTION = {
+    "_id": 0,
+    "day": 1,
+    "count": 1,
+    "mood_counts": 1,
+    "polarity_sum": 1,
+    "subjectivity_sum": 1,
+}
+
+
+def aggregate_mood_counts(entries, user_id):
+    """
+    Counts a user's entries per mood with a single `$group` aggregation.
+
+    Args:
+        entries (pymongo.collection.Collection): The entries collection.
+        user_id (str): The user's ID.
+
+    Returns:
+        dict: The number of entries per mood.
+    """
+    counts = dict.fromkeys(MOODS, 0)
+    pipeline = [
+        {"$match": {"user_id": user_id}},
+        {"$group": {"_id": "$sentiment.mood", "count": {"$sum": 1}}},
+    ]
+    for row in entries.aggregate(pipeline):
+        if row["_id"] in counts:
+            counts[row["_id"]] = row["count"]
+    return counts
+
+
+def record_write_pending(database, user_id):
+    """
+    Announces that one of a user's entries is about to be written, so that
+    seeding does not store values the write's counter update would corrupt.
+
+    Args:
+        database (pymongo.database.Database): The journal database.
+        user_id (str): The user's ID.
+    """
+    until = datetime.utcnow() + timedelta(seconds=STATS_WRITE_GRACE_SECONDS)
+    database["user_stats"].update_one(
+        {"_id": user_id}, {"$max": {"writing_until": until}}, upsert=True
+    )
+
+
+def writes_pending(stats):
+    """
+    Tells whether a user's stats document announces an unfinished write.
+
+    Args:
+        stats (dict): The document, or None.
+
+    Returns:
+        bool: Whether a write may still update the counters.
+    """
+    until = (stats or {}).get("writing_until")
+    return until is not None and until > datetime.utcnow()
+
+
+def mark_seeded(database, user_id, stats, fields):
+    """
+    Stores seeded fields in a user's stats document, unless the document
+    changed since `stats` was read or a write is pending.
+
+    Args:
+        database (pymongo.database.Database): The journal database.
+        user_id (str): The user's ID.
+        stats (dict): The document as read before seeding, or None if it did
+            not exist.
+        fields (dict): The fields to set.
+
+    Returns:
+        bool: Whether the fields were stored.
+    """
+    if stats is None:
+        # Writers create the document before writing, so none has started
+        try:
+            database["user_stats"].insert_one({"_id": user_id, "version": 0, **fields})
+        except DuplicateKeyError:
+            return False
+        return True
+    result = database["user_stats"].update_one(
+        {
+            "_id": user_id,
+            "version": stats.get("version"),
+            "writing_until": {"$not": {"$gt": datetime.utcnow()}},
+        },
+        {"$set": fields},
+    )
+    return result.matched_count == 1
+
+
+def get_mood_counts(database, user_id):
+    """
+    Reads a user's mood counters, seeding them from the entries if needed.
+
+    Args:
+        database (pymongo.database.Database): The journal database.
+        user_id (str): The user's ID.
+
+    Returns:
+        dict: The number of entries per mood.
+    """
+    for _ in range(SEED_ATTEMPTS):
+        stats = database["user_stats"].find_one({"_id": user_id})
+        if stats is not None and stats.get("seeded"):
+            stored = stats.get("mood_counts", {})
+            return {mood: max(stored.get(mood, 0), 0) for mood in MOODS}
+        counts = aggregate_mood_counts(database["entries"], user_id)
+        if not writes_pending(stats) and mark_seeded(
+            database, user_id, stats, {"mood_counts": counts, "seeded": True}
+        ):
+            return counts
+
+    logger.info("Mood counters of %s changed while seeding; not stored", user_id)
+    return counts
+
+
+def record_entry_removed(database, entry):
+    """
+    Updates the counters after a journal entry was deleted.
+
+    Args:
+        database (pymongo.database.Database): The journal database.
+        entry (dict): The deleted entry, with its user ID and sentiment.
+    """
+    sentiment = entry.get("sentiment") or {}
+    if entry.get("timestamp"):
+        # Rollups first, so data cached under the new version includes them
+        day = day_bucket(entry["timestamp"])
+        rollup = {"count": -1}
+        if sentiment.get("mood") in MOODS:
+            rollup[f"mood_counts.{sentiment['mood']}"] = -1
+        for field in ("polarity", "subjectivity"):
+            rollup[f"{field}_sum"] = -float(sentiment.get(field) or 0.0)
+        database["mood_rollups"].bulk_write(
+            [UpdateOne({"_id": rollup_id(entry["user_id"], day)}, {"$inc": rollup})]
+        )
+
+    increments = {"version": 1}
+    mood = sentiment.get("mood")
+    if mood in MOODS:
+        increments[f"mood_counts.{mood}"] = -1
+    database["user_stats"].update_one({"_id": entry["user_id"]}, {"$inc": increments})
+
+
+def get_data_version(database, user_id):
+    """
+    Reads the version of a user's journal data.
+
+    Args:
+        database (pymongo.database.Database): The journal database.
+        user_id (str): The user's ID.
+
+    Returns:
+        int: The version, 0 for users without any recorded change.
+    """
+    stats = database["user_stats"].find_one({"_id": user_id}, {"version": 1})
+    return (stats or {}).get("version", 0)
+
+
+def day_bucket(timestamp):
+    """
+    Returns the start of the UTC day of a timestamp.
+
+    Args:
+        timestamp (datetime): A naive UTC timestamp, as stored with entries.
+
+    Returns:
+        datetime: Midnight of that day.
+    """
+    return datetime(timestamp.year, timestamp.month, timestamp.day)
+
+
+def rollup_id(user_id, day):
+    """
+    Builds the ID of a user's rollup document for a day.
+
+    Args:
+        user_id (str): The user's ID.
+        day (datetime): Midnight of the day.
+
+    Returns:
+        str: The document ID.
+    """
+    return f"{user_id}:{day:%Y-%m-%d}"
+
+
+def period_start(day, granularity):
+    """
+    Returns the first day of the period a day falls in.
+
+    Args:
+        day (datetime): Midnight of the day.
+        granularity (str): "day", "week" (starting on Monday) or "month".
+
+    Returns:
+        datetime: Midnight of the first day of the period.
+    """
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    return day
+
+
+def next_period(start, granularity):
+    """
+    Returns the first day of the period after the one starting at `start`.
+    """
+    if granularity == "week":
+        return start + timedelta(days=7)
+    if granularity == "month":
+        return (start + timedelta(days=32)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+def trend_range(granularity, start=None, end=None, today=None):
+    """
+    Validates the period of a mood trends request.
+
+    Args:
+        granularity (str): "day", "week" or "month".
+        start (str): The first day, YYYY-MM-DD; defaults to a range that
+            suits the granularity.
+        end (str): The last day, YYYY-MM-DD, inclusive; defaults to today.
+        today (datetime): The current UTC date, for tests.
+
+    Returns:
+        tuple: Midnight of the first and of the last day.
+
+    Raises:
+        ValueError: If a parameter is invalid or the range too long.
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularity must be one of {', '.join(GRANULARITIES)}")
+    last = (
+        datetime.strptime(end, "%Y-%m-%d")
+        if end
+        else day_bucket(today or datetime.utcnow())
+    )
+    first = (
+        datetime.strptime(start, "%Y-%m-%d")
+        if start
+        else last - timedelta(days=DEFAULT_TREND_DAYS[granularity] - 1)
+    )
+    if first > last:
+        raise ValueError("from must not be after to")
+    if (last - first).days >= MAX_TREND_DAYS:
+        raise ValueError(f"At most {MAX_TREND_DAYS} days per request")
+    return first, last
+
+
+def aggregate_rollups(entries, user_id):
+    """
+    Computes a user's daily rollups with a single `$group` aggregation.
+
+    Args:
+        entries (pymongo.collection.Collection): The entries collection.
+        user_id (str): The user's ID.
+
+    Returns:
+        list: One upsert setting each day's rollup document.
+    """
+    pipeline = [
+        {"$match": {"user_id": user_id, "timestamp": {"$type": "date"}}},
+        {
+            "$group": {
+                "_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$timestamp"}},
+                "count": {"$sum": 1},
+                "polarity_sum": {"$sum": {"$ifNull": ["$sentiment.polarity", 0]}},
+                "subjectivity_sum": {
+                    "$sum": {"$ifNull": ["$sentiment.subjectivity", 0]}
+                },
+                **{
+                    mood: {
+                        "$sum": {"$cond": [{"$eq": ["$sentiment.mood", mood]}, 1, 0]}
+                    }
+                    for mood in MOODS
+                },
+            }
+        },
+    ]
+    updates = []
+    for row in entries.aggregate(pipeline):
+        day = datetime.strptime(row["_id"], "%Y-%m-%d")
+        updates.append(
+            UpdateOne(
+                {"_id": rollup_id(user_id, day)},
+                {
+                    "$set": {
+                        "user_id": user_id,
+                        "day": day,
+                        "count": row["count"],
+                        "mood_counts": {mood: row[mood] for mood in MOODS},
+                        "polarity_sum": row["polarity_sum"],
+                        "subjectivity_sum": row["subjectivity_sum"],
+                    }
+                },
+                upsert=True,
+            )
+        )
+    return updates
+
+
+def seed_rollups(database, user_id):
+    """
+    Builds a user's daily rollups from their entries.
+
+    The rollups are rebuilt until a pass completes without the user's data
+    changing; if none does, the user is left unseeded so that the next
+    request rebuilds them. Nothing is written while a write is pending.
+
+    Args:
+        database (pymongo.database.Database): The journal database.
+        user_id (str): The user's ID.
+
+    Returns:
+        bool: Whether the rollups were seeded.
+    """
+    for _ in range(SEED_ATTEMPTS):
+        stats = database["user_stats"].find_one(
+            {"_id": user_id}, {"version": 1, "writing_until": 1}
+        )
+        if writes_pending(stats):
+            continue
+        updates = aggregate_rollups(database["entries"], user_id)
+        if updates:
+            database["mood_rollups"].bulk_write(updates, ordered=False)
+        if mark_seeded(database, user_id, stats, {"rollups_seeded": True}):
+            return True
+
+    # An earlier pass may have overwritten concurrent increments
+    database["user_stats"].update_one(
+        {"_id": user_id}, {"$unset": {"rollups_seeded": ""}}
+    )
+    logger.info("Mood rollups of %s changed while seeding; not seeded", user_id)
+    return False
+
+
+def get_mood_trends(database, user_id, granularity, first, last):
+    """
+    Reads a user's mood counts and mean sentiment per period from the rollups.
+
+    Costs one indexed read of at most one small document per day in range,
+    plus a one-off aggregation for users whose rollups were never seeded.
+
+    Args:
+        database (pymongo.database.Database): The journal database.
+        user_id (str): The user's ID.
+        granularity (str): "day", "week" or "month".
+        first (datetime): Midnight of the first day.
+        last (datetime): Midnight of the last day, inclusive.
+
+    Returns:
+        list: One bucket per period, oldest first, including empty periods:
+            the start date, the entry count, the count per mood and the mean
+            polarity and subjectivity.
+    """
+    stats = database["user_stats"].find_one({"_id": user_id}, {"rollups_seeded": 1})
+    if not (stats or {}).get("rollups_seeded"):
+        seed_rollups(database, user_id)
+
+    buckets = {}
+    start = period_start(first, granularity)
+    while start <= last:
+        buckets[start] = {
+            "count": 0,
+            "mood_counts": dict.fromkeys(MOODS, 0),
+            "polarity_sum": 0.0,
+            "subjectivity_sum": 0.0,
+        }
+        start = next_period(start, granularity)
+
+    rollups = (
+        database["mood_rollups"]
+        .find(
+            {"user_id": user_id, "day": {"$gte": first, "$lte": last}},
+            ROLLUP_PROJECTION,
+        )
+        .sort("day", 1)
+    )
+    for rollup in rollups:
+        bucket = buckets[period_start(rollup["day"], granularity)]
+        bucket["count"] += rollup.get("count", 0)
+        for mood in MOODS:
+            bucket["mood_counts"][mood] += (rollup.get("mood_counts") or {}).get(
+                mood, 0
+            )
+        bucket["polarity_sum"] += rollup.get("polarity_sum", 0.0)
+        bucket["subjectivity_sum"] += rollup.get("subjectivity_sum", 0.0)
+
+    return [
+        {
+            "start": start.strftime("%Y-%m-%d"),
+            "count": max(bucket["count"], 0),
+            "mood_counts": {
+                mood: max(count, 0) for mood, count in bucket["mood_counts"].items()
+            },
+            "mean_polarity": (
+                round(bucket["polarity_sum"] / bucket["count"], 4)
+                if bucket["count"] > 0
+                else 0.0
+            ),
+            "mean_subjectivity": (
+                round(bucket["subjectivity_sum"] / bucket["count"], 4)
+                if bucket["count"] > 0
+                else 0.0
+            ),
+        }
+        for start, bucket in buckets.items()
+    ]